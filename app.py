@@ -1,6 +1,7 @@
 from datetime import timedelta
 from flask import Flask, render_template, redirect, url_for
-from db import models, database_setup
+from db import models, database_setup, resume_store, search_cache, skill_index
+from db.connection import connections
 
 from flask import Flask
 from flask_jwt_extended import JWTManager
@@ -29,6 +30,29 @@ def create_app():
     # Initialize JWT
     jwt = JWTManager(app)
     
+    # Request-scoped database connections
+    connections.init_app(app)
+    
+    # Resume PDFs live on disk, keyed by content hash. Downloads are sent with
+    # sendfile by the WSGI server; set USE_X_SENDFILE = True (Apache/lighttpd) or
+    # RESUME_ACCEL_REDIRECT = "/internal-location" (nginx, aliased to the store
+    # directory) to hand them to the front-end server instead.
+    app.config.setdefault("RESUME_STORE_DIR", resume_store.RESUME_STORE_DIR)
+    app.config.setdefault("RESUME_ACCEL_REDIRECT", None)
+    resume_store.init_app(app)
+    
+    # Job search pages are cached per process and dropped whenever a job post,
+    # its skills or a company changes; SEARCH_CACHE_SIZE = 0 turns this off
+    app.config.setdefault("SEARCH_CACHE_SIZE", search_cache.SEARCH_CACHE_SIZE)
+    app.config.setdefault("SEARCH_CACHE_TTL", search_cache.SEARCH_CACHE_TTL)
+    app.config.setdefault("SEARCH_CACHE_STALE_TTL", search_cache.SEARCH_CACHE_STALE_TTL)
+    search_cache.init_app(app)
+    
+    # Skill filters in job searches are answered from an in-memory index of
+    # post ids per skill, built here; SKILL_INDEX = False turns it off
+    app.config.setdefault("SKILL_INDEX", True)
+    skill_index.init_app(app)
+    
     # Register blueprint
     app.register_blueprint(recruiter_api, url_prefix="/api/recruiter")
     app.register_blueprint(freelancer_api, url_prefix="/api/freelancer")
@@ -0,0 +1,81 @@
+"""
+Per-row cost of turning JobPosts rows into models or dicts.
+
+    python -m benchmarks.hydration [rows]
+
+Builds a throwaway database with `rows` job posts (10,000 by default) in a
+temporary directory, reads them back once and times each hydration path
+over the same rows.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from db import models
+from db.database_setup import create_database
+
+
+REPEATS = 5
+
+
+def seed(rows):
+    recruiterId = models.Recruiters(username="bench", email="bench@test.com", password="pass").insert()
+    companyId = models.Companies(
+        username="bench", companyName="Bench Inc", companyPhone="000",
+        companyAddress="Somewhere", companyDescription="Benchmarks"
+    ).insert()
+    models.JobPosts.insertMany(
+        models.JobPosts(
+            recruiterId=recruiterId, companyId=companyId, title=f"Job {i}",
+            description="Lorem ipsum " * 40, experience=i % 10, jobType="FULL_TIME",
+            location="Remote", salary=1000.0 + i, validTill="2030-01-01", isActive=i % 3 != 0
+        )
+        for i in range(rows)
+    )
+
+
+def best_per_row(fn, rows):
+    """Best-of-REPEATS time for fn(rows), in microseconds per row"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(rows) * 1e6
+
+
+def main(rows=10_000):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_database()
+                seed(rows)
+            data = models.fetch("SELECT * FROM JobPosts", ())
+        finally:
+            os.chdir(cwd)
+
+    # getAll / getAllDicts build one reader per query and reuse it for every row
+    read = models.JobPosts.rowReader(data[0].keys())
+    cases = [
+        ("validated model (cls(**row))", lambda rs: [models.JobPosts(**dict(r)) for r in rs]),
+        ("validated model + model_dump", lambda rs: [models.JobPosts(**dict(r)).model_dump() for r in rs]),
+        ("trusted model (getAll)", lambda rs: [models.JobPosts.fromTrusted(read(r)) for r in rs]),
+        ("trusted model, per-row fromRow", lambda rs: [models.JobPosts.fromRow(r) for r in rs]),
+        ("plain dict (getAllDicts)", lambda rs: [read(r) for r in rs]),
+    ]
+
+    print(f"Hydrating {len(data)} JobPosts rows, best of {REPEATS}")
+    baseline = None
+    for name, fn in cases:
+        cost = best_per_row(fn, data)
+        baseline = baseline or cost
+        print(f"  {name:<32} {cost:7.2f} us/row  ({baseline / cost:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -12,7 +12,7 @@ from flask_jwt_extended import (
 )
 from flask_jwt_extended.exceptions import NoAuthorizationError, InvalidHeaderError
 from hashlib import sha256
-from db import models
+from db import models, recommendations
 
 
 freelancer = Blueprint("freelancer", __name__)
@@ -51,17 +51,20 @@ def index():
     freelancerDetail = models.FreelancerDetails.get(freelancerId=fid)
     educations = models.Educations.getAll(freelancerId=fid)
     experiences = models.Experiences.getAll(freelancerId=fid)
-    rawSkills = models.FreelancerSkills.getAll(freelancerId=fid)
+    rawSkills = models.FreelancerSkills.getAll(freelancerId=fid, prefetch=["skill"])
     skills = []
     
     for skill in rawSkills:
-        skills.append({"skill": models.Skills.get(id=skill["skillId"]), "proficiencyLevel": skill["proficiencyLevel"], "yearsOfExperience": skill["yearsOfExperience"]})
+        skills.append({"skill": skill.skill, "proficiencyLevel": skill.proficiencyLevel, "yearsOfExperience": skill.yearsOfExperience})
+    
+    # jobs matching the freelancer's skills
+    recommendedJobs = recommendations.recommended_job_posts(fid)
     
     return render_template(
         "/freelancer/index.html", freelancer=freelancer, 
         freelancerDetails=freelancerDetail, 
         educations=educations, experiences=experiences, 
-        skills=skills
+        skills=skills, recommendedJobs=recommendedJobs
     )
 
 
@@ -101,7 +104,7 @@ def jobs():
     
     # Get search parameters from request args
     search = request.args.get("search", "")
-    page = int(request.args.get("page", 0))
+    cursor = request.args.get("cursor", None)
     
     # Get filter parameters
     min_experience = request.args.get("min_experience", None)
@@ -113,10 +116,12 @@ def jobs():
     max_salary = request.args.get("max_salary", None)
     skills = request.args.get("skills", None)
     skills = skills if skills != "" else None
+    skills_match = "all" if request.args.get("skills_match") == "all" else "any"
     location = request.args.get("location", None)
     location = location if location != "" else None
-    applied = request.args.get("applied", None)
-    applied = applied == "1"
+    # only an explicit choice filters on applications; without one every
+    # freelancer shares the cached search pages
+    applied = {"1": True, "0": False}.get(request.args.get("applied"))
     
     # Convert string parameters to appropriate types
     min_experience = int(min_experience) if min_experience and min_experience.isdigit() else None
@@ -126,7 +131,7 @@ def jobs():
     
     print(f"""
         {search=},
-        {page=},
+        {cursor=},
         {min_experience=},
         {max_experience=},
         {job_type=},
@@ -134,14 +139,15 @@ def jobs():
         {min_salary=},
         {max_salary=},
         {skills=},
+        {skills_match=},
         {location=}"""
     )
     
     
     # Perform search with all filters
-    jobs = models.JobPosts.search(
+    results = models.JobPosts.search(
         search=search,
-        page=page,
+        cursor=cursor,
         min_experience=min_experience,
         max_experience=max_experience,
         job_type=job_type,
@@ -149,28 +155,25 @@ def jobs():
         min_salary=min_salary,
         max_salary=max_salary,
         skills=skills,
-        location=location
+        location=location,
+        freelancer_id=freelancer.id,
+        applied=applied,
+        skills_match=skills_match,
+        facets=True,
+        total=True
     )
-    
-    applicationModels = models.Applications.getAll(freelancerId = freelancer.id)
-    applicationIds = [ i.jobPostId for i in applicationModels ]
-    
-    print("applied", applied, "jobs", jobs, "applicationIds", applicationIds)
-    njobs = []
-    if applied:
-        for job in jobs:
-            print("Applid is true")
-            # print(job['id'], applicationIds)
-            if job['id'] in applicationIds:
-                njobs.append(job)
-    else:
-        for job in jobs:
-            # print(job['id'], applicationIds)
-            if job['id'] not in applicationIds:
-                njobs.append(job)
-    print(njobs)
-    
-    return render_template("/freelancer/jobs.html", freelancer=freelancer, jobs=njobs)
+    jobs = results["jobs"]
+    
+    # Pagination links keep the filters and swap in the page cursor
+    filters = request.args.to_dict()
+    filters.pop("cursor", None)
+    next_url = url_for("freelancer.jobs", **filters, cursor=results["next_cursor"]) if results["has_next"] else None
+    prev_url = url_for("freelancer.jobs", **filters, cursor=results["prev_cursor"]) if results["has_prev"] else None
+    
+    return render_template("/freelancer/jobs.html", freelancer=freelancer, jobs=jobs,
+                           facets=results["facets"], filters=filters,
+                           total=results["total"], total_exact=results["total_exact"],
+                           next_url=next_url, prev_url=prev_url)
 
 
 
@@ -193,7 +196,7 @@ def apply_job(jobId):
         return redirect(url_for('freelancer.application_status', jobId=jobId))
     
     # Get job details with company and skills
-    job = models.JobPosts.get(id=jobId)
+    job = models.JobPosts.get(id=jobId, defer=())
     if not job:
         flash("Job not found", "error")
         return redirect(url_for('freelancer.jobs'))
@@ -204,7 +207,7 @@ def apply_job(jobId):
         flash("Company information not found", "error")
         return redirect(url_for('freelancer.jobs'))
     
-    # Get user's existing resumes
+    # Get user's existing resumes (pdfData is deferred, only the listing is read)
     user_resumes = models.Resumes.getAll(freelancerId=current_user_id)
     
     return render_template("/freelancer/apply.html", 
@@ -274,20 +277,9 @@ def apply_post(jobId):
             flash("Please provide a resume name", "error")
             return redirect(url_for('freelancer.apply_job', jobId=jobId))
         
-        # Read file data
-        resume_data = resume_file.read()
-        file_size = len(resume_data)
-        
-        # Create new resume record
-        new_resume = models.Resumes(
-            freelancerId=current_user_id,
-            name=resume_name,
-            pdfData=resume_data,
-            fileSize=file_size,
-            isDefault=False
-        )
-        
-        resume_id = new_resume.insert()
+        # Stream the upload into the resume store; a PDF the freelancer
+        # already uploaded reuses the existing resume
+        resume_id = models.Resumes.store_upload(current_user_id, resume_name, resume_file.stream)
         if not resume_id:
             flash("Failed to upload resume", "error")
             return redirect(url_for('freelancer.apply_job', jobId=jobId))
@@ -334,13 +326,13 @@ def application_status(jobId):
         return redirect(url_for("freelancer.login"))
 
     # Get application details
-    application = models.Applications.get(jobPostId=jobId, freelancerId=current_user_id)
+    application = models.Applications.get(jobPostId=jobId, freelancerId=current_user_id, defer=())
     if not application:
         flash("Application not found", "error")
         return redirect(url_for('freelancer.jobs'))
     
     # Get job details with company and skills
-    job = models.JobPosts.get(id=jobId)
+    job = models.JobPosts.get(id=jobId, defer=())
     if not job:
         flash("Job not found", "error")
         return redirect(url_for('freelancer.jobs'))
@@ -379,25 +371,28 @@ def applications():
         return redirect(url_for("freelancer.login"))
 
     # Get all applications for the current user
-    user_applications = models.Applications.getAll(freelancerId=current_user_id)
+    user_applications = models.Applications.getAll(
+        freelancerId=current_user_id, defer=(), prefetch=["jobPost.company", "resume"]
+    )
     
     if not user_applications:
         return render_template("/freelancer/applications.html", applications=[])
     
     # Enhance applications with job, company, and resume details
+    # (prefetched above with one batched query per relation)
     enhanced_applications = []
     
     for application in user_applications:
         # Get job details
-        job = models.JobPosts.get(id=application.jobPostId)
+        job = application.jobPost
         if not job:
             continue
             
         # Get company details
-        company = models.Companies.get(id=job.companyId)
+        company = job.company
         
         # Get resume details
-        resume = models.Resumes.get(id=application.resumeId)
+        resume = application.resume
         
         # Create enhanced application object
         enhanced_app = {
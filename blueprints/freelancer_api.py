@@ -12,7 +12,7 @@ from flask_jwt_extended import (
 )
 from hashlib import sha256
 
-from db import models
+from db import models, recommendations
 
 
 freelancer_api = Blueprint("freelancer_api", __name__)
@@ -62,32 +62,37 @@ def signup():
         return jsonify({"error": "Password must be at least 8 characters"}), 400
     
     hashed_password = sha256(password.encode()).hexdigest()
-    freelancer = models.Freelancers(username=username, email=email, password=hashed_password)
-    fId = freelancer.insert()
-    
-    if fId is None:
-        return jsonify({"error": "Signup failed"}), 500
-    
-    freelancer = models.Freelancers.get(id=fId)
-    freelancerDetail = models.FreelancerDetails(
-        freelancerId=fId,
-        firstName=data.get("firstName", ""),
-        middleName=data.get("middleName", ""),
-        lastName=data.get("lastName", ""),
-        phoneNumber=data.get("phoneNumber", ""),
-        contactEmail=data.get("contactEmail", ""),
-        about=data.get("about", ""),
-        dateOfBirth=data.get("dateOfBirth", ""),
-        address=data.get("address", "")
-    )
-    fdId = freelancerDetail.insert()
-    
-    if freelancer is None:
-        return jsonify({"error": "Signup failed"}), 500
     
-    if fdId is None:
-        freelancer.delete()
-        return jsonify({"error": "Signup failed"}), 500
+    # the account and its details are created together or not at all
+    try:
+        with models.transaction():
+            freelancer = models.Freelancers(username=username, email=email, password=hashed_password)
+            fId = freelancer.insert()
+            
+            if fId is None:
+                raise models.Rollback("Signup failed")
+            
+            freelancer = models.Freelancers.get(id=fId)
+            if freelancer is None:
+                raise models.Rollback("Signup failed")
+            
+            freelancerDetail = models.FreelancerDetails(
+                freelancerId=fId,
+                firstName=data.get("firstName", ""),
+                middleName=data.get("middleName", ""),
+                lastName=data.get("lastName", ""),
+                phoneNumber=data.get("phoneNumber", ""),
+                contactEmail=data.get("contactEmail", ""),
+                about=data.get("about", ""),
+                dateOfBirth=data.get("dateOfBirth", ""),
+                address=data.get("address", "")
+            )
+            fdId = freelancerDetail.insert()
+            
+            if fdId is None:
+                raise models.Rollback("Signup failed")
+    except models.Rollback as e:
+        return jsonify({"error": str(e)}), 500
     
     access_token = create_access_token(identity=f"{freelancer.id},freelancer")
     response = jsonify({
@@ -141,9 +146,9 @@ def profile():
     
     freelancer = models.Freelancers.get(id=id)
     freelancerDetails = models.FreelancerDetails.get(freelancerId=id)
-    educations = models.Educations.getAll(freelancerId=id)
-    experiences = models.Experiences.getAll(freelancerId=id)
-    rawSkills = models.FreelancerSkills.getAll(freelancerId=id)
+    educations = models.Educations.getAllDicts(freelancerId=id)
+    experiences = models.Experiences.getAllDicts(freelancerId=id)
+    rawSkills = models.FreelancerSkills.getAll(freelancerId=id, prefetch=["skill"])
     skills = []
     
     if freelancer is None:
@@ -158,29 +163,31 @@ def profile():
     else:
         freelancerDetails = freelancerDetails.model_dump()
     
-    if educations:
-        educations = [edu.model_dump() for edu in educations]
-    else:
-        educations = []
-        
-    if experiences:
-        experiences = [exp.model_dump() for exp in experiences]
-    else:
-        experiences = []
-        
-    if rawSkills:
-        rawSkills = [skill.model_dump() for skill in rawSkills]
-    else:
-        rawSkills = []
-    
     for skill in rawSkills:
-        skillClass = models.Skills.get(id=skill["skillId"])
-        if skillClass is not None:
-            skills.append({"skill": skillClass.model_dump(), "proficiencyLevel": skill["proficiencyLevel"], "yearsOfExperience": skill["yearsOfExperience"]})
+        if skill.skill is not None:
+            skills.append({"skill": skill.skill.model_dump(), "proficiencyLevel": skill.proficiencyLevel, "yearsOfExperience": skill.yearsOfExperience})
     
     return jsonify({"freelancer": freelancer, "freelancerDetails": freelancerDetails, "educations": educations, "experiences": experiences, "skills": skills}), 200
 
 
+@freelancer_api.get("/recommendations")
+@jwt_required()
+def recommended_jobs():
+    cookie = get_jwt_identity()
+    id, role = cookie.split(',')
+    id = int(id)
+    
+    if role != "freelancer":
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    limit = request.args.get("limit", recommendations.RECOMMENDATION_COUNT, type=int)
+    if limit < 1 or limit > 100:
+        return jsonify({"error": "limit must be between 1 and 100"}), 400
+    
+    jobs = recommendations.recommended_job_posts(id, limit)
+    return jsonify({"jobs": jobs}), 200
+
+
 @freelancer_api.post("/profile/details/update")
 @jwt_required()
 def update_freelancer_details():
@@ -229,11 +236,11 @@ def add_freelancer_skill():
     print(data)
     skill = data.get("skillName")
     print(skill)
-    skillClass = models.Skills.get_or_create(skill)
-    if skillClass is None:
+    skillIds = models.Skills.resolve_many([skill] if skill else [])
+    if not skillIds:
         return jsonify({"error": "Skill add failed"}), 500
     
-    skillId = skillClass.id
+    skillId = next(iter(skillIds.values()))
     
     freelancerSkill = models.FreelancerSkills(
         freelancerId=id,
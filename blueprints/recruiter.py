@@ -1,15 +1,15 @@
 from functools import wraps
-from io import BytesIO
 from flask import (
-    Blueprint, request,
+    Blueprint, request, Response, current_app,
     redirect, flash,
     url_for, render_template, send_file
 )
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from flask_jwt_extended import (
     jwt_required, 
     get_jwt_identity
 )
-from db import models
+from db import models, resume_store, recommendations
 
 
 recruiter = Blueprint("recruiter", __name__)
@@ -49,30 +49,73 @@ def login_required(f):
     return decorated_function
 
 
+def send_resume(resume):
+    # Streams the PDF in chunks and answers conditional and Range requests.
+    # ETag and Content-Length come from the row's metadata, so a cached
+    # download is answered without touching the file at all.
+    etag = resume.contentHash or f"resume-{resume.id}-{resume.fileSize}-{resume.updatedAt}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    download_name = resume.name + ".pdf"
+    path = resume.file_path()
+    if path is not None:
+        accel_prefix = current_app.config.get("RESUME_ACCEL_REDIRECT")
+        if accel_prefix:
+            # nginx serves the file itself from an internal location
+            response = Response(mimetype="application/pdf")
+            response.headers["X-Accel-Redirect"] = (
+                accel_prefix.rstrip("/") + "/" + resume_store.get_store().relative_path(resume.contentHash)
+            )
+            response.headers.set("Content-Disposition", "attachment", filename=download_name)
+            response.set_etag(etag)
+            return response
+        
+        # a real path lets the WSGI server use sendfile(), or Flask emit
+        # X-Sendfile when USE_X_SENDFILE is set
+        return send_file(
+            path, download_name=download_name, mimetype="application/pdf",
+            as_attachment=True, conditional=True, etag=etag
+        )
+    
+    pdf = resume.open_pdf()
+    response = send_file(
+        pdf, download_name=download_name, mimetype="application/pdf",
+        as_attachment=True, conditional=False, etag=False
+    )
+    response.content_length = resume.fileSize
+    response.set_etag(etag)
+    try:
+        return response.make_conditional(request, accept_ranges=True, complete_length=resume.fileSize)
+    except RequestedRangeNotSatisfiable:
+        pdf.close()
+        raise
+
 
 @recruiter.get("/")
 @login_required
 def index(recruiter):
     # get all the companies that the recruiter is associated with
-    recruiterCompanies = models.RecruiterCompanies.getAll(recruiterId=recruiter.id)
+    recruiterCompanies = models.RecruiterCompanies.getAll(recruiterId=recruiter.id, prefetch=["company"])
     companies = {}
     
     # get all the company details
     for i in recruiterCompanies:
-        company = models.Companies.get(id=i.companyId)
+        company = i.company
         if company:  # Add this check
             companies[company.id] = company.model_dump()
     
     # get all the job posts
-    posts = models.JobPosts.getAll(recruiterId=recruiter.id)
+    posts = models.JobPosts.getAllDicts(recruiterId=recruiter.id, defer=())
     companyPosts = {}
     
     for post in posts:
-        post_dict = post.model_dump()  # Convert to dictionary
-        if post.companyId in companyPosts:
-            companyPosts[post.companyId].append(post_dict)
+        if post["companyId"] in companyPosts:
+            companyPosts[post["companyId"]].append(post)
         else:
-            companyPosts[post.companyId] = [post_dict]
+            companyPosts[post["companyId"]] = [post]
     
     return render_template("/recruiter/index.html", 
                          recruiter=recruiter.model_dump(), 
@@ -116,22 +159,19 @@ def company(recruiter, id):
         return redirect(url_for("recruiter.index"))
     
     # get the recruiters associated with the company
-    companyRecruiters = models.RecruiterCompanies.getAll(companyId=id)
+    companyRecruiters = models.RecruiterCompanies.getAll(companyId=id, prefetch=["recruiter"])
     
     # get the recruiter details with the roles
     recruiters = {}
     for i in companyRecruiters:
-        recruiter_obj = models.Recruiters.get(id=i.recruiterId)
+        recruiter_obj = i.recruiter
         if recruiter_obj:
             recruiter_data = recruiter_obj.model_dump()
             recruiter_data["role"] = i.role
             recruiters[recruiter_obj.id] = recruiter_data
     
     # get all job posts for this company
-    companyPosts = models.JobPosts.getAll(companyId=id)
-    posts = []
-    for post in companyPosts:
-        posts.append(post.model_dump())
+    posts = models.JobPosts.getAllDicts(companyId=id, defer=())
     
     return render_template("/recruiter/company.html", 
                          recruiter=recruiter.model_dump(), 
@@ -144,11 +184,11 @@ def company(recruiter, id):
 @login_required
 def create_post(recruiter):
     # get all the companies that the recruiter is associated with
-    recruiterCompanies = models.RecruiterCompanies.getAll(recruiterId=recruiter.id)
+    recruiterCompanies = models.RecruiterCompanies.getAll(recruiterId=recruiter.id, prefetch=["company"])
     companies = []
 
     for i in recruiterCompanies:
-        company = models.Companies.get(id=i.companyId)
+        company = i.company
         if company:  # Add this check
             companies.append(company)
     
@@ -159,7 +199,7 @@ def create_post(recruiter):
 @login_required
 def post(recruiter, id):
     # get the post from the database
-    post = models.JobPosts.get(id=id)
+    post = models.JobPosts.get(id=id, defer=(), prefetch=["skills"])
     if not post:
         flash("Post not found", "error")
         return redirect(url_for("recruiter.index"))
@@ -171,28 +211,26 @@ def post(recruiter, id):
         return redirect(url_for("recruiter.index"))
     
     # get the skills associated with the post
-    skills = []
-    for post_skill in models.PostSkills.getAll(postId=id):
-        skill = models.Skills.get(id=post_skill.skillId)
-        if skill is None:
-            continue
-        skills.append(skill.model_dump())
+    skills = [skill.model_dump() for skill in post.skills]
         
-    # get the applications
-    applicationModels = models.Applications.getAll(jobPostId=id)
+    # get the applications, best match first
+    ranked = recommendations.ranked_applications(
+        post.id, cursor=request.args.get("cursor"), prefetch=["freelancer", "resume"]
+    )
     applications = []
-    for i in applicationModels:
-        freelancer = models.Freelancers.get(id=i.freelancerId)
-        if freelancer:
-            i = i.model_dump()
-            i['freelancer'] = freelancer.model_dump()
-            i['resume'] = models.Resumes.get(freelancerId=i['resumeId'])
-            if not i['resume']:
-                continue
-            i['resume'] = i['resume'].model_dump()
-            applications.append(i)
+    for i, matchScore in ranked["applications"]:
+        if i.freelancer and i.resume:
+            application = i.model_dump()
+            application['freelancer'] = i.freelancer.model_dump()
+            application['resume'] = i.resume.model_dump()
+            application['matchScore'] = matchScore
+            applications.append(application)
+    
+    next_url = url_for("recruiter.post", id=id, cursor=ranked["next_cursor"]) if ranked["next_cursor"] else None
+    prev_url = url_for("recruiter.post", id=id, cursor=ranked["prev_cursor"]) if ranked["prev_cursor"] else None
     
-    return render_template("/recruiter/post.html",recruiter=recruiter , post=post, skills=skills, applications=applications)
+    return render_template("/recruiter/post.html",recruiter=recruiter , post=post, skills=skills, applications=applications,
+                           applicationCount=ranked["total"], next_url=next_url, prev_url=prev_url)
 
 
 @recruiter.get("/download_resume/<resumeId>")
@@ -203,4 +241,4 @@ def download_resume(recruiter, resumeId):
         flash("Resume not found", "error")
         return redirect(url_for("recruiter.index"))
     
-    return send_file(BytesIO(resume.pdfData), download_name=resume.name + ".pdf", mimetype="application/pdf", as_attachment=True)
\ No newline at end of file
+    return send_resume(resume)
\ No newline at end of file
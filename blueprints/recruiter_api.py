@@ -12,7 +12,7 @@ from flask_jwt_extended import (
 )
 from hashlib import sha256
 
-from db import models
+from db import models, recommendations
 
 
 recruiter_api = Blueprint("recruiter_api", __name__)
@@ -119,7 +119,7 @@ def companies():
     if role != "recruiter":
         return jsonify({"error": "Unauthorized"}), 401
     
-    companies = [i.model_dump() for i in models.RecruiterCompanies.getAll(recruiterId=id)]
+    companies = models.RecruiterCompanies.getAllDicts(recruiterId=id)
     return jsonify({"companies": companies}), 200
 
 
@@ -179,23 +179,26 @@ def create_company():
         employeeSize=data.get("employeeSize")
     )
     
-    # insert the company
-    cId = company.insert()
-    if cId is None:
-        return jsonify({"error": "Company creation failed"}), 500
-    
-    # try fetching the company details for further consistency
-    company = models.Companies.get(id=cId)
-    if company is None:
-        return jsonify({"error": "Company creation failed"}), 500
-    
-    # map the recruiter and company
-    mapped = models.RecruiterCompanies(recruiterId=id, companyId=cId).insert()
-    
-    if mapped is None:
-        # delete the company
-        company.delete()
-        return jsonify({"error": "Company created, but mapping failed. Please try again."}), 500
+    # the company and the recruiter mapping are created together or not at all
+    try:
+        with models.transaction():
+            # insert the company
+            cId = company.insert()
+            if cId is None:
+                raise models.Rollback("Company creation failed")
+            
+            # try fetching the company details for further consistency
+            company = models.Companies.get(id=cId)
+            if company is None:
+                raise models.Rollback("Company creation failed")
+            
+            # map the recruiter and company
+            mapped = models.RecruiterCompanies(recruiterId=id, companyId=cId).insert()
+            
+            if mapped is None:
+                raise models.Rollback("Company creation failed")
+    except models.Rollback as e:
+        return jsonify({"error": str(e)}), 500
     
     return jsonify({"message": "Company created", "company": company.model_dump()}), 200
 
@@ -213,7 +216,7 @@ def get_all_posts():
         return jsonify({"error": "Unauthorized"}), 401
     
     # Get all posts created by this recruiter
-    posts = [post.model_dump() for post in models.JobPosts.getAll(recruiterId=id)]
+    posts = models.JobPosts.getAllDicts(recruiterId=id, defer=())
     return jsonify({"posts": posts}), 200
 
 
@@ -227,7 +230,7 @@ def get_post(postId):
     if role != "recruiter":
         return jsonify({"error": "Unauthorized"}), 401
     
-    post = models.JobPosts.get(id=postId)
+    post = models.JobPosts.get(id=postId, defer=())
     if post is None:
         return jsonify({"error": "Job post not found"}), 404
     
@@ -277,24 +280,30 @@ def create_post():
         isActive=data.get("isActive", True)
     )
     
-    post_id = job_post.insert()
-    if post_id is None:
-        return jsonify({"error": "Failed to create job post"}), 500
-    
-    # Fetch the created post
-    created_post = models.JobPosts.get(id=post_id)
-    if created_post is None:
-        return jsonify({"error": "Job post created but failed to retrieve"}), 500
-    
-    splitSkills = data.get("skills").split(",")
-    for s in splitSkills:
-        skillModel = models.Skills.get_or_create(skill=s.strip())
-        if not skillModel:
-            continue
-        
-        skill = models.PostSkills(postId=post_id, skillId=skillModel.id).insert()
-        if skill is None:
-            return jsonify({"error": "Failed to create job post skill"}), 500
+    # the post and all of its skills are committed at once
+    try:
+        with models.transaction():
+            post_id = job_post.insert()
+            if post_id is None:
+                raise models.Rollback("Failed to create job post")
+            
+            # Fetch the created post
+            created_post = models.JobPosts.get(id=post_id, defer=())
+            if created_post is None:
+                raise models.Rollback("Job post created but failed to retrieve")
+            
+            # every skill is resolved (and the new ones created) in one batch
+            skillIds = models.Skills.resolve_many(data.get("skills").split(","))
+            if skillIds is None:
+                raise models.Rollback("Failed to create job post skill")
+            
+            skills = models.PostSkills.insertMany(
+                models.PostSkills(postId=post_id, skillId=skillId) for skillId in skillIds.values()
+            )
+            if skills is None:
+                raise models.Rollback("Failed to create job post skill")
+    except models.Rollback as e:
+        return jsonify({"error": str(e)}), 500
     
     return jsonify({"message": "Job post created successfully", "post": created_post.model_dump()}), 201
 
@@ -340,7 +349,7 @@ def update_post(postId):
         return jsonify({"error": "Failed to update job post"}), 500
     
     # Fetch updated post
-    updated_post = models.JobPosts.get(id=postId)
+    updated_post = models.JobPosts.get(id=postId, defer=())
     if updated_post is None:
         return jsonify({"error": "Job post updated but failed to retrieve"}), 500
     
@@ -376,9 +385,11 @@ def add_skill_to_post(postId):
     if not skillName or not profeciencyLevel or not experience:
         return jsonify({"error": "Missing required fields"}), 400
     
-    skillModel = models.Skills.get_or_create(skill=skillName)
+    skillIds = models.Skills.resolve_many([skillName])
+    if not skillIds:
+        return jsonify({"error": "Failed to add skill to job post"}), 500
     
-    skill = models.PostSkills(postId=postId, skillId=skillModel.id).insert()
+    skill = models.PostSkills(postId=postId, skillId=next(iter(skillIds.values()))).insert()
     if skill is None:
         return jsonify({"error": "Failed to add skill to job post"}), 500
     
@@ -456,7 +467,7 @@ def get_posts_by_company(companyId):
         return jsonify({"error": "You don't have access to this company"}), 401
     
     # Get all posts for this company created by this recruiter
-    posts = [post.model_dump() for post in models.JobPosts.getAll(recruiterId=id, companyId=companyId)]
+    posts = models.JobPosts.getAllDicts(recruiterId=id, companyId=companyId, defer=())
     return jsonify({"posts": posts}), 200
 
 
@@ -489,6 +500,42 @@ def toggle_post_status(postId):
     return jsonify({"message": f"Job post {status_text} successfully", "isActive": new_status}), 200
 
 
+@recruiter_api.route("/posts/<int:postId>/applications", methods=["GET"])
+@jwt_required()
+def get_post_applications(postId):
+    """Get the applications to a job post, best match first, one page at a time"""
+    cookie = get_jwt_identity()
+    id, role = cookie.split(',')
+    
+    if role != "recruiter":
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    post = models.JobPosts.get(id=postId)
+    if post is None:
+        return jsonify({"error": "Job post not found"}), 404
+    
+    if post.recruiterId != int(id):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    pageSize = request.args.get("page_size", recommendations.APPLICANT_PAGE_SIZE, type=int)
+    if pageSize < 1 or pageSize > 100:
+        return jsonify({"error": "page_size must be between 1 and 100"}), 400
+    
+    ranked = recommendations.ranked_applications(postId, cursor=request.args.get("cursor"), page_size=pageSize)
+    applications = []
+    for application, matchScore in ranked["applications"]:
+        application = application.model_dump()
+        application["matchScore"] = matchScore
+        applications.append(application)
+    
+    return jsonify({
+        "applications": applications,
+        "total": ranked["total"],
+        "next_cursor": ranked["next_cursor"],
+        "prev_cursor": ranked["prev_cursor"]
+    }), 200
+
+
 # accept application
 @recruiter_api.route("/applications/<int:applicationId>/accept", methods=["POST"])
 @jwt_required()
@@ -0,0 +1,269 @@
+import io
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+
+DATABASE = "database.db"
+READ_POOL_SIZE = 4
+# prepared statements kept per connection; model queries are compiled to
+# stable SQL text (see BaseModel.compiledQuery) so they all fit
+STATEMENT_CACHE_SIZE = 512
+# bytes handed out per read when streaming BLOB columns
+BLOB_CHUNK_SIZE = 64 * 1024
+
+
+class Rollback(Exception):
+    """
+    Raise inside a transaction() block to roll it back and leave it early;
+    the message says what failed. Catch it around the block.
+    """
+
+
+class Transaction:
+    """State of the unit of work currently open on a thread"""
+
+    def __init__(self, conn, owns_connection):
+        self.conn = conn
+        self.owns_connection = owns_connection
+        self.depth = 0
+        self.failed = False
+        # called in order once the transaction has committed, or rolled back
+        self.on_commit = []
+        self.on_rollback = []
+
+    def mark_failed(self):
+        """Roll the whole unit of work back when it exits"""
+        self.failed = True
+
+
+class BlobFile(io.RawIOBase):
+    """
+    Read-only file object over one BLOB cell, backed by Connection.blobopen.
+
+    Owns its connection so it can outlive the request that opened it (e.g.
+    while a response body is being streamed); closing the file closes both.
+    """
+
+    def __init__(self, conn, blob):
+        super().__init__()
+        self._conn = conn
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._blob)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._blob.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._blob.seek(offset, whence)
+        return self._blob.tell()
+
+    def tell(self):
+        return self._blob.tell()
+
+    def chunks(self, size=BLOB_CHUNK_SIZE):
+        """Yield the rest of the BLOB `size` bytes at a time"""
+        while True:
+            data = self._blob.read(size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._blob.close()
+            finally:
+                self._conn.close()
+        super().close()
+
+
+class ConnectionManager:
+    """
+    Hands out SQLite connections scoped to the Flask app context.
+
+    Inside a request every write goes through one thread-local connection
+    and every read through a single `query_only` connection borrowed from a
+    small shared pool. Both are reused for the whole request and released
+    in `teardown`. Outside an app context (scripts, tests) each call gets a
+    short-lived connection, as before.
+    """
+
+    def __init__(self, database=DATABASE, read_pool_size=READ_POOL_SIZE):
+        self.database = database
+        self.read_pool_size = read_pool_size
+        self._local = threading.local()
+        self._read_pool = queue.LifoQueue(maxsize=read_pool_size)
+
+    def init_app(self, app):
+        app.teardown_appcontext(self.teardown)
+
+    def connect(self, read_only=False):
+        conn = sqlite3.connect(
+            self.database,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def open_blob(self, table, column, rowid):
+        """Open `column` of row `rowid` in `table` as a read-only BlobFile"""
+        conn = self.connect(read_only=True)
+        try:
+            blob = conn.blobopen(table, column, rowid, readonly=True)
+        except Exception:
+            conn.close()
+            raise
+        return BlobFile(conn, blob)
+
+    def current_transaction(self):
+        return getattr(self._local, "transaction", None)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run every statement issued on this thread inside one transaction.
+
+        Commits once when the outermost block exits, and rolls back if the
+        block raises or any statement inside it failed. Nested blocks join
+        the enclosing transaction.
+        """
+        tx = self.current_transaction()
+        if tx is None:
+            if has_app_context():
+                with self.writer() as conn:
+                    tx = Transaction(conn, owns_connection=False)
+            else:
+                tx = Transaction(self.connect(), owns_connection=True)
+            try:
+                tx.conn.execute("BEGIN IMMEDIATE")
+            except Exception:
+                # e.g. "database is locked": nothing was started
+                if tx.owns_connection:
+                    tx.conn.close()
+                elif tx.conn.in_transaction:
+                    tx.conn.rollback()
+                raise
+            self._local.transaction = tx
+
+        tx.depth += 1
+        try:
+            yield tx
+        except BaseException:
+            tx.mark_failed()
+            raise
+        finally:
+            tx.depth -= 1
+            if tx.depth == 0:
+                self._local.transaction = None
+                try:
+                    if tx.failed:
+                        tx.conn.rollback()
+                    else:
+                        tx.conn.commit()
+                finally:
+                    if tx.owns_connection:
+                        tx.conn.close()
+                for callback in tx.on_rollback if tx.failed else tx.on_commit:
+                    callback()
+
+    def on_commit(self, callback):
+        """
+        Call `callback` once the current transaction has committed (never,
+        if it rolls back), or right away when no transaction is open.
+        """
+        tx = self.current_transaction()
+        if tx is None:
+            callback()
+        else:
+            tx.on_commit.append(callback)
+
+    def on_rollback(self, callback):
+        """
+        Call `callback` once the current transaction has rolled back (never,
+        if it commits). Outside a transaction there is nothing to undo and
+        the callback is dropped.
+        """
+        tx = self.current_transaction()
+        if tx is not None:
+            tx.on_rollback.append(callback)
+
+    @contextmanager
+    def writer(self):
+        """Yield the connection used for INSERT/UPDATE/DELETE statements"""
+        tx = self.current_transaction()
+        if tx is not None:
+            yield tx.conn
+            return
+
+        if not has_app_context():
+            conn = self.connect()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        conn = getattr(self._local, "writer", None)
+        if conn is None:
+            conn = self._local.writer = self.connect()
+        yield conn
+
+    @contextmanager
+    def reader(self):
+        """Yield a read-only connection for SELECT statements"""
+        tx = self.current_transaction()
+        if tx is not None:
+            # read our own uncommitted writes
+            yield tx.conn
+            return
+
+        if not has_app_context():
+            conn = self.connect(read_only=True)
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        conn = g.get("_db_reader")
+        if conn is None:
+            try:
+                conn = self._read_pool.get_nowait()
+            except queue.Empty:
+                conn = self.connect(read_only=True)
+            g._db_reader = conn
+        yield conn
+
+    def teardown(self, exception=None):
+        writer = getattr(self._local, "writer", None)
+        if writer is not None:
+            self._local.writer = None
+            writer.close()
+
+        reader = g.pop("_db_reader", None)
+        if reader is not None:
+            try:
+                self._read_pool.put_nowait(reader)
+            except queue.Full:
+                reader.close()
+
+
+connections = ConnectionManager()
@@ -1,5 +1,23 @@
 import sqlite3
-from db.sql_commands import createTable, createIndexes
+import sys
+from db.sql_commands import createTable, createIndexes, addColumns
+from db import resume_store, models
+
+
+def add_missing_columns(cursor):
+    """
+    Adds the columns listed in addColumns to tables created by an older schema.
+    Returns the list of "Table.column" names that were added.
+    """
+    added = []
+    for table_name, columns in addColumns.items():
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for column, definition in columns.items():
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {definition}")
+                added.append(f"{table_name}.{column}")
+    return added
 
 
 def create_database():
@@ -19,20 +37,28 @@ def create_database():
         
         print("Creating database tables...")
         
+        # The full-text index has to be filled from existing posts when it is new
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'JobPostsFts'")
+        fts_exists = cursor.fetchone() is not None
+        
         # Define table creation order to respect foreign key dependencies
         table_order = [
             "Recruiters",
             "Freelancers", 
             "Companies",
             "Skills",
+            "SkillAliases",
             "JobPosts",
+            "JobPostsFts",
             "Experiences",
             "Educations",
+            "ResumeFiles",
             "Resumes",
             "PostSkills",
             "RecruiterCompanies", 
             "FreelancerSkills",
             "Applications",
+            "ApplicationScores",
             "FreelancerDetails"
         ]
         
@@ -44,8 +70,19 @@ def create_database():
             else:
                 print(f"⚠ Warning: Table '{table_name}' not found in createTable dict")
         
+        # Bring tables from an older schema up to date
+        for column in add_missing_columns(cursor):
+            print(f"✓ Added column: {column}")
+        
         print("\nCreating indexes for better performance...")
         
+        # replaced by idx_skills_key
+        cursor.execute("DROP INDEX IF EXISTS idx_skills_name")
+        # a prefix of idx_jobposts_feed
+        cursor.execute("DROP INDEX IF EXISTS idx_jobposts_active")
+        # a prefix of idx_applications_freelancer_job
+        cursor.execute("DROP INDEX IF EXISTS idx_applications_freelancer")
+        
         # Create indexes
         for index_name, index_query in createIndexes.items():
             cursor.execute(index_query)
@@ -125,10 +162,140 @@ def create_database():
             
         print("✓ Created automatic timestamp update triggers")
         
+        # Keep the JobPosts full-text index in sync; only changes to the
+        # indexed columns touch it (not the updatedAt trigger above)
+        fts_trigger_queries = [
+            """
+            CREATE TRIGGER IF NOT EXISTS jobposts_fts_insert
+            AFTER INSERT ON JobPosts
+            BEGIN
+                INSERT INTO JobPostsFts(rowid, title, description, location)
+                VALUES (NEW.id, NEW.title, NEW.description, NEW.location);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS jobposts_fts_delete
+            AFTER DELETE ON JobPosts
+            BEGIN
+                INSERT INTO JobPostsFts(JobPostsFts, rowid, title, description, location)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.location);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS jobposts_fts_update
+            AFTER UPDATE OF title, description, location ON JobPosts
+            BEGIN
+                INSERT INTO JobPostsFts(JobPostsFts, rowid, title, description, location)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.location);
+                INSERT INTO JobPostsFts(rowid, title, description, location)
+                VALUES (NEW.id, NEW.title, NEW.description, NEW.location);
+            END;
+            """
+        ]
+        
+        for trigger_query in fts_trigger_queries:
+            cursor.execute(trigger_query)
+        
+        print("✓ Created full-text search triggers")
+        
+        # Forget stored applicant scores when a post's skills or required
+        # experience, or an applicant's skills or experience, change
+        score_trigger_queries = [
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_postskills_insert
+            AFTER INSERT ON PostSkills
+            BEGIN
+                DELETE FROM ApplicationScores WHERE jobPostId = NEW.postId;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_postskills_delete
+            AFTER DELETE ON PostSkills
+            BEGIN
+                DELETE FROM ApplicationScores WHERE jobPostId = OLD.postId;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_postskills_update
+            AFTER UPDATE ON PostSkills
+            BEGIN
+                DELETE FROM ApplicationScores WHERE jobPostId = OLD.postId;
+                DELETE FROM ApplicationScores WHERE jobPostId = NEW.postId;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_freelancerskills_insert
+            AFTER INSERT ON FreelancerSkills
+            BEGIN
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = NEW.freelancerId);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_freelancerskills_delete
+            AFTER DELETE ON FreelancerSkills
+            BEGIN
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = OLD.freelancerId);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_freelancerskills_update
+            AFTER UPDATE ON FreelancerSkills
+            BEGIN
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = OLD.freelancerId);
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = NEW.freelancerId);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_experiences_insert
+            AFTER INSERT ON Experiences
+            BEGIN
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = NEW.freelancerId);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_experiences_delete
+            AFTER DELETE ON Experiences
+            BEGIN
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = OLD.freelancerId);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_experiences_update
+            AFTER UPDATE ON Experiences
+            BEGIN
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = OLD.freelancerId);
+                DELETE FROM ApplicationScores WHERE applicationId IN (SELECT id FROM Applications WHERE freelancerId = NEW.freelancerId);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS application_scores_jobposts_update
+            AFTER UPDATE OF experience ON JobPosts
+            BEGIN
+                DELETE FROM ApplicationScores WHERE jobPostId = NEW.id;
+            END;
+            """
+        ]
+        
+        for trigger_query in score_trigger_queries:
+            cursor.execute(trigger_query)
+        
+        print("✓ Created applicant score triggers")
+        
+        if not fts_exists:
+            cursor.execute("INSERT INTO JobPostsFts(JobPostsFts) VALUES ('rebuild')")
+            print("✓ Indexed existing job posts for full-text search")
+        
+        # Skills from before skillKey existed are keyed (and merged) below
+        cursor.execute("SELECT 1 FROM Skills WHERE skillKey IS NULL LIMIT 1")
+        unkeyed_skills = cursor.fetchone() is not None
+        
         # Commit all changes
         conn.commit()
         conn.close()
         
+        if unkeyed_skills and not normalize_skills():
+            return False
+        
         print("\n🎉 Database setup completed successfully!")
         return True
         
@@ -161,14 +328,18 @@ def drop_all_tables():
         
         # Drop tables in reverse order (updated to PascalCase)
         table_order = [
+            "ApplicationScores",
             "Applications",
             "FreelancerSkills", 
             "RecruiterCompanies",
             "PostSkills",
             "Resumes",
+            "ResumeFiles",
+            "JobPostsFts",
             "Educations",
             "Experiences",
             "JobPosts",
+            "SkillAliases",
             "Skills",
             "Companies",
             "Freelancers",
@@ -211,7 +382,7 @@ def reset_database():
 
 def check_database_status():
     """
-    Checks if all required tables exist in the database.
+    Checks if all required tables, columns and indexes exist in the database.
     """
     try:
         conn = sqlite3.connect("database.db")
@@ -234,12 +405,37 @@ def check_database_status():
                 print(f"❌ {table} (MISSING)")
                 missing_tables.append(table)
         
+        missing_columns = []
+        for table, columns in addColumns.items():
+            if table not in existing_tables:
+                continue
+            cursor.execute(f"PRAGMA table_info({table})")
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            for column in columns:
+                if column not in existing_columns:
+                    print(f"❌ {table}.{column} (MISSING)")
+                    missing_columns.append(f"{table}.{column}")
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        existing_indexes = {row[0] for row in cursor.fetchall()}
+        missing_indexes = [name for name in createIndexes if name not in existing_indexes]
+        for name in missing_indexes:
+            print(f"❌ {name} (MISSING)")
+        
         conn.close()
         
         if missing_tables:
             print(f"\n⚠ Missing tables: {', '.join(missing_tables)}")
             print("Run create_database() to create missing tables.")
             return False
+        elif missing_columns:
+            print(f"\n⚠ Missing columns: {', '.join(missing_columns)}")
+            print("Run create_database() to add missing columns.")
+            return False
+        elif missing_indexes:
+            print(f"\n⚠ Missing indexes: {', '.join(missing_indexes)}")
+            print("Run create_database() to create missing indexes.")
+            return False
         else:
             print("\n✅ All tables exist!")
             return True
@@ -249,10 +445,141 @@ def check_database_status():
         return False
 
 
+def rebuild_search_index():
+    """
+    Rebuilds the JobPosts full-text index from the JobPosts table.
+    Use after bulk changes made with the triggers missing or disabled.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect("database.db")
+        conn.execute("INSERT INTO JobPostsFts(JobPostsFts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO JobPostsFts(JobPostsFts) VALUES ('optimize')")
+        conn.commit()
+        conn.close()
+        print("✅ Rebuilt the job search index")
+        return True
+        
+    except sqlite3.Error as e:
+        print(f"❌ Database error while rebuilding the search index: {e}")
+        if conn:
+            conn.close()
+        return False
+
+
+def normalize_skills():
+    """
+    Fills Skills.skillKey for skills created before it existed, merging
+    skills whose names only differ in case or spacing ("Python", "python ")
+    into the oldest one. Safe to re-run.
+    Returns True if successful, False otherwise.
+    """
+    merged = models.Skills.normalize_keys()
+    if merged is None:
+        print("❌ Failed to normalise skill names")
+        return False
+    print(f"✅ Normalised skill names, merged {merged} duplicate skill(s)")
+    return True
+
+
+def merge_skills(skill_name, duplicate_names):
+    """
+    Merges the skills named duplicate_names into the one named skill_name:
+    their posts and freelancers move over and their names become aliases.
+    Returns True if successful, False otherwise.
+    """
+    skill = models.Skills.get_by_name(skill_name)
+    if skill is None:
+        print(f"❌ Unknown skill: {skill_name}")
+        return False
+    
+    duplicate_ids = []
+    for name in duplicate_names:
+        duplicate = models.Skills.get_by_name(name)
+        if duplicate is None:
+            print(f"❌ Unknown skill: {name}")
+            return False
+        duplicate_ids.append(duplicate.id)
+    
+    if models.Skills.merge(skill.id, duplicate_ids) is None:
+        print(f"❌ Failed to merge skills into {skill.skill}")
+        return False
+    print(f"✅ Merged {', '.join(duplicate_names)} into {skill.skill}")
+    return True
+
+
+def migrate_resume_blobs(store=None, vacuum=True):
+    """
+    Moves PDFs stored inline in Resumes.pdfData into the resume store.
+    Each row is streamed out of its BLOB, saved under its content hash and
+    left with an empty pdfData, so identical PDFs end up stored once.
+    Safe to re-run: rows that already have a contentHash are skipped.
+    Returns the number of migrated rows, or None on error.
+    """
+    store = store or resume_store.get_store()
+    conn = None
+    migrated = 0
+    try:
+        conn = sqlite3.connect("database.db")
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        
+        cursor.execute("SELECT id FROM Resumes WHERE contentHash IS NULL AND length(pdfData) > 0")
+        resumeIds = [row[0] for row in cursor.fetchall()]
+        print(f"Moving {len(resumeIds)} resume(s) out of the database...")
+        
+        for resumeId in resumeIds:
+            with conn.blobopen("Resumes", "pdfData", resumeId, readonly=True) as blob:
+                contentHash, fileSize = store.save(blob)
+            
+            # one transaction per row, so an interrupted run loses nothing
+            cursor.execute(
+                "INSERT INTO ResumeFiles (contentHash, fileSize, refCount) VALUES (?, ?, 1) "
+                "ON CONFLICT(contentHash) DO UPDATE SET refCount = refCount + 1",
+                (contentHash, fileSize)
+            )
+            cursor.execute(
+                "UPDATE Resumes SET contentHash = ?, fileSize = ?, pdfData = X'' WHERE id = ?",
+                (contentHash, fileSize, resumeId)
+            )
+            conn.commit()
+            migrated += 1
+            print(f"✓ Resume {resumeId} -> {contentHash}")
+        
+        if vacuum and migrated:
+            # give the freed BLOB pages back to the filesystem
+            conn.execute("VACUUM")
+        
+        conn.close()
+        print(f"\n✅ Migrated {migrated} resume(s)")
+        return migrated
+        
+    except sqlite3.Error as e:
+        print(f"\n❌ Database error during resume migration: {e}")
+        if conn:
+            conn.rollback()
+            conn.close()
+        return None
+
+
 # Convenience function to run setup
 if __name__ == "__main__":
     # Example usage:
-    create_database()          # Create all tables, indexes, and triggers
-    check_database_status()    # Check what tables exist
-    # reset_database()           # Drop and recreate everything
-    pass
\ No newline at end of file
+    #   python -m db.database_setup                  create tables, indexes and triggers
+    #   python -m db.database_setup migrate-resumes  move resume BLOBs into the resume store
+    #   python -m db.database_setup rebuild-search   refill the job full-text index
+    #   python -m db.database_setup merge-skills JavaScript js ecmascript
+    #                                                merge the later skills into the first
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate-resumes":
+        create_database()
+        migrate_resume_blobs()
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild-search":
+        create_database()
+        rebuild_search_index()
+    elif len(sys.argv) > 3 and sys.argv[1] == "merge-skills":
+        create_database()
+        merge_skills(sys.argv[2], sys.argv[3:])
+    else:
+        create_database()          # Create all tables, indexes, and triggers
+        check_database_status()    # Check what tables exist
+        # reset_database()           # Drop and recreate everything
\ No newline at end of file
@@ -1,100 +1,722 @@
 import pydantic
 import typing
 import sqlite3
+import itertools
+import base64
+import json
+import re
+import time
 from db.sql_commands import *
+from flask import g, has_app_context
+from db.connection import connections, Rollback
+from db import resume_store, search_cache, skill_index
 from datetime import datetime
 from typing import Optional
 
 
-def execute(query, params):
-    conn = None
+# rows per executemany() call in BaseModel.insertMany
+INSERT_BATCH_SIZE = 1000
+
+# most ids bound to one "WHERE id IN (...)" statement in DataModel.getMany
+IN_CHUNK_SIZE = 512
+
+# job posts per page of JobPosts.search
+JOB_PAGE_SIZE = 10
+
+# JobPosts.search facets: lower bounds of the experience buckets (years),
+# width of the salary buckets and how many skills/locations are listed
+EXPERIENCE_BUCKETS = (0, 2, 5, 10)
+SALARY_BUCKET_SIZE = 100000
+FACET_LIMIT = 10
+
+# most skill index candidates bound to one JobPosts.search query; larger
+# sets are left to the PostSkills semi-join rather than shipped as JSON
+SKILL_CANDIDATE_LIMIT = 1000
+
+# JobPosts.search totals are counted exactly up to this many posts; larger
+# ones are estimated from a count cached per filter signature
+SEARCH_COUNT_LIMIT = 1000
+
+# whether freelancer ? applied to job post jp, from the UNIQUE(jobPostId, freelancerId) index
+APPLIED_CHECK = "EXISTS (SELECT 1 FROM Applications a WHERE a.freelancerId = ? AND a.jobPostId = jp.id)"
+
+# (model name, operation, where columns, target columns, IN size) -> SQL text
+_compiledQueries = {}
+
+# seconds a name stays in the Skills.resolve_many cache; writes made by
+# other processes (e.g. the merge-skills command) are only seen after it
+SKILL_CACHE_TTL = 60
+
+# normalised skill name -> (Skills id, monotonic time cached), filled by Skills.resolve_many
+_skillIds = {}
+
+
+def _buildSelect(table, where, columns, size=0):
+    query = "SELECT " + (", ".join(columns) if columns else "*") + " FROM " + table
+    if where:
+        query += " WHERE " + " AND ".join(f"{k} = ?" for k in where)
+    return query
+
+
+def _buildSelectIn(table, where, columns, size=0):
+    return (_buildSelect(table, (), columns)
+            + " WHERE " + where[0] + " IN (" + ", ".join("?" * size) + ")")
+
+
+def _buildUpdate(table, where, columns, size=0):
+    return ("UPDATE " + table + " SET " + ", ".join(f"{k} = ?" for k in columns)
+            + " WHERE " + " AND ".join(f"{k} = ?" for k in where))
+
+
+def _buildDelete(table, where, columns, size=0):
+    return "DELETE FROM " + table + " WHERE " + " AND ".join(f"{k} = ?" for k in where)
+
+
+_queryBuilders = {
+    "select": _buildSelect,
+    "selectIn": _buildSelectIn,
+    "update": _buildUpdate,
+    "delete": _buildDelete,
+}
+
+
+def _inChunks(values, chunk_size=IN_CHUNK_SIZE):
+    """
+    Split values into IN-list chunks padded to a power of two.
+    
+    Padding repeats the last value, which doesn't change an IN result but
+    keeps the number of distinct statements (and cache entries) small.
+    """
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        size = 1
+        while size < len(chunk):
+            size *= 2
+        yield chunk + [chunk[-1]] * (size - len(chunk))
+
+
+# (model class, row column names, projected columns) -> row reader, see BaseModel.rowReader
+_rowReaders = {}
+
+
+def _shape(values):
+    """Split a column->value mapping into a sorted column tuple and matching params"""
+    columns = tuple(sorted(values))
+    return columns, [values[k] for k in columns]
+
+
+def encode_cursor(direction, *key):
+    """Opaque page token for keyset pagination: "next"/"prev" plus the sort key of the edge row"""
+    raw = json.dumps([direction, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token, size):
+    """
+    Inverse of encode_cursor for a sort key of `size` values.
+    Returns (direction, key), or None for a missing or malformed token.
+    """
+    if not token:
+        return None
     try:
-        conn = sqlite3.connect("database.db")
-        conn.execute("PRAGMA foreign_keys = ON")
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        lastrowid = cursor.lastrowid
-        conn.close()
-        return lastrowid
-    except Exception as e:
-        print("\nError in execute query: ", e)
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ("next", "prev") or len(key) != size:
+        return None
+    return direction, key
+
+
+def keyset_page(data, direction, key, page_size, sort_key):
+    """
+    Trim rows read for one keyset page and work out its neighbours.
+    
+    Args:
+        data (list): Up to page_size + 1 rows, read in page order for "next"
+            and in reverse for "prev"; the extra row means there is more
+        direction (str), key: As returned by decode_cursor, key None for
+            the first page
+        page_size (int): Rows per page
+        sort_key: Function giving the sort key values of a row
+        
+    Returns:
+        tuple: (rows in page order, next_cursor, prev_cursor)
+    """
+    more = len(data) > page_size
+    data = data[:page_size]
+    if direction == "prev":
+        data = data[::-1]
+    if not data:
+        return data, None, None
+    
+    if direction == "next":
+        has_next, has_prev = more, key is not None
+    else:
+        has_next, has_prev = True, more
+    
+    next_cursor = encode_cursor("next", *sort_key(data[-1])) if has_next else None
+    prev_cursor = encode_cursor("prev", *sort_key(data[0])) if has_prev else None
+    return data, next_cursor, prev_cursor
+
+
+def fts_query(text):
+    """
+    FTS5 MATCH expression for free text typed by a user: every word becomes
+    a quoted prefix term, so "pyth dev" finds "Python Developer" and no
+    input can inject FTS operators. Returns None when there are no words.
+    """
+    terms = re.findall(r"\w+", text or "")
+    if not terms:
         return None
-    finally:
-        if conn:
-            conn.close()
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def transaction():
+    """
+    Group several model writes into one atomic commit.
+
+        with models.transaction():
+            fId = Freelancers(...).insert()
+            FreelancerDetails(freelancerId=fId, ...).insert()
+
+    A failed write (one that returns None) or an exception inside the block
+    rolls everything back. Leaving the block early any other way commits
+    the writes made so far, so raise Rollback instead:
+
+        try:
+            with models.transaction():
+                if FreelancerDetails(...).insert() is None:
+                    raise models.Rollback("Signup failed")
+        except models.Rollback as e:
+            return jsonify({"error": str(e)}), 500
+    """
+    return connections.transaction()
+
+
+def execute(query, params):
+    with connections.writer() as conn:
+        tx = connections.current_transaction()
+        try:
+            cursor = conn.execute(query, params)
+            if tx is None:
+                conn.commit()
+            return cursor.lastrowid
+        except Exception as e:
+            print("\nError in execute query: ", e)
+            if tx is None:
+                conn.rollback()
+            else:
+                tx.mark_failed()
+            return None
+
+
+def executemany(query, seq_of_params):
+    """Run one statement for every parameter set, returns the last inserted rowid"""
+    with connections.writer() as conn:
+        tx = connections.current_transaction()
+        try:
+            conn.executemany(query, seq_of_params)
+            lastrowid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            if tx is None:
+                conn.commit()
+            return lastrowid
+        except Exception as e:
+            print("\nError in executemany query: ", e)
+            if tx is None:
+                conn.rollback()
+            else:
+                tx.mark_failed()
+            return None
+
+
+def execute_returning(query, params):
+    """Run a write with a RETURNING clause, returns its rows (None on failure)"""
+    with connections.writer() as conn:
+        tx = connections.current_transaction()
+        try:
+            rows = conn.execute(query, params).fetchall()
+            if tx is None:
+                conn.commit()
+            return rows
+        except Exception as e:
+            print("\nError in execute query: ", e)
+            if tx is None:
+                conn.rollback()
+            else:
+                tx.mark_failed()
+            return None
 
 
 def fetch(query, params, one=False):
-    conn = None
+    with connections.reader() as conn:
+        cursor = None
+        try:
+            cursor = conn.execute(query, params)
+            if one:
+                return cursor.fetchone()
+            return cursor.fetchall()
+        except Exception as e:
+            print("\nError in fetch query: ", e)
+            return None
+        finally:
+            # reset the statement so a half-read cursor doesn't pin a snapshot
+            if cursor is not None:
+                cursor.close()
+
+
+# model class name -> functions called with the rows of each committed write
+_writeListeners = {}
+
+
+def on_write(model, listener):
+    """
+    Call listener(rows) after every committed write made through a model
+    (given by class name). rows lists the column values each write was
+    given, at least the key columns: {"id": ...} for deletes, the where
+    conditions for junction deletes and updates. It is None when the
+    written rows are unknown.
+    """
+    _writeListeners.setdefault(model, []).append(listener)
+
+
+def _committed(model, rows):
+    search_cache.bump(model, rows)
+    for listener in _writeListeners.get(model, ()):
+        try:
+            listener(rows)
+        except Exception as e:
+            print("\nError in write listener: ", e)
+
+
+def clear_skill_cache():
+    """Forget every name cached by Skills.resolve_many (e.g. after editing Skills outside the models)"""
+    _skillIds.clear()
+
+
+def _forgetSkills(rows):
+    """Drop renamed or deleted skills from the Skills.resolve_many cache"""
+    if rows is None or any("id" not in row for row in rows):
+        clear_skill_cache()
+        return
+    written = {row["id"] for row in rows}
+    for key, (skillId, _) in list(_skillIds.items()):
+        if skillId in written:
+            _skillIds.pop(key, None)
+
+
+def identity_map(model):
+    """
+    The instances of `model` (a class name) already loaded by id in the
+    current app context, by id; None outside one. DataModel.get(id=...)
+    and getMany answer from it, and writes through the model evict the
+    rows they touch, as does rolling back a transaction the rows were read
+    in. Rows changed by cascades or triggers are not evicted.
+    """
+    if not has_app_context():
+        return None
+    return g.setdefault("identityMap", {}).setdefault(model, {})
+
+
+def _rowId(value):
+    """An id as the identity map keys it, None if it can't be one"""
     try:
-        conn = sqlite3.connect("database.db")
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        if one:
-            result = cursor.fetchone()
-        else:
-            result = cursor.fetchall()
-        conn.close()
-        return result
-    except Exception as e:
-        print("\nError in fetch query: ", e)
+        return int(value)
+    except (TypeError, ValueError):
         return None
-    finally:
-        if conn:
-            conn.close()
+
+
+def _modelClass(name):
+    """Model class by name, so relations can point at models defined later"""
+    return globals()[name]
+
+
+class BelongsTo:
+    """Many-to-one: `field` on this model holds the id of a `model` row"""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+
+    def load(self, instances):
+        """The related instance (or None) for each of `instances`, in one query"""
+        targets = _modelClass(self.model).getMany(getattr(i, self.field) for i in instances)
+        return [targets.get(getattr(i, self.field)) for i in instances]
+
+
+class HasMany:
+    """One-to-many: the `model` rows whose `field` holds this row's id"""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+
+    def load(self, instances):
+        grouped = {}
+        for row in _modelClass(self.model).getAllIn(self.field, [i.id for i in instances]):
+            grouped.setdefault(getattr(row, self.field), []).append(row)
+        return [grouped.get(i.id, []) for i in instances]
+
+
+class Through:
+    """
+    Many-to-many through a junction table: `junction` rows whose `field`
+    holds this row's id, followed to `model` through their `targetField`.
+    """
+
+    def __init__(self, junction, field, model, targetField):
+        self.junction = junction
+        self.field = field
+        self.model = model
+        self.targetField = targetField
+
+    def load(self, instances):
+        links = _modelClass(self.junction).getAllIn(self.field, [i.id for i in instances])
+        targets = _modelClass(self.model).getMany(getattr(link, self.targetField) for link in links)
+        grouped = {}
+        for link in links:
+            target = targets.get(getattr(link, self.targetField))
+            if target is not None:
+                grouped.setdefault(getattr(link, self.field), []).append(target)
+        return [grouped.get(i.id, []) for i in instances]
 
 
 class BaseModel(pydantic.BaseModel):
+    # auto-generated fields left out of INSERT statements
+    insertExclude: typing.ClassVar[set] = {'id', 'createdAt', 'updatedAt'}
+    # heavy columns left out of reads by default and loaded on first access
+    deferredFields: typing.ClassVar[set] = set()
+    # name -> BelongsTo / HasMany / Through, readable as attributes and prefetchable
+    relations: typing.ClassVar[dict] = {}
+
+    # related objects loaded so far, by relation name
+    _related: dict = pydantic.PrivateAttr(default_factory=dict)
+
+    def __getattr__(self, item):
+        # relations not prefetched are loaded on first access
+        relation = type(self).relations.get(item)
+        if relation is not None:
+            related = self._related
+            if item not in related:
+                related[item] = relation.load([self])[0]
+            return related[item]
+        return super().__getattr__(item)
+
     @property
     def tableName(self):
         # Use class name directly (PascalCase) to match SQL table names
         return self.__class__.__name__
 
+    def insertParams(self):
+        """Values for this model's insertQueries statement, in column order"""
+        return list(self.model_dump(exclude=self.insertExclude).values())
+
     def insert(self):
-        data = self.model_dump()
-        # Remove auto-generated fields
-        exclude_fields = {'id', 'createdAt', 'updatedAt'}
-        filtered_data = {k: v for k, v in data.items() if k not in exclude_fields}
-        return execute(insertQueries[self.tableName], list(filtered_data.values()))
+        values = self.model_dump(exclude=self.insertExclude)
+        rowId = execute(insertQueries[self.tableName], list(values.values()))
+        if "id" in type(self).model_fields:
+            values["id"] = rowId
+        return self.recordWrite(rowId, [values])
+
+    @classmethod
+    def recordWrite(cls, result, rows=None):
+        """
+        Pass through the result of a write to this model's table. If it
+        succeeded, once the write has committed: bump the table's generation
+        (see search_cache), so cached results built on it are dropped, and
+        call the listeners registered with on_write.
+        
+        Args:
+            result: What execute()/executemany() returned, None on failure
+            rows (list): Column values of the rows written, None if unknown
+        """
+        # dropped even if the write failed; they are simply read again
+        known = identity_map(cls.__name__) if "id" in cls.model_fields else None
+        if known:
+            if rows is None or any("id" not in row for row in rows):
+                known.clear()
+            else:
+                for row in rows:
+                    known.pop(_rowId(row["id"]), None)
+        
+        if result is not None:
+            connections.on_commit(lambda: _committed(cls.__name__, rows))
+        return result
+
+    @classmethod
+    def compiledQuery(cls, operation, where=(), columns=(), size=0):
+        """
+        SQL text for an operation on this model, built once per column shape.
+        
+        Args:
+            operation (str): "select", "selectIn", "update" or "delete"
+            where (tuple): Sorted columns compared with = in the WHERE clause,
+                or the single column matched by IN for "selectIn"
+            columns (tuple): Sorted SET columns for "update", or the
+                projected columns for "select"/"selectIn" (empty means *)
+            size (int): Number of IN placeholders for "selectIn"
+            
+        Returns:
+            str: The statement, identical for every call with the same shape,
+            so sqlite3's statement cache can reuse the prepared statement
+        """
+        key = (cls.__name__, operation, where, columns, size)
+        query = _compiledQueries.get(key)
+        if query is None:
+            # column names are spliced into SQL, so only model fields are allowed
+            unknown = [k for k in where + columns if k not in cls.model_fields]
+            if unknown:
+                raise ValueError(f"Unknown column(s) for {cls.__name__}: {', '.join(unknown)}")
+            query = _compiledQueries[key] = _queryBuilders[operation](cls.__name__, where, columns, size)
+        return query
+
+    @classmethod
+    def selectColumns(cls, fields=None, defer=None):
+        """
+        Columns to read for get/getAll.
+        
+        Args:
+            fields: Only read these fields (plus id, so the rest can be loaded later)
+            defer: Fields to leave out; None means the model's deferredFields
+            
+        Returns:
+            tuple: Columns in model field order, or () to read every column
+        """
+        requested = set(fields) if fields is not None else set(defer if defer is not None else cls.deferredFields)
+        unknown = requested - cls.model_fields.keys()
+        if unknown:
+            raise ValueError(f"Unknown field(s) for {cls.__name__}: {', '.join(sorted(unknown))}")
+        
+        if fields is not None:
+            return tuple(k for k in cls.model_fields if k in requested or k == "id")
+        if not requested:
+            return ()
+        return tuple(k for k in cls.model_fields if k not in requested)
+
+    @classmethod
+    def rowReader(cls, keys, columns=()):
+        """
+        A function turning database rows into dicts shaped like model_dump(),
+        built once per row shape.
+        
+        Rows read back from the database already satisfy the table
+        constraints, so no validation runs: the reader only fills defaults
+        for fields the table lacks and turns 0/1 into bool for BOOLEAN columns.
+        
+        Args:
+            keys: Column names of the rows, in order (extra columns are ignored)
+            columns (tuple): The projected columns, () when the rows came from *
+        """
+        cacheKey = (cls, tuple(keys), columns)
+        reader = _rowReaders.get(cacheKey)
+        if reader is not None:
+            return reader
+        
+        keys = tuple(keys)
+        names = columns or tuple(cls.model_fields)
+        fields = cls.model_fields
+        bools = tuple(k for k in names if fields[k].annotation in (bool, Optional[bool]))
+        # SELECT * and projections list columns in field order, so rows zip straight in
+        aligned = keys[:len(names)] == names
+        index = {k: i for i, k in enumerate(keys)}
+        positions = tuple((k, index.get(k)) for k in names)
+        defaults = {k: fields[k].get_default(call_default_factory=True)
+                    for k in names if k not in index and not fields[k].is_required()}
+        
+        def reader(row):
+            if aligned:
+                data = dict(zip(names, row))
+            else:
+                data = {k: row[i] if i is not None else defaults.get(k) for k, i in positions}
+            for k in bools:
+                if data[k] is not None:
+                    data[k] = bool(data[k])
+            return data
+        
+        _rowReaders[cacheKey] = reader
+        return reader
+
+    @classmethod
+    def rowDict(cls, row, columns=()):
+        """A single database row as a plain dict shaped like model_dump()"""
+        return cls.rowReader(row.keys(), columns)(row)
+
+    @classmethod
+    def fromTrusted(cls, data):
+        """
+        Build an instance from already-checked field values without validation.
+        
+        Fields missing from `data` stay unset (not defaulted), so DataModel
+        loads them on first access.
+        """
+        # what model_construct does, minus the per-field default handling
+        instance = cls.__new__(cls)
+        object.__setattr__(instance, "__dict__", data)
+        object.__setattr__(instance, "__pydantic_fields_set__", set(data))
+        object.__setattr__(instance, "__pydantic_extra__", None)
+        object.__setattr__(instance, "__pydantic_private__", {"_related": {}})
+        return instance
+
+    @classmethod
+    def fromRow(cls, row, columns=()):
+        """
+        Build an instance from a database row read with `columns` (() for *).
+        
+        Fields left out of `columns` stay unset instead of taking their
+        defaults, and are loaded when first accessed.
+        """
+        return cls.fromTrusted(cls.rowDict(row, columns))
+
+    @classmethod
+    def insertMany(cls, models, batch_size=INSERT_BATCH_SIZE):
+        """
+        Insert many rows of this model in one transaction.
+        
+        Args:
+            models: Any iterable of instances, consumed lazily
+            batch_size (int): Rows passed to each executemany() call
+            
+        Returns:
+            List[int] or None: The generated ids in input order, or None if
+            any row failed (in which case nothing is written)
+        """
+        query = insertQueries[cls.__name__]
+        models = iter(models)
+        ids = []
+        
+        with transaction():
+            while True:
+                rows = [model.model_dump(exclude=cls.insertExclude) for model in itertools.islice(models, batch_size)]
+                if not rows:
+                    break
+                
+                lastId = executemany(query, [list(row.values()) for row in rows])
+                if lastId is None:
+                    return None
+                # rowids are handed out consecutively inside the write transaction
+                batchIds = range(lastId - len(rows) + 1, lastId + 1)
+                ids.extend(batchIds)
+                if "id" in cls.model_fields:
+                    for row, rowId in zip(rows, batchIds):
+                        row["id"] = rowId
+                cls.recordWrite(lastId, rows)
+        
+        return ids
     
     @classmethod
-    def get(cls, **kwargs):
+    def prefetchRelated(cls, instances, prefetch):
+        """
+        Load relations for many instances with one batched query per relation.
+        
+        Args:
+            instances (list): Instances of this model
+            prefetch: Relation names; "jobPost.company" follows a relation
+                of the related model as well
+            
+        Returns:
+            list: `instances`, with the relations readable as attributes
+        """
+        nested = {}
+        for path in prefetch:
+            name, _, rest = path.partition(".")
+            if name not in cls.relations:
+                raise ValueError(f"Unknown relation for {cls.__name__}: {name}")
+            nested.setdefault(name, [])
+            if rest:
+                nested[name].append(rest)
+        
+        for name, rest in nested.items():
+            relation = cls.relations[name]
+            pending = [i for i in instances if name not in i._related]
+            if pending:
+                for instance, value in zip(pending, relation.load(pending)):
+                    instance._related[name] = value
+            if rest:
+                related = []
+                for instance in instances:
+                    value = instance._related[name]
+                    if isinstance(value, list):
+                        related.extend(value)
+                    elif value is not None:
+                        related.append(value)
+                if related:
+                    type(related[0]).prefetchRelated(related, rest)
+        return instances
+
+    @classmethod
+    def get(cls, fields=None, defer=None, prefetch=(), **kwargs):
         if not kwargs:
             return None
 
-        data = fetch(
-            "SELECT * FROM " + cls.__name__ + " WHERE " + " AND ".join([f"{k} = ?" for k in kwargs]),
-            list(kwargs.values()),
-            one=True
-        )
+        where, params = _shape(kwargs)
+        columns = cls.selectColumns(fields, defer)
+        data = fetch(cls.compiledQuery("select", where, columns), params, one=True)
         if not data:
             return None
         
-        a = cls(**dict(data))
+        a = cls.fromRow(data, columns)
+        if prefetch:
+            cls.prefetchRelated([a], prefetch)
         return a
 
     @classmethod
-    def getAll(cls, **kwargs):
-        if not kwargs:
-            data = fetch("SELECT * FROM " + cls.__name__, ())
-        else:
-            data = fetch(
-                "SELECT * FROM " + cls.__name__ + " WHERE " + " AND ".join([f"{k} = ?" for k in kwargs]),
-                list(kwargs.values())
-            )
+    def getAll(cls, fields=None, defer=None, prefetch=(), **kwargs):
+        where, params = _shape(kwargs)
+        columns = cls.selectColumns(fields, defer)
+        data = fetch(cls.compiledQuery("select", where, columns), params)
         
         if not data:
             return []
         
+        read = cls.rowReader(data[0].keys(), columns)
+        result = [cls.fromTrusted(read(row)) for row in data]
+        if prefetch:
+            cls.prefetchRelated(result, prefetch)
+        return result
+
+    @classmethod
+    def getAllIn(cls, column, values, fields=None, defer=None, prefetch=()):
+        """
+        Load the rows whose `column` is any of `values`, with one query per
+        IN_CHUNK_SIZE values.
+        
+        Args:
+            column (str): Column matched with IN
+            values: Any iterable; duplicates and None are ignored
+            fields, defer, prefetch: As for getAll
+            
+        Returns:
+            list: Matching instances
+        """
+        values = [v for v in dict.fromkeys(values) if v is not None]
+        columns = cls.selectColumns(fields, defer)
         result = []
-        for row in data:
-            instance = cls(**dict(row))
-            result.append(instance)
+        for chunk in _inChunks(values):
+            data = fetch(cls.compiledQuery("selectIn", (column,), columns, len(chunk)), chunk)
+            if not data:
+                continue
+            read = cls.rowReader(data[0].keys(), columns)
+            result.extend(cls.fromTrusted(read(row)) for row in data)
+        if prefetch:
+            cls.prefetchRelated(result, prefetch)
         return result
 
+    @classmethod
+    def getAllDicts(cls, fields=None, defer=None, **kwargs):
+        """
+        Same as getAll, but returns plain dicts (as model_dump() would) for
+        read-only listings that don't need model instances.
+        """
+        where, params = _shape(kwargs)
+        columns = cls.selectColumns(fields, defer)
+        data = fetch(cls.compiledQuery("select", where, columns), params)
+        
+        if not data:
+            return []
+        
+        read = cls.rowReader(data[0].keys(), columns)
+        return [read(row) for row in data]
+
 
 class DataModel(BaseModel):
     """For tables with id field"""
@@ -102,21 +724,144 @@ class DataModel(BaseModel):
     createdAt: Optional[str] = None
     updatedAt: Optional[str] = None
 
+    @classmethod
+    def get(cls, fields=None, defer=None, prefetch=(), **kwargs):
+        # a lookup by id alone is answered from the identity map when it can be
+        rowId = _rowId(kwargs["id"]) if list(kwargs) == ["id"] else None
+        known = identity_map(cls.__name__) if rowId is not None else None
+        if known is None:
+            return super().get(fields, defer, prefetch, **kwargs)
+        
+        instance = known.get(rowId)
+        if instance is None:
+            instance = super().get(fields, defer, id=rowId)
+            if instance is None:
+                return None
+            cls._remember(known, [instance])
+        else:
+            missing = cls._missingColumns(instance, fields, defer)
+            if missing:
+                instance.loadDeferred(*missing)
+        if prefetch:
+            cls.prefetchRelated([instance], prefetch)
+        return instance
+
+    @classmethod
+    def getMany(cls, ids, fields=None, defer=None, prefetch=()):
+        """
+        Load many rows by id with one query per IN_CHUNK_SIZE ids. Inside
+        an app context, rows already in the identity map with the requested
+        columns loaded are not read again.
+        
+        Args:
+            ids: Any iterable of ids; duplicates and None are ignored
+            fields, defer, prefetch: As for get/getAll
+            
+        Returns:
+            dict: id -> instance for the ids that exist
+        """
+        known = identity_map(cls.__name__)
+        if known is None:
+            return {instance.id: instance for instance in cls.getAllIn("id", ids, fields, defer, prefetch)}
+        
+        ids = [rowId for rowId in dict.fromkeys(map(_rowId, ids)) if rowId is not None]
+        found = {
+            rowId: known[rowId] for rowId in ids
+            if rowId in known and not cls._missingColumns(known[rowId], fields, defer)
+        }
+        read = cls.getAllIn("id", [rowId for rowId in ids if rowId not in found], fields, defer)
+        for instance in cls._remember(known, read):
+            found[instance.id] = instance
+        if prefetch:
+            cls.prefetchRelated(list(found.values()), prefetch)
+        return found
+
+    @classmethod
+    def _missingColumns(cls, instance, fields, defer):
+        """Columns a get/getAll with `fields` and `defer` reads that `instance` lacks"""
+        columns = cls.selectColumns(fields, defer) or tuple(cls.model_fields)
+        return [k for k in columns if k not in instance.__dict__]
+
+    @classmethod
+    def _remember(cls, known, instances):
+        """
+        Put freshly read instances in the identity map `known` and return
+        the ones to hand out: an instance already mapped for the same row
+        only takes the columns it lacked, so callers keep sharing it. Rows
+        read inside a transaction are dropped again if it rolls back.
+        """
+        remembered = []
+        for instance in instances:
+            existing = known.get(instance.id)
+            if existing is None:
+                known[instance.id] = existing = instance
+            else:
+                values = {k: v for k, v in instance.__dict__.items() if k not in existing.__dict__}
+                existing.__dict__.update(values)
+                existing.__pydantic_fields_set__.update(values)
+            remembered.append(existing)
+        
+        if remembered and connections.current_transaction() is not None:
+            rowIds = [instance.id for instance in remembered]
+            def forget():
+                for rowId in rowIds:
+                    known.pop(rowId, None)
+            connections.on_rollback(forget)
+        return remembered
+
+    def __getattr__(self, item):
+        # deferred columns are read from the database on first access
+        if item in type(self).model_fields and item not in self.__dict__:
+            self.loadDeferred(item)
+            return self.__dict__[item]
+        return super().__getattr__(item)
+
+    def loadDeferred(self, *fields):
+        """Read columns left out when this instance was loaded (all of them by default)"""
+        fields = fields or tuple(k for k in type(self).model_fields if k not in self.__dict__)
+        data = fetch(self.compiledQuery("select", ("id",), fields), (self.id,), one=True)
+        if data is None:
+            raise AttributeError(f"{self.tableName} row {self.id} could not be read")
+        
+        values = self.rowDict(data, fields)
+        self.__dict__.update(values)
+        self.__pydantic_fields_set__.update(values)
+        return self
+
     def update(self, **kwargs):
         if not kwargs:
+            # unloaded deferred fields are not part of the dump, so they keep their stored value
             kwargs = self.model_dump(exclude={"id", "createdAt", "updatedAt"})
 
-        return execute(
-            "UPDATE " + self.__class__.__name__ + " SET " + ", ".join([f"{k} = ?" for k in kwargs]) + " WHERE id = ?",
-            list(kwargs.values()) + [self.id]
-        )
+        columns, params = _shape(kwargs)
+        return self.recordWrite(execute(
+            self.compiledQuery("update", ("id",), columns),
+            params + [self.id]
+        ), self._writtenRows(dict(kwargs, id=self.id)))
         
     def delete(self):
-        return execute(
-            "DELETE FROM " + self.__class__.__name__ + " WHERE id = ?",
-            (self.id,)
+        return self.recordWrite(
+            execute(self.compiledQuery("delete", ("id",)), (self.id,)),
+            self._writtenRows({"id": self.id})
         )
 
+    def _writtenRows(self, row):
+        """
+        The rows to record for a write to this instance's row: `row`, plus
+        the column search_cache scopes the table by (see SCOPED_TABLES), so
+        only that scope's cached results go stale. A write that moves the
+        row to another scope records the old one as well.
+        """
+        column = search_cache.SCOPED_TABLES.get(type(self).__name__)
+        current = self.__dict__.get(column) if column else None
+        if current is None:
+            return [row]
+        if column not in row:
+            return [dict(row, **{column: current})]
+        if row[column] != current:
+            return [row, {"id": self.id, column: current}]
+        return [row]
+
 
 class JunctionModel(BaseModel):
     """For junction tables without id field"""
@@ -126,17 +871,17 @@ class JunctionModel(BaseModel):
         if not kwargs:
             kwargs = self.model_dump(exclude={"createdAt"})
 
-        return execute(
-            "DELETE FROM " + self.__class__.__name__ + " WHERE " + " AND ".join([f"{k} = ?" for k in kwargs]),
-            list(kwargs.values())
-        )
+        where, params = _shape(kwargs)
+        return self.recordWrite(execute(self.compiledQuery("delete", where), params), [kwargs])
 
     def update(self, new_values, where_conditions):
         """Update junction table records with specific where conditions"""
-        return execute(
-            "UPDATE " + self.__class__.__name__ + " SET " + ", ".join([f"{k} = ?" for k in new_values]) + 
-            " WHERE " + " AND ".join([f"{k} = ?" for k in where_conditions]),
-            list(new_values.values()) + list(where_conditions.values())
+        columns, values = _shape(new_values)
+        where, params = _shape(where_conditions)
+        return self.recordWrite(
+            execute(self.compiledQuery("update", where, columns), values + params),
+            # the rows as matched, and as they are now
+            [dict(where_conditions), dict(where_conditions, **new_values)]
         )
 
 
@@ -155,6 +900,12 @@ class Companies(DataModel):
     companyDescription: str
     employeeSize: int = 1
 
+    relations: typing.ClassVar[dict] = {
+        "posts": HasMany("JobPosts", "companyId"),
+        "recruiterLinks": HasMany("RecruiterCompanies", "companyId"),
+        "recruiters": Through("RecruiterCompanies", "companyId", "Recruiters", "recruiterId"),
+    }
+
 
 class JobPosts(DataModel):
     recruiterId: int
@@ -169,37 +920,230 @@ class JobPosts(DataModel):
     validTill: str
     isActive: bool = True
 
-    def insert(self):
-        # Exclude auto-generated fields including postedOn
-        data = self.model_dump(exclude={"id", "createdAt", "updatedAt", "postedOn"})
-        return execute(insertQueries[self.tableName], list(data.values()))
+    # Exclude auto-generated fields including postedOn
+    insertExclude: typing.ClassVar[set] = {"id", "createdAt", "updatedAt", "postedOn"}
+    deferredFields: typing.ClassVar[set] = {"description"}
+    relations: typing.ClassVar[dict] = {
+        "company": BelongsTo("Companies", "companyId"),
+        "recruiter": BelongsTo("Recruiters", "recruiterId"),
+        "skills": Through("PostSkills", "postId", "Skills", "skillId"),
+        "applications": HasMany("Applications", "jobPostId"),
+    }
     
     # Add this enhanced search method to your JobPosts class in models.py
 
     @classmethod
-    def search(cls, search="", page=0, min_experience=None, max_experience=None, 
+    def search(cls, search="", cursor=None, min_experience=None, max_experience=None, 
             job_type=None, company_name=None, min_salary=None, max_salary=None, 
-            skills=None, location=None):
+            skills=None, location=None, freelancer_id=None, applied=None,
+            skills_match="any", facets=False, total=False, page_size=JOB_PAGE_SIZE):
         """
         Enhanced search method with multiple filters
+        
+        Results are ordered newest first by (postedOn, id) and paginated by
+        seeking past the edge row of the previous page, so every page costs
+        the same no matter how deep it is.
+        
+        When a search cache is configured (see search_cache.init_app), pages
+        are served from it, keyed by the normalised filters; the job dicts
+        are shared between callers and must not be modified.
+        
+        Args:
+            cursor (str): Token from a previous result's next_cursor or
+                prev_cursor; None (or an invalid token) for the first page
+            skills (str): Comma-separated skill names (case-insensitive)
+            skills_match (str): "any" to match posts listing any of the
+                skills, "all" for posts listing every one of them
+            freelancer_id (int): Freelancer whose applications set each
+                job's "has_applied" flag (always False without one); looked
+                up per page, so unless filtering on applied every freelancer
+                shares the cached pages
+            applied (bool): Only jobs the freelancer has (True) or has not
+                (False) applied to; None for both. Needs freelancer_id
+            facets (bool): Also count all matching posts per job type,
+                experience bucket, salary bucket, skill and location. They
+                don't depend on the page, so they are cached per filter
+                signature (see search_cache.get_facets) unless searches
+                are not cached
+            total (bool): Also count all matching posts. Counts up to
+                SEARCH_COUNT_LIMIT are exact; above it the count cached for
+                the same filters is returned (refreshed in the background),
+                or SEARCH_COUNT_LIMIT itself while there is none yet
+            
+        Returns:
+            dict: "jobs" (list of dicts), "next_cursor" and "prev_cursor"
+            (None when there is no such page), "has_next" and "has_prev";
+            with total, "total" and "total_exact" (False for an estimate
+            or lower bound); with facets, "facets":
+            facet name -> list of {"value", "count"} dicts, most common
+            first (experience and salary buckets in order, with "min" and
+            "max"; skills also have "id")
         """
+        if applied is not None and freelancer_id is None:
+            raise ValueError("Filtering on applied needs a freelancer_id")
+        if skills_match not in ("any", "all"):
+            raise ValueError(f"skills_match must be 'any' or 'all', not {skills_match!r}")
+        
+        # the freelancer selects rows only when filtering on applied
+        scope = freelancer_id if applied is not None else None
+        # filters that select the same rows share a signature
+        signature = (
+            (fts_query(search) or "").lower(), min_experience, max_experience,
+            job_type, company_name or None, min_salary, max_salary,
+            tuple(sorted({Skills.normalize(skill) for skill in (skills or "").split(",")} - {""})),
+            (fts_query(location) or "").lower(), scope, applied, skills_match,
+        )
+        # and then its results go stale when that freelancer's applications change
+        tables = search_cache.scope("Applications", scope) if scope is not None else ()
+        
+        def run():
+            return cls._search(
+                search, cursor, min_experience, max_experience, job_type, company_name,
+                min_salary, max_salary, skills, location, scope, applied,
+                skills_match, total, page_size, signature, tables
+            )
+        
+        def count_facets():
+            filters = cls._searchFilters(
+                search, min_experience, max_experience, job_type, company_name,
+                min_salary, max_salary, skills, location, scope, applied, skills_match
+            )
+            return cls._searchFacets(*filters) if filters else cls._facetDicts([])
+        
+        cache = search_cache.get_cache()
+        if cache is None:
+            page = run()
+        else:
+            key = signature + (cursor, total, page_size)
+            page = cache.get(key, run, tables)
+        if facets:
+            facet_cache = search_cache.get_facets()
+            page = dict(page, facets=facet_cache.get(signature, count_facets, tables) if facet_cache else count_facets())
+        
+        jobs = page["jobs"]
+        if freelancer_id is not None and jobs:
+            if applied is None:
+                appliedTo = cls._appliedTo(freelancer_id, [job["id"] for job in jobs])
+            else:
+                appliedTo = {job["id"] for job in jobs} if applied else set()
+            jobs = [dict(job, has_applied=job["id"] in appliedTo) for job in jobs]
+        return dict(page, jobs=list(jobs))
+
+    @classmethod
+    def _appliedTo(cls, freelancerId, postIds):
+        """
+        Which of postIds the freelancer applied to, from one lookup on the
+        UNIQUE(jobPostId, freelancerId) index of Applications
+        """
+        rows = fetch(
+            "SELECT jobPostId FROM Applications WHERE freelancerId = ? AND jobPostId IN ("
+            + ", ".join("?" * len(postIds)) + ")",
+            [freelancerId] + list(postIds)
+        )
+        return {row[0] for row in rows or ()}
+
+    @classmethod
+    def _search(cls, search, cursor, min_experience, max_experience, job_type, company_name,
+                min_salary, max_salary, skills, location, freelancer_id, applied,
+                skills_match, total, page_size, signature, tables=()):
+        """
+        JobPosts.search without the cache; has_applied is left False.
+        `tables` are the written-to tables the results depend on besides
+        SEARCH_TABLES.
+        """
+        page = {"jobs": [], "next_cursor": None, "prev_cursor": None, "has_next": False, "has_prev": False}
+        filters = cls._searchFilters(
+            search, min_experience, max_experience, job_type, company_name,
+            min_salary, max_salary, skills, location, freelancer_id, applied, skills_match
+        )
+        if filters is None:
+            if total:
+                page.update(total=0, total_exact=True)
+            return page
+        conditions, params = filters
+        
         # Build the base query with JOINs
         base_query = """
-            SELECT DISTINCT jp.*, c.companyName as company_name
+            SELECT jp.*, c.companyName as company_name
             FROM JobPosts jp
             LEFT JOIN Companies c ON jp.companyId = c.id
-            LEFT JOIN PostSkills ps ON jp.id = ps.postId
-            LEFT JOIN Skills s ON ps.skillId = s.id
             WHERE jp.isActive = 1
         """
         
+        # Seek past the edge row of the page the cursor came from
+        direction, key = decode_cursor(cursor, 2) or ("next", None)
+        if key:
+            conditions = conditions + ["(jp.postedOn, jp.id) " + ("<" if direction == "next" else ">") + " (?, ?)"]
+            params = params + list(key)
+        
+        # Add conditions to query
+        if conditions:
+            base_query += " AND " + " AND ".join(conditions)
+        
+        # Add ordering and pagination; earlier pages are read in reverse.
+        # One extra row tells whether there is a page beyond this one.
+        order = "DESC" if direction == "next" else "ASC"
+        base_query += f" ORDER BY jp.postedOn {order}, jp.id {order} LIMIT ?"
+        params = params + [page_size + 1]
+        
+        # Execute query
+        data, page["next_cursor"], page["prev_cursor"] = keyset_page(
+            fetch(base_query, params) or [], direction, key, page_size,
+            lambda row: (row["postedOn"], row["id"])
+        )
+        page["has_next"] = page["next_cursor"] is not None
+        page["has_prev"] = page["prev_cursor"] is not None
+        
+        if total:
+            if key is None and not page["has_next"]:
+                # the first page holds every match
+                page.update(total=len(data), total_exact=True)
+            else:
+                page["total"], page["total_exact"] = cls._searchTotal(*filters, signature, tables)
+        
+        if not data:
+            return page
+        
+        # Convert rows to dicts and attach additional data
+        # Skills for the whole page come from one query
+        skills = cls.get_skills_for_jobs([row['id'] for row in data])
+        for row in data:
+            instance = cls.rowDict(row)
+            # Add company name for template access
+            instance['company_name'] = row['company_name']
+            instance['has_applied'] = False
+            instance['skills'] = [skill['skill'] for skill in skills.get(instance['id'], [])]
+            
+            page["jobs"].append(instance)
+        
+        return page
+
+    @classmethod
+    def _searchFilters(cls, search, min_experience, max_experience, job_type, company_name,
+                       min_salary, max_salary, skills, location, freelancer_id, applied, skills_match):
+        """
+        The WHERE conditions (besides jp.isActive = 1) and their params for
+        a search's filters, on JobPosts jp LEFT JOIN Companies c. None when
+        no post can match.
+        """
         conditions = []
         params = []
         
-        # Search in title and description
-        if search:
-            conditions.append("(jp.title LIKE ? OR jp.description LIKE ?)")
-            params.extend([f"%{search}%", f"%{search}%"])
+        if applied is not None:
+            conditions.append(APPLIED_CHECK if applied else "NOT " + APPLIED_CHECK)
+            params.append(freelancer_id)
+        
+        # Full-text filters, answered from the JobPostsFts index
+        matches = []
+        search_terms = fts_query(search)
+        if search_terms:
+            matches.append(f"{{title description}} : ({search_terms})")
+        location_terms = fts_query(location)
+        if location_terms:
+            matches.append(f"location : ({location_terms})")
+        if matches:
+            conditions.append("jp.id IN (SELECT rowid FROM JobPostsFts WHERE JobPostsFts MATCH ?)")
+            params.append(" AND ".join(matches))
         
         # Experience filters
         if min_experience is not None:
@@ -229,75 +1173,184 @@ class JobPosts(DataModel):
             conditions.append("jp.salary <= ?")
             params.append(max_salary)
         
-        # Skills filter
+        # Skills filter: posts having any (or all) of the named skills
         if skills:
-            skill_list = [skill.strip() for skill in skills.split(',') if skill.strip()]
-            if skill_list:
-                skill_conditions = []
-                for skill in skill_list:
-                    skill_conditions.append("s.skill LIKE ?")
-                    params.append(f"%{skill}%")
-                conditions.append(f"({' OR '.join(skill_conditions)})")
-        
-        # Location filter
-        if location:
-            conditions.append("jp.location LIKE ?")
-            params.append(f"%{location}%")
+            skill_keys = [key for key in dict.fromkeys(Skills.normalize(skill) for skill in skills.split(',')) if key]
+            if skill_keys:
+                match_all = skills_match == "all"
+                found = Skills.lookup_keys(skill_keys)
+                if not found or (match_all and len(found) < len(skill_keys)):
+                    return None
+                # names that are aliases of one skill count once
+                skill_ids = list(dict.fromkeys(found.values()))
+                
+                index = skill_index.get_index()
+                post_ids = index.match(skill_ids, all=match_all) if index is not None else None
+                if post_ids is not None and not len(post_ids):
+                    return None
+                if post_ids is not None and len(post_ids) <= SKILL_CANDIDATE_LIMIT:
+                    # candidate posts from the in-memory skill index
+                    conditions.append("jp.id IN (SELECT value FROM json_each(?))")
+                    params.append(json.dumps(post_ids.tolist()))
+                else:
+                    # a semi-join on skill ids, so each post appears once
+                    # however many skills match
+                    condition = (
+                        "jp.id IN (SELECT postId FROM PostSkills WHERE skillId IN ("
+                        + ", ".join("?" * len(skill_ids)) + ")"
+                    )
+                    params.extend(skill_ids)
+                    if match_all:
+                        condition += " GROUP BY postId HAVING COUNT(*) = ?"
+                        params.append(len(skill_ids))
+                    conditions.append(condition + ")")
         
-        # Add conditions to query
-        if conditions:
-            base_query += " AND " + " AND ".join(conditions)
+        return conditions, params
+
+    @classmethod
+    def _searchTotal(cls, conditions, params, signature, tables=()):
+        """
+        How many posts match a search's filters, as (count, exact). Reads
+        at most SEARCH_COUNT_LIMIT + 1 rows; larger counts come from the
+        search_cache count cache, keyed by the filters' signature.
+        """
+        from_where = """
+            FROM JobPosts jp
+            LEFT JOIN Companies c ON jp.companyId = c.id
+            WHERE jp.isActive = 1
+        """ + "".join(" AND " + condition for condition in conditions)
         
-        # Add ordering and pagination
-        base_query += " ORDER BY jp.postedOn DESC LIMIT ? OFFSET ?"
-        params.extend([10, page * 10])  # Fixed: should be page * 10, not page * 50
+        row = fetch(f"SELECT COUNT(*) FROM (SELECT 1 {from_where} LIMIT ?)",
+                    params + [SEARCH_COUNT_LIMIT + 1], one=True)
+        count = row[0] if row else 0
+        if count <= SEARCH_COUNT_LIMIT:
+            return count, True
         
-        # Execute query
-        data = fetch(base_query, params)
+        def full_count():
+            row = fetch(f"SELECT COUNT(*) {from_where}", params, one=True)
+            if row is None:
+                raise RuntimeError("counting search results failed")
+            return row[0]
         
-        if not data:
-            return []
+        # never counted on the request: an earlier (maybe outdated) count,
+        # or the limit as a lower bound until the background count is in
+        # (for good, when searches are not cached)
+        counts = search_cache.get_counts()
+        estimate = counts.estimate(signature, full_count, tables) if counts is not None else None
+        if estimate is None:
+            return SEARCH_COUNT_LIMIT, False
+        return max(estimate, SEARCH_COUNT_LIMIT + 1), False
+
+    @classmethod
+    def _searchFacets(cls, conditions, params):
+        """
+        Facet counts over every post matching a search's filters, from one
+        statement: the matching posts are collected once and each facet is
+        a GROUP BY over them.
+        """
+        where = "".join(" AND " + condition for condition in conditions)
+        experience_bucket = "CASE" + "".join(
+            f" WHEN jp.experience >= {low} THEN {low}" for low in reversed(EXPERIENCE_BUCKETS)
+        ) + " ELSE 0 END"
+        rows = fetch(f"""
+            WITH matched AS MATERIALIZED (
+                SELECT jp.id, jp.jobType, jp.location,
+                       {experience_bucket} AS experience,
+                       CAST(jp.salary / ? AS INTEGER) AS salary
+                FROM JobPosts jp
+                LEFT JOIN Companies c ON jp.companyId = c.id
+                WHERE jp.isActive = 1{where}
+            )
+            SELECT 'jobType' AS facet, jobType AS value, COUNT(*) AS count FROM matched GROUP BY 2
+            UNION ALL
+            SELECT 'experience', experience, COUNT(*) FROM matched GROUP BY 2
+            UNION ALL
+            SELECT 'salary', salary, COUNT(*) FROM matched GROUP BY 2
+            UNION ALL
+            SELECT 'location', location, COUNT(*) FROM matched GROUP BY 2
+            UNION ALL
+            SELECT 'skills', ps.skillId, COUNT(*)
+            FROM matched m JOIN PostSkills ps ON ps.postId = m.id
+            GROUP BY 2
+        """, [SALARY_BUCKET_SIZE] + params) or []
+        return cls._facetDicts(rows)
+
+    @classmethod
+    def _facetDicts(cls, rows):
+        """Shape (facet, value, count) rows into the facets returned by search"""
+        counts = {"jobType": {}, "experience": {}, "salary": {}, "location": {}, "skills": {}}
+        for facet, value, count in rows:
+            counts[facet][value] = count
         
-        # Convert to JobPosts objects and attach additional data
-        result = []
-        for row in data:
-            row_dict = dict(row)
-            # Store company name for template access
-            company_name = row_dict.pop('company_name', None)
-            
-            instance = cls(**row_dict)
-            
-            instance = instance.model_dump()
-            # Add company name as attribute
-            instance['company_name'] = company_name
-            
-            # Get skills for this job post
-            instance['skills'] = [skill['skill'] for skill in cls.get_job_skills(instance['id'])]
-            
-            result.append(instance)
+        def ranked(values, limit=None):
+            # most common first, ties by value
+            return sorted(values.items(), key=lambda item: (-item[1], item[0]))[:limit]
         
-        return result
+        experience = []
+        for i, low in enumerate(EXPERIENCE_BUCKETS):
+            if low in counts["experience"]:
+                high = EXPERIENCE_BUCKETS[i + 1] - 1 if i + 1 < len(EXPERIENCE_BUCKETS) else None
+                experience.append({
+                    "value": f"{low}-{high}" if high is not None else f"{low}+",
+                    "min": low, "max": high, "count": counts["experience"][low],
+                })
+        
+        skills = ranked(counts["skills"], FACET_LIMIT)
+        names = {skillId: skill.skill for skillId, skill in Skills.getMany([skillId for skillId, _ in skills]).items()}
+        
+        return {
+            "jobType": [{"value": value, "count": count} for value, count in ranked(counts["jobType"])],
+            "experience": experience,
+            "salary": [
+                {
+                    "value": f"{bucket * SALARY_BUCKET_SIZE}-{(bucket + 1) * SALARY_BUCKET_SIZE}",
+                    "min": bucket * SALARY_BUCKET_SIZE, "max": (bucket + 1) * SALARY_BUCKET_SIZE, "count": count,
+                }
+                for bucket, count in sorted(counts["salary"].items())
+            ],
+            "skills": sorted(
+                ({"id": skillId, "value": names[skillId], "count": count}
+                 for skillId, count in skills if skillId in names),
+                key=lambda skill: (-skill["count"], skill["value"])
+            ),
+            "location": [
+                {"value": value, "count": count} for value, count in ranked(counts["location"], FACET_LIMIT)
+            ],
+        }
 
     @classmethod
     def get_job_skills(cls, job_id):
         """
         Get all skills for a specific job post
         """
-        skill_data = fetch("""
-            SELECT s.id, s.skill, ps.isRequired
-            FROM Skills s
-            JOIN PostSkills ps ON s.id = ps.skillId
-            WHERE ps.postId = ?
-            ORDER BY ps.isRequired DESC, s.skill ASC
-        """, (job_id,))
-        
-        if not skill_data:
-            return []
+        return cls.get_skills_for_jobs([job_id]).get(job_id, [])
+
+    @classmethod
+    def get_skills_for_jobs(cls, job_ids):
+        """
+        Get the skills of several job posts with one query per IN chunk
         
-        skills = []
-        for row in skill_data:
-            skill_dict = dict(row)
-            skills.append(skill_dict)
+        Args:
+            job_ids (list): Job post ids
+            
+        Returns:
+            dict: job id -> list of skill dicts (id, skill, isRequired),
+            required skills first; posts without skills are left out
+        """
+        skills = {}
+        for chunk in _inChunks(list(dict.fromkeys(job_ids))):
+            skill_data = fetch(f"""
+                SELECT ps.postId, s.id, s.skill, ps.isRequired
+                FROM PostSkills ps
+                JOIN Skills s ON s.id = ps.skillId
+                WHERE ps.postId IN ({", ".join("?" * len(chunk))})
+                ORDER BY ps.postId, ps.isRequired DESC, s.skill ASC
+            """, chunk) or []
+            
+            for row in skill_data:
+                skills.setdefault(row['postId'], []).append(
+                    {"id": row['id'], "skill": row['skill'], "isRequired": row['isRequired']}
+                )
         
         return skills
 
@@ -306,28 +1359,57 @@ class JobPosts(DataModel):
         """
         Get a single job post with company and skills information
         """
-        job_data = fetch("""
-            SELECT jp.*, c.companyName as company_name
-            FROM JobPosts jp
-            LEFT JOIN Companies c ON jp.companyId = c.id
-            WHERE jp.id = ?
-        """, (job_id,), one=True)
-        
-        if not job_data:
-            return None
+        jobs = cls.get_many_with_company_and_skills([job_id])
+        return jobs[0] if jobs else None
+
+    @classmethod
+    def get_many_with_company_and_skills(cls, job_ids):
+        """
+        Get job posts with company and skills information for a listing,
+        in two queries per IN chunk however many posts there are
         
-        row_dict = dict(job_data)
-        company_name = row_dict.pop('company_name', None)
+        Args:
+            job_ids (list): Job post ids
+            
+        Returns:
+            list: Job dicts in the order of job_ids, missing ids skipped
+        """
+        jobs = {}
+        for chunk in _inChunks(list(dict.fromkeys(job_ids))):
+            job_data = fetch(f"""
+                SELECT jp.*, c.companyName as company_name
+                FROM JobPosts jp
+                LEFT JOIN Companies c ON jp.companyId = c.id
+                WHERE jp.id IN ({", ".join("?" * len(chunk))})
+            """, chunk) or []
+            
+            for row in job_data:
+                instance = cls.rowDict(row)
+                instance['company_name'] = row['company_name']
+                jobs[instance['id']] = instance
         
-        instance = cls(**row_dict)
-        instance = instance.model_dump()
-        instance['company_name'] = company_name
-        instance['skills'] = cls.get_job_skills(instance['id'])
+        skills = cls.get_skills_for_jobs(list(jobs))
+        for job_id, instance in jobs.items():
+            instance['skills'] = skills.get(job_id, [])
         
-        return instance
+        return [jobs[job_id] for job_id in job_ids if job_id in jobs]
 
 class Skills(DataModel):
     skill: str
+    # normalize(skill); unique, so lookups and joins see one row per real skill
+    skillKey: Optional[str] = None
+
+    @pydantic.model_validator(mode="after")
+    def fillSkillKey(self):
+        if self.skillKey is None:
+            self.skillKey = Skills.normalize(self.skill)
+        return self
+
+    def update(self, **kwargs):
+        # a renamed skill keeps its key in step
+        if "skill" in kwargs and "skillKey" not in kwargs:
+            kwargs["skillKey"] = Skills.normalize(kwargs["skill"])
+        return super().update(**kwargs)
 
     @classmethod
     def get_or_create(cls, skill: str):
@@ -340,28 +1422,106 @@ class Skills(DataModel):
         Returns:
             Skills: The existing or newly created Skills instance
         """
-        # First, try to get the existing skill (case-insensitive search)
-        existing_skill = cls.get(skill=skill)
-        
-        if existing_skill:
-            return existing_skill
-        
-        # If skill doesn't exist, create a new one
-        new_skill = cls(skill=skill)
-        skill_id = new_skill.insert()
+        # Resolved case-insensitively, through the resolve_many cache
+        skill_ids = cls.resolve_many([skill])
         
-        if skill_id:
-            # Return the newly created skill with the ID
-            new_skill.id = skill_id
-            return new_skill
-        else:
+        if not skill_ids:
             # If insertion failed, return None or raise an exception
             raise Exception(f"Failed to create skill: {skill}")
+        
+        return cls.get(id=next(iter(skill_ids.values())))
+
+    @classmethod
+    def normalize(cls, skill_name):
+        """The form skill names are compared in: trimmed, single-spaced, lower case"""
+        return " ".join((skill_name or "").split()).lower()
+
+    @classmethod
+    def resolve_many(cls, skill_names):
+        """
+        Resolve skill names to ids, creating the skills that don't exist.
+        
+        Names are matched by their normalised key (or an alias of it)
+        through a process-wide cache whose entries expire after
+        SKILL_CACHE_TTL seconds; the misses cost one SELECT and, for names
+        that are new, one INSERT ... ON CONFLICT DO NOTHING RETURNING.
+        New skills keep the name as given (whitespace collapsed).
+        
+        Args:
+            skill_names (list): Skill names; blank ones are skipped
+            
+        Returns:
+            dict: normalised name -> skill id, in the order first given,
+            or None if the skills could not be created
+        """
+        names = {}
+        for name in skill_names:
+            key = cls.normalize(name)
+            if key and key not in names:
+                names[key] = " ".join(name.split())
+        
+        now = time.monotonic()
+        ids = {}
+        for key in names:
+            skillId, cachedAt = _skillIds.get(key, (None, 0))
+            ids[key] = skillId if now - cachedAt < SKILL_CACHE_TTL else None
+        missing = [key for key, skillId in ids.items() if skillId is None]
+        if not missing:
+            return ids
+        
+        found = cls.lookup_keys(missing)
+        new = [key for key in missing if key not in found]
+        for chunk in _inChunks(new):
+            rows = execute_returning(
+                f"INSERT INTO Skills (skill, skillKey) VALUES {', '.join(['(?, ?)'] * len(chunk))}"
+                " ON CONFLICT DO NOTHING RETURNING id, skill, skillKey",
+                [value for key in chunk for value in (names[key], key)]
+            )
+            if rows is None:
+                return None
+            cls.recordWrite(rows, [dict(row) for row in rows])
+            found.update((row["skillKey"], row["id"]) for row in rows)
+        
+        # created by another connection since the SELECT above
+        raced = [key for key in new if key not in found]
+        if raced:
+            found.update(cls.lookup_keys(raced))
+            if any(key not in found for key in raced):
+                return None
+        
+        ids.update(found)
+        # only committed skills are cached
+        connections.on_commit(lambda: _skillIds.update((key, (skillId, now)) for key, skillId in found.items()))
+        return ids
+
+    @classmethod
+    def lookup_keys(cls, skill_keys):
+        """
+        Find the skills with the given normalised keys, directly or through
+        SkillAliases; both lookups are index seeks.
+        
+        Args:
+            skill_keys (list): Keys as returned by normalize()
+            
+        Returns:
+            dict: key -> skill id for the keys that are known
+        """
+        found = {}
+        for chunk in _inChunks(list(dict.fromkeys(skill_keys))):
+            marks = ", ".join("?" * len(chunk))
+            data = fetch(f"""
+                SELECT skillKey, id FROM Skills WHERE skillKey IN ({marks})
+                UNION ALL
+                SELECT aliasKey, skillId FROM SkillAliases WHERE aliasKey IN ({marks})
+            """, chunk + chunk) or []
+            found.update((row[0], row[1]) for row in data)
+        
+        return found
 
     @classmethod
     def get_by_name(cls, skill_name: str):
         """
-        Get a skill by its name (case-insensitive).
+        Get a skill by its name (case-insensitive), or by an alias of it.
         
         Args:
             skill_name (str): The skill name to search for
@@ -369,16 +1529,114 @@ class Skills(DataModel):
         Returns:
             Skills or None: The Skills instance if found, None otherwise
         """
-        data = fetch(
-            "SELECT * FROM Skills WHERE LOWER(skill) = LOWER(?)",
-            (skill_name,),
-            one=True
-        )
+        key = cls.normalize(skill_name)
+        data = fetch("""
+            SELECT * FROM Skills WHERE id = (
+                SELECT id FROM Skills WHERE skillKey = ?
+                UNION ALL
+                SELECT skillId FROM SkillAliases WHERE aliasKey = ?
+                LIMIT 1
+            )
+        """, (key, key), one=True)
         
         if not data:
             return None
             
-        return cls(**dict(data))
+        return cls.fromRow(data)
+
+    @classmethod
+    def merge(cls, skill_id, duplicate_ids):
+        """
+        Fold duplicate skills into one, in a single transaction.
+        
+        PostSkills and FreelancerSkills rows are moved over in bulk (a post
+        or freelancer listing several of the skills keeps one row, with the
+        strongest isRequired / proficiency / years), the duplicates' keys
+        and aliases become aliases of skill_id, and the duplicates are
+        deleted.
+        
+        Args:
+            skill_id (int): The skill to keep
+            duplicate_ids (list): Skills to merge into it
+            
+        Returns:
+            bool or None: True once merged, None if anything failed
+        """
+        duplicate_ids = [i for i in dict.fromkeys(duplicate_ids) if i != skill_id]
+        if not duplicate_ids:
+            return True
+        
+        marks = ", ".join("?" * len(duplicate_ids))
+        with transaction():
+            written = [
+                (PostSkills, execute(f"""
+                    INSERT INTO PostSkills (postId, skillId, isRequired)
+                    SELECT postId, ?, MAX(isRequired) FROM PostSkills
+                    WHERE skillId IN ({marks}) GROUP BY postId
+                    ON CONFLICT(postId, skillId) DO UPDATE SET isRequired = MAX(isRequired, excluded.isRequired)
+                """, [skill_id] + duplicate_ids)),
+                (PostSkills, execute(f"DELETE FROM PostSkills WHERE skillId IN ({marks})", duplicate_ids)),
+                # instr() ranks the proficiency levels in order
+                (FreelancerSkills, execute(f"""
+                    INSERT INTO FreelancerSkills (freelancerId, skillId, proficiencyLevel, yearsOfExperience)
+                    SELECT freelancerId, ?, proficiencyLevel, yearsOfExperience FROM FreelancerSkills
+                    WHERE skillId IN ({marks})
+                    ON CONFLICT(freelancerId, skillId) DO UPDATE SET
+                        proficiencyLevel = CASE
+                            WHEN instr('BEGINNER INTERMEDIATE ADVANCED EXPERT', excluded.proficiencyLevel)
+                               > instr('BEGINNER INTERMEDIATE ADVANCED EXPERT', proficiencyLevel)
+                            THEN excluded.proficiencyLevel ELSE proficiencyLevel END,
+                        yearsOfExperience = MAX(IFNULL(yearsOfExperience, 0), IFNULL(excluded.yearsOfExperience, 0))
+                """, [skill_id] + duplicate_ids)),
+                (FreelancerSkills, execute(f"DELETE FROM FreelancerSkills WHERE skillId IN ({marks})", duplicate_ids)),
+                (SkillAliases, execute(f"UPDATE SkillAliases SET skillId = ? WHERE skillId IN ({marks})",
+                                       [skill_id] + duplicate_ids)),
+                (SkillAliases, execute(f"""
+                    INSERT OR IGNORE INTO SkillAliases (aliasKey, skillId)
+                    SELECT skillKey, ? FROM Skills WHERE id IN ({marks}) AND skillKey IS NOT NULL
+                """, [skill_id] + duplicate_ids)),
+                (cls, execute(f"DELETE FROM Skills WHERE id IN ({marks})", duplicate_ids)),
+            ]
+            if any(result is None for _, result in written):
+                return None
+            for model, result in written:
+                # the rows moved are not listed, so listeners rebuild what they keep
+                model.recordWrite(result)
+        
+        return True
+
+    @classmethod
+    def normalize_keys(cls):
+        """
+        Give every skill without one its skillKey, first merging skills
+        whose names normalise to the same key into the oldest of them.
+        Used to migrate databases from before skillKey existed; safe to
+        re-run.
+        
+        Returns:
+            int or None: Number of skills merged away, None on error
+        """
+        skills = fetch("SELECT id, skill, skillKey FROM Skills ORDER BY id", ()) or []
+        groups = {}
+        for row in skills:
+            groups.setdefault(row["skillKey"] or cls.normalize(row["skill"]), []).append(row)
+        
+        merged = 0
+        with transaction():
+            for key, rows in groups.items():
+                keep, duplicates = rows[0], rows[1:]
+                if duplicates:
+                    if cls.merge(keep["id"], [row["id"] for row in duplicates]) is None:
+                        return None
+                    merged += len(duplicates)
+                if keep["skillKey"] != key:
+                    # a merged duplicate may have left the key behind as an alias
+                    if (execute("DELETE FROM SkillAliases WHERE aliasKey = ?", (key,)) is None
+                            or execute("UPDATE Skills SET skillKey = ? WHERE id = ?", (key, keep["id"])) is None):
+                        return None
+            cls.recordWrite(True)
+        
+        return merged
 
     @classmethod
     def search_skills(cls, search_term: str, limit: int = 10):
@@ -400,7 +1658,7 @@ class Skills(DataModel):
         if not data:
             return []
             
-        return [cls(**dict(row)) for row in data]
+        return [cls.fromRow(row) for row in data]
 
     def __str__(self):
         return f"Skill(id={self.id}, skill='{self.skill}')"
@@ -448,15 +1706,106 @@ class Educations(DataModel):
 class Resumes(DataModel):
     freelancerId: int
     name: str
-    pdfData: bytes
+    pdfData: bytes = b""  # legacy inline copy, empty once the PDF lives in the resume store
     fileSize: int
     isDefault: bool = False
     uploadedAt: Optional[str] = None  # Will be auto-set by database
+    contentHash: Optional[str] = None  # sha256 of the PDF in the resume store
 
-    def insert(self):
-        # Exclude auto-generated fields including uploadedAt
-        data = self.model_dump(exclude={"id", "createdAt", "updatedAt", "uploadedAt"})
-        return execute(insertQueries[self.tableName], list(data.values()))
+    # Exclude auto-generated fields including uploadedAt
+    insertExclude: typing.ClassVar[set] = {"id", "createdAt", "updatedAt", "uploadedAt"}
+    deferredFields: typing.ClassVar[set] = {"pdfData"}
+    relations: typing.ClassVar[dict] = {
+        "freelancer": BelongsTo("Freelancers", "freelancerId"),
+    }
+
+    @classmethod
+    def store_upload(cls, freelancerId: int, name: str, stream):
+        """
+        Save an uploaded PDF in the resume store and link it to the freelancer.
+        
+        The file is stored once per distinct content; uploading a PDF the
+        freelancer already has returns the existing resume instead of adding
+        a new row.
+        
+        Args:
+            freelancerId (int): Owner of the resume
+            name (str): Display name for a newly created resume
+            stream: Binary file object with the PDF, read in chunks
+            
+        Returns:
+            int: Id of the new or existing resume, None on failure
+        """
+        store = resume_store.get_store()
+        contentHash, fileSize = store.save(stream)
+        if fileSize == 0:
+            store.delete(contentHash)
+            return None
+        
+        with transaction():
+            # the file is already written, so it goes again if no row keeps it
+            connections.on_rollback(lambda: cls._releaseFile(contentHash))
+            existing = cls.get(freelancerId=freelancerId, contentHash=contentHash, fields=("id",))
+            if existing:
+                return existing.id
+            
+            acquired = execute(
+                "INSERT INTO ResumeFiles (contentHash, fileSize, refCount) VALUES (?, ?, 1) "
+                "ON CONFLICT(contentHash) DO UPDATE SET refCount = refCount + 1",
+                (contentHash, fileSize)
+            )
+            if acquired is None:
+                return None
+            
+            resumeId = cls(
+                freelancerId=freelancerId, name=name,
+                fileSize=fileSize, contentHash=contentHash
+            ).insert()
+        
+        return resumeId
+
+    def delete(self):
+        # drop the stored file together with its last reference
+        contentHash = self.contentHash
+        with transaction():
+            deleted = super().delete()
+            if deleted is None or contentHash is None:
+                return deleted
+            
+            # a failed statement has already marked the transaction failed
+            released = execute("UPDATE ResumeFiles SET refCount = refCount - 1 WHERE contentHash = ?", (contentHash,))
+            if released is None:
+                return None
+            if execute("DELETE FROM ResumeFiles WHERE contentHash = ? AND refCount <= 0", (contentHash,)) is None:
+                return None
+            
+            # checked after commit, so a rolled back delete keeps the file
+            connections.on_commit(lambda: self._releaseFile(contentHash))
+        return deleted
+
+    @staticmethod
+    def _releaseFile(contentHash):
+        """Remove a stored file unless a ResumeFiles row still references it"""
+        if fetch("SELECT 1 FROM ResumeFiles WHERE contentHash = ?", (contentHash,), one=True) is None:
+            resume_store.get_store().delete(contentHash)
+
+    def file_path(self):
+        """Path of the PDF on local disk, or None if it is kept in the database"""
+        if self.contentHash is None:
+            return None
+        return resume_store.get_store().path(self.contentHash)
+
+    def open_pdf(self):
+        """
+        Open the stored PDF as a read-only, seekable file object.
+        
+        Reads go to the resume store file, or in chunks straight to the
+        legacy BLOB, so the whole file is never held in memory. Close it
+        (or use it as a context manager) when done.
+        """
+        if self.contentHash is not None:
+            return resume_store.get_store().open(self.contentHash)
+        return connections.open_blob(self.tableName, "pdfData", self.id)
 
 
 # Junction Models (without id)
@@ -465,6 +1814,11 @@ class PostSkills(JunctionModel):
     skillId: int
     isRequired: bool = True
 
+    relations: typing.ClassVar[dict] = {
+        "post": BelongsTo("JobPosts", "postId"),
+        "skill": BelongsTo("Skills", "skillId"),
+    }
+
 
 class RecruiterCompanies(JunctionModel):
     recruiterId: int
@@ -473,10 +1827,22 @@ class RecruiterCompanies(JunctionModel):
     joinedAt: Optional[str] = None  # Will be auto-set by database
     isActive: bool = True
 
-    def insert(self):
-        # Exclude auto-generated fields including joinedAt
-        data = self.model_dump(exclude={"createdAt", "joinedAt"})
-        return execute(insertQueries[self.tableName], list(data.values()))
+    # Exclude auto-generated fields including joinedAt
+    insertExclude: typing.ClassVar[set] = {"createdAt", "joinedAt"}
+    relations: typing.ClassVar[dict] = {
+        "recruiter": BelongsTo("Recruiters", "recruiterId"),
+        "company": BelongsTo("Companies", "companyId"),
+    }
+
+
+class SkillAliases(JunctionModel):
+    """Another normalised name for a skill, e.g. left behind by Skills.merge"""
+    aliasKey: str
+    skillId: int
+
+    relations: typing.ClassVar[dict] = {
+        "skill": BelongsTo("Skills", "skillId"),
+    }
 
 
 class FreelancerSkills(JunctionModel):
@@ -485,6 +1851,10 @@ class FreelancerSkills(JunctionModel):
     proficiencyLevel: str = "BEGINNER"  # 'BEGINNER', 'INTERMEDIATE', 'ADVANCED', 'EXPERT'
     yearsOfExperience: int = 0
 
+    relations: typing.ClassVar[dict] = {
+        "skill": BelongsTo("Skills", "skillId"),
+    }
+
 
 class Applications(DataModel):  # Changed from JunctionModel to DataModel
     """
@@ -500,8 +1870,18 @@ class Applications(DataModel):  # Changed from JunctionModel to DataModel
     createdAt: Optional[str] = None  # Will be auto-set by database
     updatedAt: Optional[str] = None  # Will be auto-set by database
 
-    def insert(self):
-        # Exclude all auto-generated fields for Applications
-        data = self.model_dump(exclude={"id", "createdAt", "updatedAt", "appliedOn"})
-        return execute(insertQueries[self.tableName], list(data.values()))
-    
\ No newline at end of file
+    # Exclude all auto-generated fields for Applications
+    insertExclude: typing.ClassVar[set] = {"id", "createdAt", "updatedAt", "appliedOn"}
+    deferredFields: typing.ClassVar[set] = {"coverLetter"}
+    relations: typing.ClassVar[dict] = {
+        "jobPost": BelongsTo("JobPosts", "jobPostId"),
+        "freelancer": BelongsTo("Freelancers", "freelancerId"),
+        "resume": BelongsTo("Resumes", "resumeId"),
+    }
+    
+
+
+# keep the skill index in step with writes to job posts and their skills
+on_write("JobPosts", skill_index.written("id", "JobPosts"))
+on_write("PostSkills", skill_index.written("postId", "PostSkills"))
+on_write("Skills", _forgetSkills)
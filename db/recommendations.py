@@ -0,0 +1,364 @@
+import itertools
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from db import search_cache
+from db.models import (
+    fetch, executemany, transaction, decode_cursor, keyset_page, _inChunks,
+    Applications, FreelancerSkills, JobPosts, PostSkills
+)
+
+
+# jobs shown on the freelancer dashboard and returned by the API by default
+RECOMMENDATION_COUNT = 10
+# a freelancer skill counts this much per proficiency level...
+PROFICIENCY_WEIGHTS = {"BEGINNER": 1.0, "INTERMEDIATE": 2.0, "ADVANCED": 3.0, "EXPERT": 4.0}
+# ...plus this fraction per year of experience, up to EXPERIENCE_CAP years
+EXPERIENCE_WEIGHT = 0.1
+EXPERIENCE_CAP = 10
+# how much a post's required and optional skills count
+REQUIRED_WEIGHT = 1.0
+OPTIONAL_WEIGHT = 0.5
+# applicant scores: the share that comes from skills, the rest from experience
+SKILL_SHARE = 0.8
+APPLICANT_PAGE_SIZE = 20
+# the post matrix is rebuilt after writes to these tables, or when older than
+# MATRIX_TTL seconds (writes made by other processes are not seen otherwise)
+MATRIX_TABLES = ("JobPosts", "PostSkills")
+MATRIX_TTL = 300
+
+
+def skill_weight(proficiencyLevel, yearsOfExperience):
+    """Weight of one freelancer skill in the freelancer x skill matrix"""
+    years = min(yearsOfExperience or 0, EXPERIENCE_CAP)
+    return PROFICIENCY_WEIGHTS.get(proficiencyLevel, 1.0) * (1 + EXPERIENCE_WEIGHT * years)
+
+
+class PostSkillMatrix:
+    """
+    Active job posts x skills as a sparse matrix, weighted by isRequired.
+
+    Rows follow `postIds` (ascending), columns are skill ids. It is kept in
+    CSC form, so multiplying by a freelancer's few skills only reads the
+    posts that list one of them.
+    """
+
+    def __init__(self, postIds, matrix, generation):
+        self.postIds = postIds
+        self.matrix = matrix
+        # total skill weight of every post, the most a freelancer can match
+        self.totals = np.asarray(matrix.sum(axis=1)).ravel()
+        self.generation = generation
+        self.builtAt = time.monotonic()
+
+    @property
+    def skillCount(self):
+        return self.matrix.shape[1]
+
+    @classmethod
+    def build(cls):
+        # read before the rows, so a write committed meanwhile triggers a rebuild
+        generation = search_cache.generation(MATRIX_TABLES)
+        rows = fetch("""
+            SELECT ps.postId, ps.skillId, ps.isRequired
+            FROM PostSkills ps
+            JOIN JobPosts jp ON jp.id = ps.postId
+            WHERE jp.isActive = 1
+        """, ()) or []
+
+        data = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows))
+        data = data.reshape(-1, 3)
+        postIds, postRows = np.unique(data[:, 0], return_inverse=True)
+        skillCount = int(data[:, 1].max()) + 1 if len(data) else 0
+        weights = np.where(data[:, 2] != 0, REQUIRED_WEIGHT, OPTIONAL_WEIGHT)
+        matrix = sparse.csc_matrix(
+            (weights, (postRows, data[:, 1])), shape=(len(postIds), skillCount)
+        )
+        return cls(postIds, matrix, generation)
+
+    def stale(self):
+        return (self.generation != search_cache.generation(MATRIX_TABLES)
+                or time.monotonic() - self.builtAt > MATRIX_TTL)
+
+
+_matrix = None
+_rebuilding = False
+_matrix_lock = threading.Lock()
+
+
+def get_post_matrix():
+    """
+    The current PostSkillMatrix. The first call builds it; once job posts
+    change, the previous matrix keeps being served while a background
+    thread builds the next one, so no request waits for a rebuild.
+    """
+    global _matrix, _rebuilding
+    with _matrix_lock:
+        if _matrix is None:
+            _matrix = PostSkillMatrix.build()
+        elif _matrix.stale() and not _rebuilding:
+            _rebuilding = True
+            threading.Thread(target=_rebuild_post_matrix, daemon=True).start()
+        return _matrix
+
+
+def _rebuild_post_matrix():
+    global _matrix, _rebuilding
+    try:
+        matrix = PostSkillMatrix.build()
+        with _matrix_lock:
+            _matrix = matrix
+    except Exception as e:
+        print("\nError rebuilding the post skill matrix: ", e)
+    finally:
+        with _matrix_lock:
+            _rebuilding = False
+
+
+def freelancer_matrix(freelancerIds, skillCount):
+    """
+    Freelancers x skills as a sparse CSR matrix, weighted by skill_weight.
+    Row i belongs to freelancerIds[i]; skills >= skillCount (listed on no
+    active post) are left out.
+    """
+    row = {freelancerId: i for i, freelancerId in enumerate(freelancerIds)}
+    skills = [
+        s for s in FreelancerSkills.getAllIn(
+            "freelancerId", list(row),
+            fields=("freelancerId", "skillId", "proficiencyLevel", "yearsOfExperience")
+        )
+        if s.skillId < skillCount
+    ]
+    return sparse.csr_matrix(
+        (
+            [skill_weight(s.proficiencyLevel, s.yearsOfExperience) for s in skills],
+            ([row[s.freelancerId] for s in skills], [s.skillId for s in skills]),
+        ),
+        shape=(len(row), skillCount),
+    )
+
+
+def top_k(scores, keys, k):
+    """
+    Positions of the k highest scores, best first (ties go to the larger key).
+    Uses argpartition, so only the k winners are sorted.
+    """
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((-keys[candidates], -scores[candidates]))]
+
+
+def recommend_jobs(freelancer_id, limit=RECOMMENDATION_COUNT):
+    """
+    Active job posts that best match a freelancer's skills.
+
+    A post scores the summed weight of the freelancer's skills it lists
+    (times the post's weight for each), scaled by the share of the post's
+    own skill weight they cover. Posts sharing no skill with the
+    freelancer, or already applied to, are left out.
+
+    Args:
+        freelancer_id (int): Freelancer to recommend jobs to
+        limit (int): Maximum number of posts
+
+    Returns:
+        list: (postId, score) tuples, best match first
+    """
+    posts = get_post_matrix()
+    if limit <= 0 or posts.skillCount == 0:
+        return []
+
+    freelancer = freelancer_matrix([freelancer_id], posts.skillCount)
+    # the same skills weighted 1, to measure how much of each post they cover
+    has_skill = freelancer.copy()
+    has_skill.data[:] = 1.0
+    # posts x 2, storing only the posts that share a skill with the freelancer
+    matches = (posts.matrix @ sparse.vstack([freelancer, has_skill]).T).tocsc()
+    matches.sort_indices()
+    split = matches.indptr[1]
+    candidates = matches.indices[:split]
+    overlap, covered = matches.data[:split], matches.data[split:]
+    scores = overlap * (covered / posts.totals[candidates])
+
+    applied = fetch("SELECT jobPostId FROM Applications WHERE freelancerId = ?", (freelancer_id,)) or []
+    if applied:
+        keep = ~np.isin(posts.postIds[candidates], [row["jobPostId"] for row in applied])
+        candidates, scores = candidates[keep], scores[keep]
+
+    postIds = posts.postIds[candidates]
+    return [(int(postIds[i]), float(scores[i])) for i in top_k(scores, postIds, limit)]
+
+
+def recommended_job_posts(freelancer_id, limit=RECOMMENDATION_COUNT):
+    """
+    recommend_jobs as job dicts (see JobPosts.get_many_with_company_and_skills),
+    each with its "match_score"
+    """
+    recommended = recommend_jobs(freelancer_id, limit)
+    scores = dict(recommended)
+    jobs = JobPosts.get_many_with_company_and_skills([postId for postId, _ in recommended])
+    # the matrix may predate a post being closed
+    jobs = [job for job in jobs if job["isActive"]]
+    for job in jobs:
+        job["match_score"] = round(scores[job["id"]], 4)
+    return jobs
+
+
+def experience_years(freelancerIds):
+    """Years of work listed in Experiences for each freelancer (ongoing jobs count until today)"""
+    years = dict.fromkeys(freelancerIds, 0.0)
+    for chunk in _inChunks(list(years)):
+        rows = fetch(f"""
+            SELECT freelancerId,
+                   SUM(MAX(julianday(COALESCE(NULLIF(endDate, ''), 'now')) - julianday(startDate), 0)) / 365.25 AS years
+            FROM Experiences
+            WHERE freelancerId IN ({", ".join("?" * len(chunk))})
+            GROUP BY freelancerId
+        """, chunk) or []
+        for row in rows:
+            years[row["freelancerId"]] = row["years"] or 0.0
+    return years
+
+
+def score_applicants(job_post_id):
+    """
+    Compute and store the match score of every application to a post that
+    has none stored yet, in one vectorised pass.
+
+    The skill part is the post's skill weight covered by the applicant,
+    each skill counted by the applicant's skill_weight relative to the
+    strongest possible (an expert with EXPERIENCE_CAP years). The
+    experience part is the applicant's years of experience relative to the
+    years the post asks for. Both lie in [0, 1], and so does the score.
+
+    Args:
+        job_post_id (int): The job post
+
+    Returns:
+        int: Number of applications scored, None if the scores could not
+        be written
+    """
+    pending_query = """
+        SELECT a.id, a.freelancerId
+        FROM Applications a
+        LEFT JOIN ApplicationScores s ON s.applicationId = a.id
+        WHERE a.jobPostId = ? AND s.applicationId IS NULL
+    """
+    if not fetch(pending_query, (job_post_id,)):
+        return 0
+
+    # scores are read and written in one transaction, so a trigger clearing
+    # them can't land between the two and leave a stale score behind
+    with transaction():
+        pending = fetch(pending_query, (job_post_id,))
+        post = JobPosts.get(id=job_post_id, fields=("id", "experience"))
+        if not pending or post is None:
+            return 0
+
+        applicationIds = np.array([row["id"] for row in pending])
+        freelancerIds = [row["freelancerId"] for row in pending]
+        postSkills = PostSkills.getAll(postId=job_post_id, fields=("skillId", "isRequired"))
+
+        if postSkills:
+            skillIds = np.array([ps.skillId for ps in postSkills])
+            postWeights = np.where([ps.isRequired for ps in postSkills], REQUIRED_WEIGHT, OPTIONAL_WEIGHT)
+            # applicants x post skills
+            strength = freelancer_matrix(freelancerIds, int(skillIds.max()) + 1)[:, skillIds].toarray()
+            strength /= skill_weight("EXPERT", EXPERIENCE_CAP)
+            skillScores = (strength @ postWeights) / postWeights.sum()
+        else:
+            skillScores = np.ones(len(pending))
+
+        if post.experience > 0:
+            years = experience_years(freelancerIds)
+            experienceScores = np.minimum(np.array([years[f] for f in freelancerIds]) / post.experience, 1.0)
+        else:
+            experienceScores = np.ones(len(pending))
+
+        scores = SKILL_SHARE * skillScores + (1 - SKILL_SHARE) * experienceScores
+        # a failed write has already marked the transaction failed
+        if executemany(
+            "INSERT OR REPLACE INTO ApplicationScores (applicationId, jobPostId, matchScore) VALUES (?, ?, ?)",
+            [(int(a), job_post_id, float(score)) for a, score in zip(applicationIds, scores)]
+        ) is None:
+            return None
+    return len(pending)
+
+
+def ranked_applications(job_post_id, cursor=None, page_size=APPLICANT_PAGE_SIZE, prefetch=()):
+    """
+    One page of a post's applications, best match first.
+
+    Missing scores are computed first (see score_applicants); pages are read
+    from idx_applicationscores_rank with keyset pagination, like JobPosts.search.
+    If the scores can't be stored, the applications are listed newest first
+    without them instead (matchScore None).
+
+    Args:
+        job_post_id (int): The job post
+        cursor (str): next_cursor or prev_cursor of a previous page, None for the first
+        page_size (int): Applications per page
+        prefetch: Relations of Applications to load, e.g. ["freelancer", "resume"]
+
+    Returns:
+        dict: "applications" (list of (Applications, matchScore) pairs),
+        "total" (applications to the post), "next_cursor" and "prev_cursor"
+    """
+    if score_applicants(job_post_id) is None:
+        return _unranked_applications(job_post_id, cursor, page_size, prefetch)
+
+    query = "SELECT applicationId, matchScore FROM ApplicationScores WHERE jobPostId = ?"
+    params = [job_post_id]
+    direction, key = decode_cursor(cursor, 2) or ("next", None)
+    if key:
+        query += " AND (matchScore, applicationId) " + ("<" if direction == "next" else ">") + " (?, ?)"
+        params.extend(key)
+    order = "DESC" if direction == "next" else "ASC"
+    query += f" ORDER BY matchScore {order}, applicationId {order} LIMIT ?"
+    params.append(page_size + 1)
+
+    data, next_cursor, prev_cursor = keyset_page(
+        fetch(query, params) or [], direction, key, page_size,
+        lambda row: (row["matchScore"], row["applicationId"])
+    )
+    applications = Applications.getMany([row["applicationId"] for row in data], defer=(), prefetch=prefetch)
+    total = fetch("SELECT COUNT(*) FROM ApplicationScores WHERE jobPostId = ?", (job_post_id,), one=True)
+    return {
+        "applications": [
+            (applications[row["applicationId"]], row["matchScore"])
+            for row in data if row["applicationId"] in applications
+        ],
+        "total": total[0] if total else 0,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+def _unranked_applications(job_post_id, cursor, page_size, prefetch):
+    """ranked_applications without scores: newest application first, from idx_applications_jobpost"""
+    query = "SELECT id FROM Applications WHERE jobPostId = ?"
+    params = [job_post_id]
+    direction, key = decode_cursor(cursor, 1) or ("next", None)
+    if key:
+        query += " AND id " + ("<" if direction == "next" else ">") + " ?"
+        params.extend(key)
+    order = "DESC" if direction == "next" else "ASC"
+    query += f" ORDER BY id {order} LIMIT ?"
+    params.append(page_size + 1)
+
+    data, next_cursor, prev_cursor = keyset_page(
+        fetch(query, params) or [], direction, key, page_size, lambda row: (row["id"],)
+    )
+    applications = Applications.getMany([row["id"] for row in data], defer=(), prefetch=prefetch)
+    total = fetch("SELECT COUNT(*) FROM Applications WHERE jobPostId = ?", (job_post_id,), one=True)
+    return {
+        "applications": [(applications[row["id"]], None) for row in data if row["id"] in applications],
+        "total": total[0] if total else 0,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
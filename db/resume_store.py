@@ -0,0 +1,120 @@
+import abc
+import hashlib
+import os
+import tempfile
+
+from db.connection import BLOB_CHUNK_SIZE
+
+
+RESUME_STORE_DIR = "resume_store"
+
+
+class ResumeStore(abc.ABC):
+    """
+    Storage backend for resume PDFs, addressed by the sha256 of their content.
+
+    Identical uploads map to the same key, so each distinct PDF is stored
+    once no matter how many Resumes rows point at it.
+    """
+
+    @abc.abstractmethod
+    def save(self, stream):
+        """Store everything readable from `stream`, returns (contentHash, size)"""
+
+    @abc.abstractmethod
+    def open(self, contentHash):
+        """Open a stored PDF as a binary file object"""
+
+    @abc.abstractmethod
+    def delete(self, contentHash):
+        """Remove a stored PDF; a missing one is not an error"""
+
+    def path(self, contentHash):
+        """Absolute path of the stored file, or None if the backend has no local files"""
+        return None
+
+    def relative_path(self, contentHash):
+        """Path below the store root, used to build X-Accel-Redirect locations"""
+        return None
+
+
+class FileSystemResumeStore(ResumeStore):
+    """Keeps PDFs under `root` in directories sharded by hash prefix (ab/cd/abcd...)"""
+
+    def __init__(self, root=RESUME_STORE_DIR):
+        self.root = os.path.abspath(root)
+
+    def relative_path(self, contentHash):
+        return "/".join((contentHash[:2], contentHash[2:4], contentHash))
+
+    def path(self, contentHash):
+        return os.path.join(self.root, contentHash[:2], contentHash[2:4], contentHash)
+
+    def save(self, stream):
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        # hash while copying, so the upload is only read once
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(BLOB_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+
+            contentHash = digest.hexdigest()
+            final_path = self.path(contentHash)
+            if os.path.exists(final_path):
+                # already stored by an earlier upload
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return contentHash, size
+
+    def open(self, contentHash):
+        return open(self.path(contentHash), "rb")
+
+    def delete(self, contentHash):
+        try:
+            os.remove(self.path(contentHash))
+        except FileNotFoundError:
+            pass
+
+
+_store = None
+
+
+def get_store():
+    """The configured backend (a FileSystemResumeStore in RESUME_STORE_DIR by default)"""
+    global _store
+    if _store is None:
+        _store = FileSystemResumeStore(RESUME_STORE_DIR)
+    return _store
+
+
+def set_store(store):
+    global _store
+    _store = store
+
+
+def init_app(app):
+    """
+    Configure the backend from the app config:
+    RESUME_STORE (a ResumeStore instance) or RESUME_STORE_DIR (a directory).
+    """
+    store = app.config.get("RESUME_STORE")
+    if store is None:
+        store = FileSystemResumeStore(app.config.get("RESUME_STORE_DIR", RESUME_STORE_DIR))
+    set_store(store)
@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# results kept per process; 0 turns the cache off
+SEARCH_CACHE_SIZE = 512
+# seconds a result is served as fresh
+SEARCH_CACHE_TTL = 30
+# seconds after that it is still served while a background refresh runs
+SEARCH_CACHE_STALE_TTL = 120
+
+# search result counts kept per process, and seconds before one is recounted
+COUNT_CACHE_SIZE = 1024
+COUNT_CACHE_TTL = 60
+
+# search facets kept per process; they cover every page of a search
+FACET_CACHE_SIZE = 256
+
+# tables whose rows appear in (or filter) JobPosts.search results
+SEARCH_TABLES = ("JobPosts", "PostSkills", "Companies", "Skills")
+
+
+# tables whose writes are also counted per value of one column, so results
+# that depend on one freelancer's applications outlive everyone else's
+SCOPED_TABLES = {"Applications": "freelancerId"}
+
+
+# table name -> number of committed writes seen by this process
+_generations = {}
+_generations_lock = threading.Lock()
+
+
+def bump(table, rows=None):
+    """
+    Record a committed write to `table`, invalidating results that depend on
+    it. For SCOPED_TABLES, `rows` (the written rows as dicts) say which
+    scopes changed; without them every scope does.
+    """
+    column = SCOPED_TABLES.get(table)
+    if column is None:
+        names = [table]
+    else:
+        values = {row.get(column) for row in rows} if rows else {None}
+        names = [table] + [f"{table}:{'*' if value is None else value}" for value in values]
+    with _generations_lock:
+        for name in names:
+            _generations[name] = _generations.get(name, 0) + 1
+
+
+def scope(table, value):
+    """
+    The tables to pass as dependencies of a result that reads only the rows
+    of `table` (one of SCOPED_TABLES) whose scope column equals `value`.
+    """
+    return (f"{table}:{value}", f"{table}:*")
+
+
+def generation(tables):
+    """The write generation of `tables`; changes whenever any of them is bumped"""
+    return tuple(_generations.get(table, 0) for table in tables)
+
+
+class SearchCache:
+    """
+    LRU cache of query results with a TTL and stale-while-revalidate.
+
+    Every entry remembers the generation of `tables` it was computed at and
+    is dropped as soon as one of them is written to. Only writes made
+    through the models of this process are seen, so with several worker
+    processes another worker's writes show up after at most ttl + stale_ttl.
+    """
+
+    def __init__(self, tables=SEARCH_TABLES, maxsize=SEARCH_CACHE_SIZE,
+                 ttl=SEARCH_CACHE_TTL, stale_ttl=SEARCH_CACHE_STALE_TTL):
+        self.tables = tuple(tables)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # key -> (generation, stored at, value), least recently used first
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key, compute, tables=()):
+        """
+        The cached value for `key`, computing it with compute() on a miss.
+        `tables` are written-to tables this entry depends on besides the
+        cache's own.
+
+        An entry older than ttl (but within stale_ttl after that) is still
+        returned, and compute() runs again on a background thread to
+        replace it. Cached values are shared, so callers must not mutate them.
+        """
+        tables = self.tables + tuple(tables)
+        current = generation(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entryGeneration, storedAt, value = entry
+                age = time.monotonic() - storedAt
+                if entryGeneration != current:
+                    del self._entries[key]
+                    self.invalidations += 1
+                elif age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    if age < self.ttl:
+                        self.hits += 1
+                    else:
+                        self.stale_hits += 1
+                        if key not in self._refreshing:
+                            self._refreshing.add(key)
+                            threading.Thread(target=self._refresh, args=(key, compute, tables), daemon=True).start()
+                    return value
+            self.misses += 1
+
+        return self._store(key, current, compute())
+
+    def estimate(self, key, compute, tables=()):
+        """
+        The value cached for `key` even when it is outdated, or None. The
+        caller never waits for compute(): unless the entry is fresh (within
+        ttl, and none of its tables written to since), it runs on a
+        background thread to replace it.
+        """
+        tables = self.tables + tuple(tables)
+        current = generation(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                value = None
+            else:
+                entryGeneration, storedAt, value = entry
+                self._entries.move_to_end(key)
+                if entryGeneration == current and time.monotonic() - storedAt < self.ttl:
+                    self.hits += 1
+                    return value
+                self.stale_hits += 1
+            if key not in self._refreshing:
+                self._refreshing.add(key)
+                threading.Thread(target=self._refresh, args=(key, compute, tables), daemon=True).start()
+        return value
+
+    def _store(self, key, entryGeneration, value):
+        with self._lock:
+            self._entries[key] = (entryGeneration, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def _refresh(self, key, compute, tables):
+        try:
+            # read before computing, so a write committed meanwhile still invalidates
+            current = generation(tables)
+            self._store(key, current, compute())
+        except Exception as e:
+            print("\nError refreshing cached search: ", e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters since the cache was created, plus the current entry count"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
+_cache = None
+# JobPosts.search totals too large to count on a request
+_counts = SearchCache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL, stale_ttl=0)
+# JobPosts.search facets by filter signature, so paging doesn't recount them
+_facets = SearchCache(maxsize=FACET_CACHE_SIZE)
+
+
+def get_cache():
+    """The configured JobPosts.search cache, or None when searches are not cached"""
+    return _cache
+
+
+def set_cache(cache):
+    global _cache
+    _cache = cache
+
+
+def get_counts():
+    """
+    The cache of search result counts, used through SearchCache.estimate;
+    None when searches are not cached
+    """
+    return _counts
+
+
+def get_facets():
+    """
+    The cache of search facets, shared by every page of a search; None
+    when searches are not cached
+    """
+    return _facets
+
+
+def init_app(app):
+    """
+    Configure the search caches from the app config: SEARCH_CACHE_SIZE
+    (0 disables the page, count and facet caches alike), SEARCH_CACHE_TTL
+    and SEARCH_CACHE_STALE_TTL in seconds.
+    """
+    global _counts, _facets
+    size = app.config.get("SEARCH_CACHE_SIZE", SEARCH_CACHE_SIZE)
+    if not size:
+        set_cache(None)
+        _counts = _facets = None
+        return
+    ttl = app.config.get("SEARCH_CACHE_TTL", SEARCH_CACHE_TTL)
+    stale_ttl = app.config.get("SEARCH_CACHE_STALE_TTL", SEARCH_CACHE_STALE_TTL)
+    set_cache(SearchCache(maxsize=size, ttl=ttl, stale_ttl=stale_ttl))
+    _counts = SearchCache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL, stale_ttl=0)
+    _facets = SearchCache(maxsize=FACET_CACHE_SIZE, ttl=ttl, stale_ttl=stale_ttl)
@@ -0,0 +1,225 @@
+import threading
+import time
+
+import numpy as np
+
+from db import search_cache
+from db.connection import connections
+
+
+# the index is rebuilt after writes to these tables that it could not apply
+# itself, or when older than SKILL_INDEX_TTL seconds (writes made by other
+# processes are not seen otherwise). Skills writes can't move a post: new
+# skills have no posts yet, and ids of deleted ones are never reused
+INDEX_TABLES = ("JobPosts", "PostSkills")
+SKILL_INDEX_TTL = 300
+
+# most post ids bound to one "WHERE id IN (...)" statement in refresh_posts
+REFRESH_CHUNK_SIZE = 512
+
+
+EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def to_postings(ids):
+    """A posting list: the distinct ids as a sorted int64 array"""
+    return np.unique(np.asarray(list(ids), dtype=np.int64))
+
+
+def _read(query, params=()):
+    with connections.reader() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+class SkillIndex:
+    """
+    Inverted index from skill id to the active job posts listing it.
+
+    Every posting list is a sorted array of post ids, so its size follows
+    the number of posts listing the skill rather than the largest post id.
+    Posts having all (or any) of several skills are the intersection (or
+    union) of their lists. Writes made through the models of this process
+    are applied as they commit (see on_write in models); anything else
+    marks the index stale and get_index() rebuilds it in the background.
+    """
+
+    def __init__(self, postSkills, generations):
+        # post id -> skill ids, for every active post
+        self.postSkills = postSkills
+        # skill id -> posting list of active posts, never empty
+        self.postings = {}
+        for postId, skillIds in postSkills.items():
+            for skillId in skillIds:
+                self.postings.setdefault(skillId, []).append(postId)
+        self.postings = {skillId: to_postings(postIds) for skillId, postIds in self.postings.items()}
+        # generation of each of INDEX_TABLES the index reflects
+        self.generations = generations
+        self.builtAt = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls):
+        # read before the rows, so a write committed meanwhile triggers a rebuild
+        generations = dict(zip(INDEX_TABLES, search_cache.generation(INDEX_TABLES)))
+        postSkills = {}
+        for postId, skillId in _read("""
+            SELECT ps.postId, ps.skillId
+            FROM PostSkills ps
+            JOIN JobPosts jp ON jp.id = ps.postId
+            WHERE jp.isActive = 1
+        """):
+            postSkills.setdefault(postId, set()).add(skillId)
+        return cls(postSkills, generations)
+
+    def stale(self):
+        current = dict(zip(INDEX_TABLES, search_cache.generation(INDEX_TABLES)))
+        return self.generations != current or time.monotonic() - self.builtAt > SKILL_INDEX_TTL
+
+    def refresh_posts(self, postIds, table=None):
+        """
+        Re-read whether the given posts are active and which skills they
+        list, and update their posting lists. `table` names the written
+        table whose generation the index now reflects.
+        """
+        postIds = list(dict.fromkeys(postIds))
+        current = {}
+        for i in range(0, len(postIds), REFRESH_CHUNK_SIZE):
+            chunk = postIds[i:i + REFRESH_CHUNK_SIZE]
+            for postId, skillId in _read(f"""
+                SELECT jp.id, ps.skillId
+                FROM JobPosts jp
+                LEFT JOIN PostSkills ps ON ps.postId = jp.id
+                WHERE jp.isActive = 1 AND jp.id IN ({", ".join("?" * len(chunk))})
+            """, chunk):
+                skills = current.setdefault(postId, set())
+                if skillId is not None:
+                    skills.add(skillId)
+
+        with self._lock:
+            # skill id -> (post ids to drop, post ids to add)
+            changes = {}
+            for postId in postIds:
+                old = self.postSkills.pop(postId, set())
+                new = current.get(postId, set())
+                for skillId in old - new:
+                    changes.setdefault(skillId, ([], []))[0].append(postId)
+                for skillId in new - old:
+                    changes.setdefault(skillId, ([], []))[1].append(postId)
+                if new:
+                    self.postSkills[postId] = new
+            # lists are replaced, never changed in place, so match() can
+            # read the ones it got after releasing the lock
+            for skillId, (dropped, added) in changes.items():
+                postings = self.postings.get(skillId, EMPTY)
+                if dropped:
+                    postings = np.setdiff1d(postings, dropped, assume_unique=True)
+                if added:
+                    postings = np.union1d(postings, added)
+                if len(postings):
+                    self.postings[skillId] = postings
+                else:
+                    self.postings.pop(skillId, None)
+            if table is not None:
+                self.generations[table] = search_cache.generation((table,))[0]
+
+    def match(self, skillIds, all=False):
+        """
+        Posting list (sorted array of post ids) of the active posts listing
+        any (or, with all=True, every) one of skillIds.
+        """
+        with self._lock:
+            postings = [self.postings.get(skillId, EMPTY) for skillId in dict.fromkeys(skillIds)]
+        if not postings:
+            return EMPTY
+        if not all:
+            return np.unique(np.concatenate(postings))
+        # intersect starting from the shortest list
+        postings.sort(key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "skills": len(self.postings),
+                "posts": len(self.postSkills),
+                "bytes": sum(postings.nbytes for postings in self.postings.values()),
+            }
+
+
+_index = None
+_rebuilding = False
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The skill index, or None when job searches don't use one. Once it is
+    stale the current index keeps being served while a background thread
+    builds the next one.
+    """
+    global _rebuilding
+    with _index_lock:
+        if _index is not None and not _rebuilding and _index.stale():
+            _rebuilding = True
+            threading.Thread(target=_rebuild, daemon=True).start()
+        return _index
+
+
+def set_index(index):
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def _rebuild():
+    global _index, _rebuilding
+    try:
+        index = SkillIndex.build()
+        with _index_lock:
+            # unless the index was turned off meanwhile
+            if _index is not None:
+                _index = index
+    except Exception as e:
+        print("\nError rebuilding the skill index: ", e)
+    finally:
+        with _index_lock:
+            _rebuilding = False
+
+
+def refresh_index():
+    """Rebuild the skill index now (e.g. after bulk imports made outside the models)"""
+    index = SkillIndex.build()
+    set_index(index)
+    return index
+
+
+def written(key, table):
+    """
+    A write listener (see models.on_write) that applies the rows written to
+    `table` to the index, finding the post of each row under `key`. Writes
+    whose posts are unknown leave the index stale, to be rebuilt.
+    """
+    def listener(rows):
+        index = _index
+        if index is None or not rows:
+            return
+        postIds = [row.get(key) for row in rows]
+        if None not in postIds:
+            index.refresh_posts(postIds, table)
+    return listener
+
+
+def init_app(app):
+    """
+    Build the skill index used to filter job searches by skill, unless
+    SKILL_INDEX is false in the app config.
+    """
+    if not app.config.get("SKILL_INDEX", True):
+        set_index(None)
+        return
+    refresh_index()
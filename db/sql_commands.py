@@ -4,7 +4,8 @@ insertQueries = {
     "Recruiters": "INSERT INTO Recruiters (username, email, password) VALUES (?, ?, ?)",
     "Freelancers": "INSERT INTO Freelancers (username, email, password) VALUES (?, ?, ?)",
     "Companies": "INSERT INTO Companies (username, companyName, companyPhone, companyAddress, companyDescription, employeeSize) VALUES (?, ?, ?, ?, ?, ?)",
-    "Skills": "INSERT INTO Skills (skill) VALUES (?)",
+    "Skills": "INSERT INTO Skills (skill, skillKey) VALUES (?, ?)",
+    "SkillAliases": "INSERT INTO SkillAliases (aliasKey, skillId) VALUES (?, ?)",
     "FreelancerDetails": "INSERT INTO FreelancerDetails (freelancerId, firstName, middleName, lastName, phoneNumber, contactEmail, about, dateOfBirth, address) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
     
     # JobPosts - exclude postedOn (auto-set)
@@ -15,7 +16,7 @@ insertQueries = {
     "Educations": "INSERT INTO Educations (freelancerId, course, degree, school, startDate, endDate, cgpa) VALUES (?, ?, ?, ?, ?, ?, ?)",
     
     # Resumes - exclude uploadedAt (auto-set)
-    "Resumes": "INSERT INTO Resumes (freelancerId, name, pdfData, fileSize, isDefault) VALUES (?, ?, ?, ?, ?)",
+    "Resumes": "INSERT INTO Resumes (freelancerId, name, pdfData, fileSize, isDefault, contentHash) VALUES (?, ?, ?, ?, ?, ?)",
     
     # Junction tables - exclude auto-set timestamp fields
     "PostSkills": "INSERT INTO PostSkills (postId, skillId, isRequired) VALUES (?, ?, ?)",
@@ -79,10 +80,19 @@ createTable = {
     CREATE TABLE IF NOT EXISTS Skills (
         id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
         skill TEXT NOT NULL UNIQUE,
+        skillKey TEXT,
         createdAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
         updatedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
     );""",
     
+    "SkillAliases": """
+    CREATE TABLE IF NOT EXISTS SkillAliases (
+        aliasKey TEXT NOT NULL PRIMARY KEY,
+        skillId INTEGER NOT NULL,
+        createdAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(skillId) REFERENCES Skills(id) ON DELETE CASCADE
+    );""",
+    
     "JobPosts": """
     CREATE TABLE IF NOT EXISTS JobPosts (
         id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
@@ -103,6 +113,19 @@ createTable = {
         FOREIGN KEY(companyId) REFERENCES Companies(id) ON DELETE CASCADE
     );""",
     
+    # Full-text index over JobPosts (external content: the text lives in
+    # JobPosts only); kept in sync by the jobposts_fts_* triggers
+    "JobPostsFts": """
+    CREATE VIRTUAL TABLE IF NOT EXISTS JobPostsFts USING fts5(
+        title,
+        description,
+        location,
+        content='JobPosts',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    );""",
+    
     "PostSkills": """
     CREATE TABLE IF NOT EXISTS PostSkills (
         postId INTEGER NOT NULL,
@@ -181,7 +204,17 @@ createTable = {
         uploadedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
         createdAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
         updatedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(freelancerId) REFERENCES Freelancers(id) ON DELETE CASCADE
+        contentHash TEXT,
+        FOREIGN KEY(freelancerId) REFERENCES Freelancers(id) ON DELETE CASCADE,
+        FOREIGN KEY(contentHash) REFERENCES ResumeFiles(contentHash)
+    );""",
+    
+    "ResumeFiles": """
+    CREATE TABLE IF NOT EXISTS ResumeFiles (
+        contentHash TEXT NOT NULL PRIMARY KEY,
+        fileSize INTEGER NOT NULL CHECK(fileSize > 0),
+        refCount INTEGER NOT NULL DEFAULT 0 CHECK(refCount >= 0),
+        createdAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
     );""",
     
     "Applications": """
@@ -199,6 +232,16 @@ createTable = {
         FOREIGN KEY(jobPostId) REFERENCES JobPosts(id) ON DELETE CASCADE,
         FOREIGN KEY(freelancerId) REFERENCES Freelancers(id) ON DELETE CASCADE,
         FOREIGN KEY(resumeId) REFERENCES Resumes(id) ON DELETE RESTRICT
+    );""",
+    
+    # Applicant match scores (see recommendations.score_applicants); a row is
+    # deleted by triggers whenever an input of its score changes
+    "ApplicationScores": """
+    CREATE TABLE IF NOT EXISTS ApplicationScores (
+        applicationId INTEGER NOT NULL PRIMARY KEY,
+        jobPostId INTEGER NOT NULL,
+        matchScore REAL NOT NULL,
+        FOREIGN KEY(applicationId) REFERENCES Applications(id) ON DELETE CASCADE
     );"""
 }
 
@@ -211,18 +254,33 @@ createIndexes = {
     "idx_companies_username": "CREATE INDEX IF NOT EXISTS idx_companies_username ON Companies(username);",
     "idx_jobposts_company": "CREATE INDEX IF NOT EXISTS idx_jobposts_company ON JobPosts(companyId);",
     "idx_jobposts_recruiter": "CREATE INDEX IF NOT EXISTS idx_jobposts_recruiter ON JobPosts(recruiterId);",
-    "idx_jobposts_active": "CREATE INDEX IF NOT EXISTS idx_jobposts_active ON JobPosts(isActive, postedOn);",
-    "idx_applications_freelancer": "CREATE INDEX IF NOT EXISTS idx_applications_freelancer ON Applications(freelancerId);",
+    "idx_jobposts_feed": "CREATE INDEX IF NOT EXISTS idx_jobposts_feed ON JobPosts(isActive, postedOn, id);",
+    "idx_applications_freelancer_job": "CREATE INDEX IF NOT EXISTS idx_applications_freelancer_job ON Applications(freelancerId, jobPostId);",
     "idx_applications_status": "CREATE INDEX IF NOT EXISTS idx_applications_status ON Applications(status);",
     "idx_applications_jobpost": "CREATE INDEX IF NOT EXISTS idx_applications_jobpost ON Applications(jobPostId);",
+    "idx_applicationscores_rank": "CREATE INDEX IF NOT EXISTS idx_applicationscores_rank ON ApplicationScores(jobPostId, matchScore, applicationId);",
     "idx_experiences_freelancer": "CREATE INDEX IF NOT EXISTS idx_experiences_freelancer ON Experiences(freelancerId);",
     "idx_educations_freelancer": "CREATE INDEX IF NOT EXISTS idx_educations_freelancer ON Educations(freelancerId);",
     "idx_resumes_freelancer": "CREATE INDEX IF NOT EXISTS idx_resumes_freelancer ON Resumes(freelancerId);",
     "idx_resumes_default": "CREATE INDEX IF NOT EXISTS idx_resumes_default ON Resumes(freelancerId, isDefault);",
+    "idx_resumes_content": "CREATE INDEX IF NOT EXISTS idx_resumes_content ON Resumes(freelancerId, contentHash);",
+    "idx_skills_key": "CREATE UNIQUE INDEX IF NOT EXISTS idx_skills_key ON Skills(skillKey);",
+    "idx_skillaliases_skill": "CREATE INDEX IF NOT EXISTS idx_skillaliases_skill ON SkillAliases(skillId);",
     "idx_postskills_post": "CREATE INDEX IF NOT EXISTS idx_postskills_post ON PostSkills(postId);",
     "idx_postskills_skill": "CREATE INDEX IF NOT EXISTS idx_postskills_skill ON PostSkills(skillId);",
     "idx_recruitercompanies_recruiter": "CREATE INDEX IF NOT EXISTS idx_recruitercompanies_recruiter ON RecruiterCompanies(recruiterId);",
     "idx_recruitercompanies_company": "CREATE INDEX IF NOT EXISTS idx_recruitercompanies_company ON RecruiterCompanies(companyId);",
     "idx_freelancerskills_freelancer": "CREATE INDEX IF NOT EXISTS idx_freelancerskills_freelancer ON FreelancerSkills(freelancerId);",
     "idx_freelancerskills_skill": "CREATE INDEX IF NOT EXISTS idx_freelancerskills_skill ON FreelancerSkills(skillId);"
-}
\ No newline at end of file
+}
+
+# Columns added after the first release; create_database adds them to
+# tables that were created before they existed
+addColumns = {
+    "Resumes": {
+        "contentHash": "TEXT REFERENCES ResumeFiles(contentHash)"
+    },
+    "Skills": {
+        "skillKey": "TEXT"
+    }
+}
@@ -2,9 +2,28 @@ import unittest
 import sqlite3
 import os
 import tempfile
+import shutil
+from io import BytesIO
 from datetime import datetime, timedelta
+from flask import Flask, g
+from db.connection import connections
 from db.models import *
-from db.database_setup import create_database, drop_all_tables
+from db.database_setup import create_database, drop_all_tables, migrate_resume_blobs, rebuild_search_index
+from db import resume_store, search_cache, recommendations, skill_index
+import numpy as np
+import time
+from unittest import mock
+
+
+def close_pooled_connections():
+    """Close the idle pooled read connections, so none outlives a test's database"""
+    while not connections._read_pool.empty():
+        connections._read_pool.get_nowait().close()
+
+
+def rebuild_post_matrix():
+    """Build the recommendation matrix now instead of in the background"""
+    recommendations._matrix = recommendations.PostSkillMatrix.build()
 
 
 class TestDatabaseSetup(unittest.TestCase):
@@ -45,7 +64,7 @@ class TestDatabaseSetup(unittest.TestCase):
             
             # Clear all tables in proper order
             tables = ["Applications", "FreelancerSkills", "RecruiterCompanies", 
-                     "PostSkills", "Resumes", "Educations", "Experiences", 
+                     "PostSkills", "Resumes", "ResumeFiles", "Educations", "Experiences", 
                      "JobPosts", "Skills", "Companies", "Freelancers", "Recruiters"]
             
             for table in tables:
@@ -432,6 +451,47 @@ class TestJunctionModels(TestDatabaseSetup):
         self.assertEqual(updated.status, "UNDER_REVIEW")
 
 
+class TestBulkInsert(TestDatabaseSetup):
+    """Test insertMany bulk writes"""
+    
+    def test_insert_many_returns_ids(self):
+        """insertMany returns the generated ids in input order"""
+        ids = Skills.insertMany(Skills(skill=f"skill_{i}") for i in range(25))
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(Skills.get(id=ids[0]).skill, "skill_0")
+        self.assertEqual(Skills.get(id=ids[-1]).skill, "skill_24")
+    
+    def test_insert_many_honours_exclusions(self):
+        """insertMany leaves out the same auto-set fields as insert"""
+        recruiter_id = Recruiters(username="bulk", email="bulk@test.com", password="pass").insert()
+        company_id = Companies(
+            username="bulk_co", companyName="Bulk", companyPhone="1",
+            companyAddress="St", companyDescription="Desc"
+        ).insert()
+        
+        post_ids = JobPosts.insertMany(
+            JobPosts(
+                recruiterId=recruiter_id, companyId=company_id, title=f"Job {i}",
+                description="Desc", experience=i, jobType="CONTRACT",
+                location="Remote", salary=100.0, validTill="2030-01-01"
+            ) for i in range(3)
+        )
+        skill_ids = Skills.insertMany(Skills(skill=s) for s in ("A", "B"))
+        
+        PostSkills.insertMany(
+            (PostSkills(postId=p, skillId=s) for p in post_ids for s in skill_ids),
+            batch_size=4
+        )
+        self.assertEqual(len(PostSkills.getAll()), 6)
+        self.assertIsNotNone(JobPosts.get(id=post_ids[2]).postedOn)
+    
+    def test_insert_many_is_atomic(self):
+        """A failing row leaves nothing behind"""
+        ids = Skills.insertMany([Skills(skill="Dup"), Skills(skill="Other"), Skills(skill="Dup")])
+        self.assertIsNone(ids)
+        self.assertEqual(Skills.getAll(), [])
+
+
 class TestModelValidation(TestDatabaseSetup):
     """Test model validation and constraints"""
     
@@ -688,6 +748,1111 @@ class TestEdgeCases(TestDatabaseSetup):
         self.assertNotIn('updatedAt', filtered_data)
 
 
+class TestCompiledQueries(TestDatabaseSetup):
+    """Test the per-model compiled statement registry"""
+    
+    def test_same_shape_reuses_sql(self):
+        """Keyword order doesn't change the compiled statement"""
+        first = Applications.compiledQuery("select", ("freelancerId", "jobPostId"))
+        second = Applications.compiledQuery("select", ("freelancerId", "jobPostId"))
+        self.assertIs(first, second)
+        self.assertEqual(first, "SELECT * FROM Applications WHERE freelancerId = ? AND jobPostId = ?")
+    
+    def test_params_follow_sorted_columns(self):
+        """Lookups with keywords in any order bind the right values"""
+        recruiter_id = Recruiters(username="shape", email="shape@test.com", password="pass").insert()
+        self.assertEqual(Recruiters.get(username="shape", email="shape@test.com").id, recruiter_id)
+        self.assertEqual(Recruiters.get(email="shape@test.com", username="shape").id, recruiter_id)
+    
+    def test_unknown_column_rejected(self):
+        """Column names are validated against the model fields"""
+        with self.assertRaises(ValueError):
+            Recruiters.get(**{"id = 1 OR 1": 1})
+
+
+class TestGetMany(TestDatabaseSetup):
+    """Test batched loading by id"""
+    
+    def test_get_many(self):
+        """getMany returns an id-keyed dict and ignores duplicates and unknown ids"""
+        ids = Skills.insertMany(Skills(skill=f"skill{i}") for i in range(5))
+        found = Skills.getMany([ids[3], ids[0], ids[3], 999999, None])
+        self.assertEqual(set(found), {ids[0], ids[3]})
+        self.assertEqual(found[ids[3]].skill, "skill3")
+        self.assertEqual(Skills.getMany([]), {})
+    
+    def test_get_many_chunks(self):
+        """More ids than fit one IN list are loaded in several chunks"""
+        ids = Skills.insertMany(Skills(skill=f"skill{i}") for i in range(IN_CHUNK_SIZE + 5))
+        found = Skills.getMany(ids)
+        self.assertEqual(len(found), len(ids))
+        self.assertEqual(found[ids[-1]].skill, f"skill{IN_CHUNK_SIZE + 4}")
+    
+    def test_get_many_projection(self):
+        """getMany honours fields= and deferred columns"""
+        freelancer_id = Freelancers(username="many", email="m@test.com", password="pass").insert()
+        resume_id = Resumes(freelancerId=freelancer_id, name="cv", pdfData=b"%PDF", fileSize=4).insert()
+        resume = Resumes.getMany([resume_id])[resume_id]
+        self.assertNotIn("pdfData", resume.model_dump())
+        self.assertEqual(resume.pdfData, b"%PDF")
+        
+        names = Resumes.getMany([resume_id], fields=("name",))
+        self.assertEqual(names[resume_id].model_dump(), {"id": resume_id, "name": "cv"})
+
+
+class TestRelations(TestDatabaseSetup):
+    """Test relation declarations and prefetching"""
+    
+    def setUp(self):
+        super().setUp()
+        self.recruiter_id = Recruiters(username="rel", email="rel@test.com", password="pass").insert()
+        self.company_id = Companies(
+            username="rel_co", companyName="Rel Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.post_ids = JobPosts.insertMany(
+            JobPosts(
+                recruiterId=self.recruiter_id, companyId=self.company_id, title=f"Job {i}",
+                description="Desc", experience=1, jobType="FULL_TIME",
+                location="Remote", salary=100.0, validTill="2030-01-01"
+            )
+            for i in range(3)
+        )
+        self.skill_ids = Skills.insertMany(Skills(skill=s) for s in ("Python", "SQL"))
+        PostSkills.insertMany(PostSkills(postId=self.post_ids[0], skillId=k) for k in self.skill_ids)
+        
+        self.freelancer_id = Freelancers(username="relf", email="relf@test.com", password="pass").insert()
+        self.resume_id = Resumes(freelancerId=self.freelancer_id, name="cv", pdfData=b"%PDF", fileSize=4).insert()
+        Applications.insertMany(
+            Applications(jobPostId=post_id, freelancerId=self.freelancer_id, resumeId=self.resume_id)
+            for post_id in self.post_ids
+        )
+    
+    def test_prefetch_nested(self):
+        """prefetch loads many-to-one relations, following dotted paths"""
+        applications = Applications.getAll(
+            freelancerId=self.freelancer_id, prefetch=["jobPost.company", "resume"]
+        )
+        self.assertEqual(len(applications), 3)
+        for application in applications:
+            self.assertIn("jobPost", application._related)
+            self.assertIn("company", application.jobPost._related)
+            self.assertEqual(application.jobPost.company.companyName, "Rel Co")
+            self.assertEqual(application.resume.id, self.resume_id)
+        self.assertNotIn("jobPost", applications[0].model_dump())
+    
+    def test_prefetch_many(self):
+        """Through and HasMany relations give lists, empty when nothing matches"""
+        posts = JobPosts.getAll(companyId=self.company_id, prefetch=["skills", "applications"])
+        skills = {post.id: [s.skill for s in post.skills] for post in posts}
+        self.assertEqual(skills[self.post_ids[0]], ["Python", "SQL"])
+        self.assertEqual(skills[self.post_ids[1]], [])
+        self.assertTrue(all(len(post.applications) == 1 for post in posts))
+        
+        company = Companies.get(id=self.company_id, prefetch=["posts"])
+        self.assertEqual(sorted(p.id for p in company.posts), self.post_ids)
+    
+    def test_lazy_relation_and_unknown(self):
+        """Relations load on first access; unknown names are rejected"""
+        post = JobPosts.get(id=self.post_ids[0])
+        self.assertEqual(post.company.id, self.company_id)
+        self.assertEqual(PostSkills.getAll(postId=self.post_ids[0])[0].skill.skill, "Python")
+        
+        with self.assertRaises(ValueError):
+            JobPosts.getAll(prefetch=["nope"])
+
+
+class TestSearchPagination(TestDatabaseSetup):
+    """Test keyset pagination of JobPosts.search"""
+    
+    def setUp(self):
+        super().setUp()
+        recruiter_id = Recruiters(username="pager", email="pager@test.com", password="pass").insert()
+        company_id = Companies(
+            username="pager_co", companyName="Pager Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        # inserted in one go, so many rows share a postedOn and id breaks the tie
+        self.post_ids = JobPosts.insertMany(
+            JobPosts(
+                recruiterId=recruiter_id, companyId=company_id, title=f"Job {i}",
+                description="Desc", experience=1, jobType="FULL_TIME",
+                location="Remote", salary=100.0, validTill="2030-01-01"
+            )
+            for i in range(25)
+        )
+    
+    def test_pages_forward_and_back(self):
+        """Cursors walk every row once, newest first, and back again"""
+        pages = [JobPosts.search()]
+        while pages[-1]["next_cursor"]:
+            pages.append(JobPosts.search(cursor=pages[-1]["next_cursor"]))
+        
+        self.assertEqual([len(p["jobs"]) for p in pages], [10, 10, 5])
+        self.assertIsNone(pages[0]["prev_cursor"])
+        seen = [job["id"] for p in pages for job in p["jobs"]]
+        self.assertEqual(seen, sorted(self.post_ids, reverse=True))
+        
+        back = JobPosts.search(cursor=pages[2]["prev_cursor"])
+        self.assertEqual(back["jobs"], pages[1]["jobs"])
+        first = JobPosts.search(cursor=back["prev_cursor"])
+        self.assertEqual(first["jobs"], pages[0]["jobs"])
+        self.assertIsNone(first["prev_cursor"])
+    
+    def test_page_skills(self):
+        """Skills for a whole page are attached in one batch, required first"""
+        python_id = Skills(skill="Python").insert()
+        sql_id = Skills(skill="SQL").insert()
+        newest, older = self.post_ids[-1], self.post_ids[-2]
+        PostSkills.insertMany([
+            PostSkills(postId=newest, skillId=sql_id, isRequired=True),
+            PostSkills(postId=newest, skillId=python_id, isRequired=False),
+            PostSkills(postId=older, skillId=python_id, isRequired=True),
+        ])
+        
+        jobs = JobPosts.search()["jobs"]
+        self.assertEqual(jobs[0]["skills"], ["SQL", "Python"])
+        self.assertEqual(jobs[1]["skills"], ["Python"])
+        self.assertEqual(jobs[2]["skills"], [])
+        
+        listed = JobPosts.get_many_with_company_and_skills([older, 999999, newest])
+        self.assertEqual([job["id"] for job in listed], [older, newest])
+        self.assertEqual(listed[0]["company_name"], "Pager Co")
+        self.assertEqual([skill["skill"] for skill in listed[1]["skills"]], ["SQL", "Python"])
+        self.assertEqual(JobPosts.get_with_company_and_skills(newest)["skills"], listed[1]["skills"])
+        self.assertIsNone(JobPosts.get_with_company_and_skills(999999))
+    
+    def test_skills_filter(self):
+        """Posts with several matching skills are listed once; names match case-insensitively"""
+        python_id = Skills(skill="Python").insert()
+        sql_id = Skills(skill="SQL").insert()
+        both, one = self.post_ids[3], self.post_ids[7]
+        PostSkills.insertMany([
+            PostSkills(postId=both, skillId=python_id),
+            PostSkills(postId=both, skillId=sql_id),
+            PostSkills(postId=one, skillId=sql_id),
+        ])
+        
+        jobs = JobPosts.search(skills="python, sql")["jobs"]
+        self.assertEqual([job["id"] for job in jobs], [one, both])
+        self.assertEqual([job["id"] for job in JobPosts.search(skills="PYTHON")["jobs"]], [both])
+        self.assertEqual(JobPosts.search(skills="Cobol")["jobs"], [])
+        self.assertEqual(Skills.lookup_keys(["sql", "cobol"]), {"sql": sql_id})
+    
+    def test_applied_filter(self):
+        """Applied / not applied is filtered in SQL, so pages stay full"""
+        freelancer_id = Freelancers(username="applicant", email="applicant@test.com", password="pass").insert()
+        resume_id = Resumes(freelancerId=freelancer_id, name="cv", pdfData=b"pdf", fileSize=3).insert()
+        applied_ids = self.post_ids[::2]
+        Applications.insertMany(
+            Applications(jobPostId=post_id, freelancerId=freelancer_id, resumeId=resume_id)
+            for post_id in applied_ids
+        )
+        
+        def walk(**filters):
+            pages = [JobPosts.search(freelancer_id=freelancer_id, **filters)]
+            while pages[-1]["next_cursor"]:
+                pages.append(JobPosts.search(freelancer_id=freelancer_id, cursor=pages[-1]["next_cursor"], **filters))
+            return pages
+        
+        pages = walk(applied=True)
+        self.assertEqual([len(p["jobs"]) for p in pages], [10, 3])
+        self.assertEqual(sorted(job["id"] for p in pages for job in p["jobs"]), sorted(applied_ids))
+        self.assertTrue(all(job["has_applied"] for p in pages for job in p["jobs"]))
+        
+        pages = walk(applied=False)
+        self.assertEqual([len(p["jobs"]) for p in pages], [10, 2])
+        self.assertFalse(any(job["has_applied"] for p in pages for job in p["jobs"]))
+        
+        flags = {job["id"]: job["has_applied"] for job in JobPosts.search(freelancer_id=freelancer_id)["jobs"]}
+        self.assertEqual(flags, {post_id: post_id in applied_ids for post_id in self.post_ids[-10:]})
+        self.assertFalse(any(job["has_applied"] for job in JobPosts.search()["jobs"]))
+        with self.assertRaises(ValueError):
+            JobPosts.search(applied=True)
+    
+    def test_has_next_and_total(self):
+        """has_next comes from the extra row; totals are exact up to the count limit"""
+        first = JobPosts.search(total=True)
+        self.assertTrue(first["has_next"])
+        self.assertFalse(first["has_prev"])
+        self.assertEqual((first["total"], first["total_exact"]), (25, True))
+        
+        last = JobPosts.search(cursor=JobPosts.search(cursor=first["next_cursor"])["next_cursor"], total=True)
+        self.assertEqual(len(last["jobs"]), 5)
+        self.assertFalse(last["has_next"])
+        self.assertTrue(last["has_prev"])
+        self.assertEqual(last["total"], 25)
+        self.assertNotIn("total", JobPosts.search())
+        self.assertEqual(JobPosts.search(search="nothing", total=True)["total"], 0)
+        
+        search_cache.get_counts().clear()
+        with mock.patch("db.models.SEARCH_COUNT_LIMIT", 10):
+            # a lower bound until the background count is cached, then that count
+            self.assertEqual(JobPosts.search(total=True)["total"], 10)
+            self.assertFalse(JobPosts.search(total=True)["total_exact"])
+            for _ in range(100):
+                if JobPosts.search(total=True)["total"] == 25:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(JobPosts.search(total=True)["total"], 25)
+            self.assertEqual(JobPosts.search(max_experience=0, total=True)["total"], 0)
+    
+    def test_invalid_cursor_starts_over(self):
+        """A malformed token is treated as the first page"""
+        self.assertEqual(JobPosts.search(cursor="not-a-cursor"), JobPosts.search())
+        self.assertEqual(JobPosts.search(cursor=encode_cursor("next", 1)), JobPosts.search())
+
+
+class TestFullTextSearch(TestDatabaseSetup):
+    """Test the JobPosts full-text index"""
+    
+    def setUp(self):
+        super().setUp()
+        recruiter_id = Recruiters(username="fts", email="fts@test.com", password="pass").insert()
+        company_id = Companies(
+            username="fts_co", companyName="FTS Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.post = dict(
+            recruiterId=recruiter_id, companyId=company_id, experience=1, jobType="FULL_TIME",
+            salary=100.0, validTill="2030-01-01"
+        )
+        self.python_id = JobPosts(title="Python Developer", description="Build Flask APIs",
+                                  location="Pune", **self.post).insert()
+        self.design_id = JobPosts(title="Designer", description="Figma and café branding",
+                                  location="Mumbai", **self.post).insert()
+    
+    def titles(self, **kwargs):
+        return sorted(job["title"] for job in JobPosts.search(**kwargs)["jobs"])
+    
+    def test_prefix_match(self):
+        """Words match by prefix in title or description, case and accents ignored"""
+        self.assertEqual(self.titles(search="pyth"), ["Python Developer"])
+        self.assertEqual(self.titles(search="flask dev"), ["Python Developer"])
+        self.assertEqual(self.titles(search="CAFE"), ["Designer"])
+        self.assertEqual(self.titles(search="pune"), [])
+        self.assertEqual(self.titles(location="mum"), ["Designer"])
+        # FTS syntax in user input is treated as plain text
+        self.assertEqual(self.titles(search='"- *'), ["Designer", "Python Developer"])
+        self.assertEqual(self.titles(search="python OR figma"), [])
+    
+    def test_index_follows_writes(self):
+        """Triggers keep the index in sync with inserts, updates and deletes"""
+        post = JobPosts.get(id=self.python_id, defer=())
+        post.title = "Rust Engineer"
+        post.update()
+        self.assertEqual(self.titles(search="rust"), ["Rust Engineer"])
+        self.assertEqual(self.titles(search="python"), [])
+        
+        JobPosts.get(id=self.design_id).delete()
+        self.assertEqual(self.titles(search="figma"), [])
+        
+        self.assertTrue(rebuild_search_index())
+        self.assertEqual(self.titles(search="engineer"), ["Rust Engineer"])
+
+
+class TestSearchCache(TestDatabaseSetup):
+    """Test the JobPosts.search result cache"""
+    
+    def setUp(self):
+        super().setUp()
+        self.cache = search_cache.SearchCache(maxsize=2)
+        search_cache.set_cache(self.cache)
+        recruiter_id = Recruiters(username="cache", email="cache@test.com", password="pass").insert()
+        self.company_id = Companies(
+            username="cache_co", companyName="Cache Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.post = dict(
+            recruiterId=recruiter_id, companyId=self.company_id, description="Desc", experience=1,
+            jobType="FULL_TIME", location="Remote", salary=100.0, validTill="2030-01-01"
+        )
+        self.job_id = JobPosts(title="Cached Job", **self.post).insert()
+    
+    def tearDown(self):
+        search_cache.set_cache(None)
+    
+    def test_hits_and_invalidation(self):
+        """Equivalent filters share an entry; committed writes to dependent tables drop it"""
+        first = JobPosts.search(search="cached")
+        self.assertEqual(JobPosts.search(search="  CACHED "), first)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        
+        JobPosts(title="Cached Again", **self.post).insert()
+        self.assertEqual(len(JobPosts.search(search="cached")["jobs"]), 2)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+        
+        # a rolled back write leaves the entry in place
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                Companies.get(id=self.company_id).update(companyName="Renamed")
+                raise RuntimeError("abort")
+        JobPosts.search(search="cached")
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+        
+        skill_id = Skills(skill="Caching").insert()
+        PostSkills(postId=self.job_id, skillId=skill_id).insert()
+        jobs = JobPosts.search(search="cached")["jobs"]
+        self.assertEqual([job["skills"] for job in jobs], [[], ["Caching"]])
+        self.assertEqual(self.cache.stats()["invalidations"], 2)
+    
+    def test_applications_invalidate_freelancer_pages(self):
+        """Pages for a freelancer also depend on Applications"""
+        freelancer_id = Freelancers(username="cf", email="cf@test.com", password="pass").insert()
+        resume_id = Resumes(freelancerId=freelancer_id, name="cv", pdfData=b"pdf", fileSize=3).insert()
+        self.assertEqual(len(JobPosts.search(freelancer_id=freelancer_id, applied=False)["jobs"]), 1)
+        
+        Applications(jobPostId=self.job_id, freelancerId=freelancer_id, resumeId=resume_id).insert()
+        self.assertEqual(JobPosts.search(freelancer_id=freelancer_id, applied=False)["jobs"], [])
+        self.assertTrue(JobPosts.search(freelancer_id=freelancer_id)["jobs"][0]["has_applied"])
+
+    def test_freelancers_share_pages(self):
+        """has_applied is looked up per freelancer on top of one shared entry"""
+        resume_ids = {}
+        for name in ("one", "two", "three"):
+            freelancer_id = Freelancers(username=name, email=f"{name}@test.com", password="pass").insert()
+            resume_ids[freelancer_id] = Resumes(freelancerId=freelancer_id, name="cv", pdfData=b"pdf", fileSize=3).insert()
+        first, second, third = resume_ids
+        Applications(jobPostId=self.job_id, freelancerId=first, resumeId=resume_ids[first]).insert()
+        self.cache.clear()
+        
+        flags = [JobPosts.search(freelancer_id=freelancer_id)["jobs"][0]["has_applied"] for freelancer_id in resume_ids]
+        self.assertEqual(flags, [True, False, False])
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(self.cache.stats()["hits"], 2)
+        self.assertEqual(self.cache.stats()["size"], 1)
+        
+        # another freelancer's application leaves the shared and the scoped entries alone
+        JobPosts.search(freelancer_id=third, applied=False)
+        Applications(jobPostId=self.job_id, freelancerId=second, resumeId=resume_ids[second]).insert()
+        self.assertTrue(JobPosts.search(freelancer_id=second)["jobs"][0]["has_applied"])
+        self.assertEqual(len(JobPosts.search(freelancer_id=third, applied=False)["jobs"]), 1)
+        self.assertEqual(self.cache.stats()["invalidations"], 0)
+        
+        # so does a recruiter updating or removing it
+        Applications.get(freelancerId=second).update(status="REJECTED")
+        Applications.get(freelancerId=second).delete()
+        self.assertEqual(len(JobPosts.search(freelancer_id=third, applied=False)["jobs"]), 1)
+        self.assertEqual(self.cache.stats()["invalidations"], 0)
+        
+        Applications.get(freelancerId=first).update(status="REJECTED")
+        JobPosts.search(freelancer_id=first, applied=True)
+        Applications.get(freelancerId=first).delete()
+        self.assertEqual(JobPosts.search(freelancer_id=first, applied=True)["jobs"], [])
+    
+    def test_lru_eviction(self):
+        """The least recently used entry goes first once the cache is full"""
+        JobPosts.search(search="a")
+        JobPosts.search(search="b")
+        JobPosts.search(search="a")
+        JobPosts.search(search="c")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        JobPosts.search(search="a")
+        JobPosts.search(search="b")
+        self.assertEqual(self.cache.stats()["hits"], 2)
+        self.assertEqual(self.cache.stats()["misses"], 4)
+    
+    def test_stale_while_revalidate(self):
+        """Expired entries are served once more while a background refresh replaces them"""
+        cache = search_cache.SearchCache(ttl=0, stale_ttl=60)
+        calls = []
+        def compute():
+            calls.append(None)
+            return len(calls)
+        
+        self.assertEqual(cache.get("key", compute), 1)
+        self.assertEqual(cache.get("key", compute), 1)
+        for _ in range(100):
+            if not cache._refreshing:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.get("key", compute), 2)
+        self.assertEqual(cache.stats()["stale_hits"], 2)
+
+
+class TestSearchFacets(TestDatabaseSetup):
+    """Test the facet counts returned by JobPosts.search"""
+    
+    def setUp(self):
+        super().setUp()
+        recruiter_id = Recruiters(username="facet", email="facet@test.com", password="pass").insert()
+        company_id = Companies(
+            username="facet_co", companyName="Facet Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        post = dict(recruiterId=recruiter_id, companyId=company_id, description="Desc", validTill="2030-01-01")
+        self.post_ids = JobPosts.insertMany([
+            JobPosts(title="A", experience=0, jobType="FULL_TIME", location="Chennai", salary=50000.0, **post),
+            JobPosts(title="B", experience=3, jobType="FULL_TIME", location="Chennai", salary=150000.0, **post),
+            JobPosts(title="C", experience=12, jobType="CONTRACT", location="Remote", salary=120000.0, **post),
+            JobPosts(title="D", experience=1, jobType="CONTRACT", location="Remote", salary=10.0,
+                     isActive=False, **post),
+        ])
+        python = Skills(skill="Python").insert()
+        go = Skills(skill="Go").insert()
+        PostSkills.insertMany([
+            PostSkills(postId=self.post_ids[0], skillId=python),
+            PostSkills(postId=self.post_ids[1], skillId=python),
+            PostSkills(postId=self.post_ids[2], skillId=go),
+            PostSkills(postId=self.post_ids[3], skillId=go),
+        ])
+        search_cache.get_facets().clear()
+    
+    def counts(self, facet, **filters):
+        return {f["value"]: f["count"] for f in JobPosts.search(facets=True, **filters)["facets"][facet]}
+    
+    def test_counts(self):
+        """Every facet counts the active posts matching the filters, not just the page"""
+        results = JobPosts.search(facets=True, page_size=1)
+        self.assertEqual(len(results["jobs"]), 1)
+        facets = results["facets"]
+        self.assertEqual(facets["jobType"], [
+            {"value": "FULL_TIME", "count": 2}, {"value": "CONTRACT", "count": 1}
+        ])
+        self.assertEqual([(f["value"], f["min"], f["max"]) for f in facets["experience"]],
+                         [("0-1", 0, 1), ("2-4", 2, 4), ("10+", 10, None)])
+        self.assertEqual([(f["min"], f["count"]) for f in facets["salary"]], [(0, 1), (100000, 2)])
+        self.assertEqual([(f["value"], f["count"]) for f in facets["skills"]], [("Python", 2), ("Go", 1)])
+        self.assertEqual(self.counts("location"), {"Chennai": 2, "Remote": 1})
+        self.assertNotIn("facets", JobPosts.search())
+    
+    def test_filtered_counts(self):
+        """Facets follow the search filters"""
+        self.assertEqual(self.counts("jobType", skills="python"), {"FULL_TIME": 2})
+        self.assertEqual(self.counts("skills", job_type="CONTRACT"), {"Go": 1})
+        self.assertEqual(self.counts("location", min_salary=100000), {"Chennai": 1, "Remote": 1})
+        empty = JobPosts.search(facets=True, skills="cobol")["facets"]
+        self.assertTrue(all(values == [] for values in empty.values()))
+    
+    def test_counted_once_per_search(self):
+        """Paging through a search reuses its facets until a write changes them"""
+        with mock.patch.object(JobPosts, "_searchFacets", wraps=JobPosts._searchFacets) as spy:
+            page = JobPosts.search(facets=True, page_size=1)
+            while page["has_next"]:
+                page = JobPosts.search(facets=True, page_size=1, cursor=page["next_cursor"])
+            self.assertEqual(spy.call_count, 1)
+            
+            JobPosts.get(id=self.post_ids[0]).update(jobType="CONTRACT")
+            self.assertEqual(self.counts("jobType"), {"CONTRACT": 2, "FULL_TIME": 1})
+            self.assertEqual(spy.call_count, 2)
+    
+    def test_uncached_when_caching_is_off(self):
+        """SEARCH_CACHE_SIZE = 0 turns the facet and count caches off too"""
+        app = Flask(__name__)
+        app.config["SEARCH_CACHE_SIZE"] = 0
+        counts, facets = search_cache.get_counts(), search_cache.get_facets()
+        search_cache.init_app(app)
+        try:
+            self.assertIsNone(search_cache.get_counts())
+            self.assertIsNone(search_cache.get_facets())
+            with mock.patch.object(JobPosts, "_searchFacets", wraps=JobPosts._searchFacets) as spy:
+                self.assertEqual(self.counts("jobType"), {"FULL_TIME": 2, "CONTRACT": 1})
+                self.assertEqual(self.counts("jobType"), {"FULL_TIME": 2, "CONTRACT": 1})
+                self.assertEqual(spy.call_count, 2)
+            with mock.patch("db.models.SEARCH_COUNT_LIMIT", 1):
+                results = JobPosts.search(total=True, page_size=1)
+            self.assertEqual((results["total"], results["total_exact"]), (1, False))
+        finally:
+            search_cache._counts, search_cache._facets = counts, facets
+
+
+class TestSkillResolution(TestDatabaseSetup):
+    """Test Skills.resolve_many"""
+    
+    def setUp(self):
+        super().setUp()
+        clear_skill_cache()
+        self.python = Skills(skill="Python").insert()
+    
+    def tearDown(self):
+        clear_skill_cache()
+    
+    def test_batched_and_cached(self):
+        """Misses cost one SELECT and one INSERT; hits cost nothing"""
+        names = [" python ", "PYTHON"] + [f"Skill  {i}" for i in range(30)] + [""]
+        with mock.patch("db.models.fetch", wraps=fetch) as fetches, \
+                mock.patch("db.models.execute_returning", wraps=execute_returning) as inserts:
+            ids = Skills.resolve_many(names)
+            self.assertEqual((fetches.call_count, inserts.call_count), (1, 1))
+            self.assertEqual(Skills.resolve_many(names), ids)
+            self.assertEqual((fetches.call_count, inserts.call_count), (1, 1))
+        
+        self.assertEqual(list(ids)[:3], ["python", "skill 0", "skill 1"])
+        self.assertEqual(ids["python"], self.python)
+        self.assertEqual(Skills.get(id=ids["skill 29"]).skill, "Skill 29")
+        self.assertEqual(len(Skills.getAll()), 31)
+        self.assertEqual(Skills.get_or_create("skill 3").id, ids["skill 3"])
+    
+    def test_rollback_and_deletes(self):
+        """Skills created in a rolled back transaction or deleted since are not served from the cache"""
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                rolled_back = Skills.resolve_many(["Rust"])["rust"]
+                raise RuntimeError("abort")
+        self.assertIsNone(Skills.get(id=rolled_back))
+        rust = Skills.resolve_many(["Rust"])["rust"]
+        self.assertIsNotNone(Skills.get(id=rust))
+        
+        Skills.get(id=rust).delete()
+        self.assertNotEqual(Skills.resolve_many(["rust"])["rust"], rust)
+    
+    def test_entries_expire(self):
+        """Skills changed by another process are seen once the cached entry expires"""
+        go = Skills.resolve_many(["Go"])["go"]
+        conn = connections.connect()
+        conn.execute("DELETE FROM Skills WHERE id = ?", (go,))
+        conn.commit()
+        conn.close()
+        self.assertEqual(Skills.resolve_many(["go"])["go"], go)
+        
+        with mock.patch("db.models.SKILL_CACHE_TTL", 0):
+            fresh = Skills.resolve_many(["go"])["go"]
+        self.assertNotEqual(fresh, go)
+        self.assertEqual(Skills.get(id=fresh).skill, "go")
+
+
+class TestSkillNormalisation(TestDatabaseSetup):
+    """Test skill keys, aliases and merging duplicate skills"""
+    
+    def setUp(self):
+        super().setUp()
+        clear_skill_cache()
+        recruiter_id = Recruiters(username="norm", email="norm@test.com", password="pass").insert()
+        company_id = Companies(
+            username="norm_co", companyName="Norm Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.post_id = JobPosts(
+            recruiterId=recruiter_id, companyId=company_id, title="Norm", description="Desc", experience=1,
+            jobType="FULL_TIME", location="Remote", salary=100.0, validTill="2030-01-01"
+        ).insert()
+        self.freelancer_id = Freelancers(username="normf", email="normf@test.com", password="pass").insert()
+    
+    def tearDown(self):
+        clear_skill_cache()
+    
+    def test_keys(self):
+        """Names that only differ in case or spacing share one skill"""
+        skill_id = Skills(skill="  Machine   Learning ").insert()
+        self.assertEqual(Skills.get(id=skill_id).skillKey, "machine learning")
+        self.assertIsNone(Skills(skill="machine learning").insert())
+        self.assertEqual(Skills.get_by_name("MACHINE learning").id, skill_id)
+        
+        Skills.get(id=skill_id).update(skill="Deep Learning")
+        self.assertIsNone(Skills.get_by_name("machine learning"))
+        self.assertEqual(Skills.get_by_name("deep  learning").id, skill_id)
+    
+    def test_merge(self):
+        """Merging moves posts and freelancers over and leaves the names as aliases"""
+        js = Skills(skill="JavaScript").insert()
+        short = Skills(skill="JS").insert()
+        long = Skills(skill="ECMAScript").insert()
+        PostSkills(postId=self.post_id, skillId=js, isRequired=False).insert()
+        PostSkills(postId=self.post_id, skillId=short, isRequired=True).insert()
+        FreelancerSkills(freelancerId=self.freelancer_id, skillId=short, proficiencyLevel="EXPERT",
+                         yearsOfExperience=2).insert()
+        FreelancerSkills(freelancerId=self.freelancer_id, skillId=long, proficiencyLevel="BEGINNER",
+                         yearsOfExperience=5).insert()
+        self.assertEqual(Skills.resolve_many(["js"]), {"js": short})
+        
+        self.assertTrue(Skills.merge(js, [short, long]))
+        self.assertEqual([(p.skillId, p.isRequired) for p in PostSkills.getAll(postId=self.post_id)], [(js, True)])
+        [skill] = FreelancerSkills.getAll(freelancerId=self.freelancer_id)
+        self.assertEqual((skill.skillId, skill.proficiencyLevel, skill.yearsOfExperience), (js, "EXPERT", 5))
+        self.assertIsNone(Skills.get(id=short))
+        
+        # the old names now find the merged skill, and count once
+        self.assertEqual(Skills.get_by_name("ECMAScript").id, js)
+        self.assertEqual(set(Skills.lookup_keys(["js", "javascript"]).values()), {js})
+        self.assertEqual(Skills.resolve_many(["JS"]), {"js": js})
+        self.assertEqual(len(JobPosts.search(skills="js, ecmascript", skills_match="all")["jobs"]), 1)
+        
+        # merging again moves the aliases along
+        ts = Skills(skill="TypeScript").insert()
+        self.assertTrue(Skills.merge(ts, [js]))
+        self.assertEqual(set(Skills.lookup_keys(["js", "ecmascript", "javascript"]).values()), {ts})
+    
+    def test_normalize_keys(self):
+        """Skills from before skillKey get keys, and their duplicates are merged"""
+        conn = sqlite3.connect("database.db")
+        conn.executemany("INSERT INTO Skills (skill) VALUES (?)", [("Rust",), ("rust ",), ("Go",)])
+        conn.commit()
+        ids = dict(conn.execute("SELECT skill, id FROM Skills"))
+        conn.close()
+        PostSkills(postId=self.post_id, skillId=ids["rust "]).insert()
+        
+        self.assertEqual(Skills.normalize_keys(), 1)
+        self.assertEqual(Skills.normalize_keys(), 0)
+        self.assertEqual({s.skill: s.skillKey for s in Skills.getAll()}, {"Rust": "rust", "Go": "go"})
+        self.assertEqual([p.skillId for p in PostSkills.getAll(postId=self.post_id)], [ids["Rust"]])
+        self.assertEqual(Skills.get_by_name("RUST").id, ids["Rust"])
+
+
+class TestSkillIndex(TestDatabaseSetup):
+    """Test the in-memory skill index used by skill filters"""
+    
+    def setUp(self):
+        super().setUp()
+        recruiter_id = Recruiters(username="idx", email="idx@test.com", password="pass").insert()
+        company_id = Companies(
+            username="idx_co", companyName="Index Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.post = dict(
+            recruiterId=recruiter_id, companyId=company_id, description="Desc", experience=1,
+            jobType="FULL_TIME", location="Remote", salary=100.0, validTill="2030-01-01"
+        )
+        self.python = Skills(skill="Python").insert()
+        self.sql = Skills(skill="SQL").insert()
+        self.both = JobPosts(title="Both", **self.post).insert()
+        self.python_only = JobPosts(title="Python Only", **self.post).insert()
+        PostSkills(postId=self.both, skillId=self.python).insert()
+        PostSkills(postId=self.both, skillId=self.sql).insert()
+        PostSkills(postId=self.python_only, skillId=self.python).insert()
+        self.index = skill_index.refresh_index()
+    
+    def tearDown(self):
+        skill_index.set_index(None)
+    
+    def titles(self, **filters):
+        return sorted(job["title"] for job in JobPosts.search(**filters)["jobs"])
+    
+    def test_postings(self):
+        """Posting lists hold only the ids listed; union and intersection give any or all"""
+        self.assertEqual(skill_index.to_postings([1000000, 3, 1000000]).tolist(), [3, 1000000])
+        self.assertEqual(skill_index.to_postings([1000000, 1000001]).nbytes, 16)
+        self.assertEqual(self.index.match([self.python, self.sql]).tolist(), [self.both, self.python_only])
+        self.assertEqual(self.index.match([self.python, self.sql], all=True).tolist(), [self.both])
+        self.assertEqual(self.index.match([]).tolist(), [])
+        self.assertEqual(self.index.stats()["bytes"], 3 * 8)
+    
+    def test_search_filters(self):
+        """Skill filters give the same posts with and without the index"""
+        for index in (self.index, None):
+            skill_index.set_index(index)
+            self.assertEqual(self.titles(skills="python, sql"), ["Both", "Python Only"])
+            self.assertEqual(self.titles(skills="python, SQL", skills_match="all"), ["Both"])
+            self.assertEqual(self.titles(skills="sql, unknown", skills_match="all"), [])
+            self.assertEqual(self.titles(skills="sql, unknown"), ["Both"])
+        # candidate sets too large to bind fall back to the semi-join
+        with mock.patch("db.models.SKILL_CANDIDATE_LIMIT", 1):
+            self.assertEqual(self.titles(skills="python, sql"), ["Both", "Python Only"])
+            self.assertEqual(self.titles(skills="python, SQL", skills_match="all"), ["Both"])
+        with self.assertRaises(ValueError):
+            JobPosts.search(skills="python", skills_match="most")
+    
+    def test_incremental_updates(self):
+        """Committed writes to posts and their skills update the index in place"""
+        PostSkills(postId=self.python_only, skillId=self.sql).insert()
+        self.assertEqual(self.titles(skills="python,sql", skills_match="all"), ["Both", "Python Only"])
+        
+        JobPosts.get(id=self.both).update(isActive=False)
+        self.assertEqual(self.titles(skills="sql"), ["Python Only"])
+        
+        PostSkills(postId=self.python_only, skillId=self.sql).delete()
+        self.assertEqual(self.titles(skills="sql"), [])
+        
+        new_id = JobPosts.insertMany([JobPosts(title="Bulk", **self.post)])[0]
+        PostSkills(postId=new_id, skillId=self.sql).insert()
+        self.assertEqual(self.titles(skills="sql"), ["Bulk"])
+        
+        # new skills have no posts, so they leave the index as it is
+        Skills.resolve_many(["Haskell"])
+        self.assertFalse(self.index.stale())
+        self.assertIs(skill_index.get_index(), self.index)
+    
+    def test_unknown_writes_rebuild(self):
+        """Writes the index can't apply mark it stale; it is rebuilt in the background"""
+        PostSkills(postId=self.both, skillId=self.sql).delete(skillId=self.sql)
+        self.assertTrue(self.index.stale())
+        # the stale index is still served while the next one is built
+        self.assertIs(skill_index.get_index(), self.index)
+        for _ in range(100):
+            if skill_index.get_index() is not self.index:
+                break
+            time.sleep(0.01)
+        self.assertEqual(skill_index.get_index().match([self.sql]).tolist(), [])
+
+
+class TestRecommendations(TestDatabaseSetup):
+    """Test skill based job recommendations"""
+    
+    def setUp(self):
+        super().setUp()
+        recruiter_id = Recruiters(username="rec", email="rec@test.com", password="pass").insert()
+        company_id = Companies(
+            username="rec_co", companyName="Rec Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.python_id, self.sql_id, self.java_id = Skills.insertMany(
+            Skills(skill=name) for name in ("Python", "SQL", "Java")
+        )
+        
+        def post(title, skills, isActive=True):
+            post_id = JobPosts(
+                recruiterId=recruiter_id, companyId=company_id, title=title, description="Desc",
+                experience=1, jobType="FULL_TIME", location="Remote", salary=100.0,
+                validTill="2030-01-01", isActive=isActive
+            ).insert()
+            PostSkills.insertMany(
+                PostSkills(postId=post_id, skillId=skill_id, isRequired=required)
+                for skill_id, required in skills
+            )
+            return post_id
+        
+        self.python_only = post("Python", [(self.python_id, True)])
+        self.python_java = post("Python and Java", [(self.python_id, True), (self.java_id, True)])
+        self.python_opt_java = post("Java, some Python", [(self.java_id, True), (self.python_id, False)])
+        self.sql_only = post("SQL", [(self.sql_id, True)])
+        self.java_only = post("Java", [(self.java_id, True)])
+        self.closed = post("Closed", [(self.python_id, True)], isActive=False)
+        self.post = post
+        
+        self.freelancer_id = Freelancers(username="rec_f", email="rec_f@test.com", password="pass").insert()
+        FreelancerSkills.insertMany([
+            FreelancerSkills(freelancerId=self.freelancer_id, skillId=self.python_id,
+                             proficiencyLevel="EXPERT", yearsOfExperience=5),
+            FreelancerSkills(freelancerId=self.freelancer_id, skillId=self.sql_id,
+                             proficiencyLevel="BEGINNER"),
+        ])
+        rebuild_post_matrix()
+    
+    def test_ranking(self):
+        """Posts rank by skill weight and coverage; unrelated and closed posts are left out"""
+        ranked = [post_id for post_id, _ in recommendations.recommend_jobs(self.freelancer_id)]
+        self.assertEqual(ranked, [self.python_only, self.python_java, self.sql_only, self.python_opt_java])
+        self.assertEqual(len(recommendations.recommend_jobs(self.freelancer_id, limit=2)), 2)
+        
+        jobs = recommendations.recommended_job_posts(self.freelancer_id, limit=1)
+        self.assertEqual(jobs[0]["id"], self.python_only)
+        self.assertEqual(jobs[0]["company_name"], "Rec Co")
+        self.assertEqual(jobs[0]["match_score"], 6.0)
+    
+    def test_applied_and_skill_less_freelancers(self):
+        """Jobs already applied to are skipped; freelancers without skills get nothing"""
+        resume_id = Resumes(freelancerId=self.freelancer_id, name="cv", pdfData=b"pdf", fileSize=3).insert()
+        Applications(jobPostId=self.python_only, freelancerId=self.freelancer_id, resumeId=resume_id).insert()
+        ranked = [post_id for post_id, _ in recommendations.recommend_jobs(self.freelancer_id)]
+        self.assertNotIn(self.python_only, ranked)
+        
+        other = Freelancers(username="rec_g", email="rec_g@test.com", password="pass").insert()
+        self.assertEqual(recommendations.recommend_jobs(other), [])
+    
+    def test_matrix_follows_writes(self):
+        """Writes to job posts mark the matrix stale; the next build includes them"""
+        matrix = recommendations.get_post_matrix()
+        self.assertFalse(matrix.stale())
+        new_post = self.post("New Python", [(self.python_id, True), (self.sql_id, False)])
+        self.assertTrue(matrix.stale())
+        
+        rebuild_post_matrix()
+        ranked = [post_id for post_id, _ in recommendations.recommend_jobs(self.freelancer_id)]
+        self.assertEqual(ranked[0], new_post)
+    
+    def test_top_k(self):
+        """top_k picks the same rows as a full sort, larger keys winning ties"""
+        scores = np.array([3.0, 1.0, 3.0, 2.0, 5.0, 0.5])
+        keys = np.array([10, 11, 12, 13, 14, 15])
+        self.assertEqual(list(recommendations.top_k(scores, keys, 3)), [4, 2, 0])
+        self.assertEqual(list(recommendations.top_k(scores, keys, 10)), [4, 2, 0, 3, 1, 5])
+
+
+class TestApplicantRanking(TestDatabaseSetup):
+    """Test ranking a post's applicants by match score"""
+    
+    def setUp(self):
+        super().setUp()
+        recruiter_id = Recruiters(username="rank", email="rank@test.com", password="pass").insert()
+        company_id = Companies(
+            username="rank_co", companyName="Rank Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.python_id, self.sql_id = Skills.insertMany(Skills(skill=name) for name in ("Python", "SQL"))
+        self.post_id = JobPosts(
+            recruiterId=recruiter_id, companyId=company_id, title="Backend", description="Desc",
+            experience=2, jobType="FULL_TIME", location="Remote", salary=100.0, validTill="2030-01-01"
+        ).insert()
+        PostSkills.insertMany([
+            PostSkills(postId=self.post_id, skillId=self.python_id, isRequired=True),
+            PostSkills(postId=self.post_id, skillId=self.sql_id, isRequired=False),
+        ])
+        
+        self.expert, self.beginner, self.sql_only = [
+            Freelancers(username=name, email=f"{name}@test.com", password="pass").insert()
+            for name in ("expert", "beginner", "sqlonly")
+        ]
+        FreelancerSkills.insertMany([
+            FreelancerSkills(freelancerId=self.expert, skillId=self.python_id,
+                             proficiencyLevel="EXPERT", yearsOfExperience=10),
+            FreelancerSkills(freelancerId=self.beginner, skillId=self.python_id),
+            FreelancerSkills(freelancerId=self.sql_only, skillId=self.sql_id),
+        ])
+        Experiences(freelancerId=self.expert, companyName="Co", startDate="2015-01-01",
+                    endDate="2018-01-01", role="Dev").insert()
+        
+        self.applications = {}
+        for freelancer_id in (self.sql_only, self.beginner, self.expert):
+            resume_id = Resumes(freelancerId=freelancer_id, name="cv", pdfData=b"pdf", fileSize=3).insert()
+            self.applications[freelancer_id] = Applications(
+                jobPostId=self.post_id, freelancerId=freelancer_id, resumeId=resume_id
+            ).insert()
+    
+    def ranking(self, **kwargs):
+        page = recommendations.ranked_applications(self.post_id, **kwargs)
+        return [application.freelancerId for application, _ in page["applications"]]
+    
+    def test_ranking_and_persistence(self):
+        """Applicants are scored once, best match first, and scores are reused"""
+        self.assertEqual(self.ranking(), [self.expert, self.beginner, self.sql_only])
+        page = recommendations.ranked_applications(self.post_id)
+        self.assertAlmostEqual(page["applications"][0][1], 0.8 * (1 / 1.5) + 0.2, places=3)
+        self.assertEqual(page["total"], 3)
+        self.assertEqual(recommendations.score_applicants(self.post_id), 0)
+    
+    def test_scores_follow_changes(self):
+        """Changing an applicant's skills or the post's skills rescores the affected applications"""
+        recommendations.score_applicants(self.post_id)
+        FreelancerSkills(freelancerId=self.sql_only, skillId=self.python_id,
+                         proficiencyLevel="EXPERT", yearsOfExperience=10).insert()
+        self.assertEqual(recommendations.score_applicants(self.post_id), 1)
+        self.assertEqual(self.ranking(), [self.expert, self.sql_only, self.beginner])
+        
+        PostSkills(postId=self.post_id, skillId=self.python_id).delete()
+        self.assertEqual(recommendations.score_applicants(self.post_id), 3)
+        self.assertEqual(self.ranking()[-1], self.beginner)
+    
+    def test_pagination(self):
+        """Pages follow the ranking forwards and back"""
+        first = recommendations.ranked_applications(self.post_id, page_size=2)
+        self.assertIsNone(first["prev_cursor"])
+        second = recommendations.ranked_applications(self.post_id, cursor=first["next_cursor"], page_size=2)
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(
+            [a.freelancerId for a, _ in first["applications"] + second["applications"]],
+            [self.expert, self.beginner, self.sql_only]
+        )
+        back = recommendations.ranked_applications(self.post_id, cursor=second["prev_cursor"], page_size=2)
+        self.assertEqual(back["applications"], first["applications"])
+    
+    def test_failed_scoring_lists_unranked(self):
+        """When scores can't be stored every application is still listed, newest first"""
+        with mock.patch("db.recommendations.executemany", return_value=None):
+            self.assertIsNone(recommendations.score_applicants(self.post_id))
+            first = recommendations.ranked_applications(self.post_id, page_size=2)
+            second = recommendations.ranked_applications(self.post_id, cursor=first["next_cursor"], page_size=2)
+        
+        self.assertEqual(first["total"], 3)
+        self.assertEqual(
+            [(a.freelancerId, score) for a, score in first["applications"] + second["applications"]],
+            [(self.expert, None), (self.beginner, None), (self.sql_only, None)]
+        )
+        self.assertIsNone(fetch("SELECT 1 FROM ApplicationScores", (), one=True))
+
+
+class TestRowHydration(TestDatabaseSetup):
+    """Test building models and dicts from trusted rows"""
+    
+    def setUp(self):
+        super().setUp()
+        self.recruiter_id = Recruiters(username="hydrate", email="h@test.com", password="pass").insert()
+        self.company_id = Companies(
+            username="hydrate_co", companyName="Hydrate Co", companyPhone="1",
+            companyAddress="Addr", companyDescription="Desc"
+        ).insert()
+        self.post_id = JobPosts(
+            recruiterId=self.recruiter_id, companyId=self.company_id, title="Dev",
+            description="Build things", experience=2, jobType="FULL_TIME",
+            location="Remote", salary=1000.0, validTill="2030-01-01", isActive=False
+        ).insert()
+    
+    def test_trusted_rows_match_validated_models(self):
+        """fromRow gives the same model as validating the row"""
+        row = fetch("SELECT * FROM JobPosts WHERE id = ?", (self.post_id,), one=True)
+        trusted = JobPosts.fromRow(row)
+        self.assertEqual(trusted.model_dump(), JobPosts(**dict(row)).model_dump())
+        self.assertIs(trusted.isActive, False)
+    
+    def test_get_all_dicts(self):
+        """getAllDicts returns what model_dump() would, projections included"""
+        models_ = JobPosts.getAll(recruiterId=self.recruiter_id, defer=())
+        dicts = JobPosts.getAllDicts(recruiterId=self.recruiter_id, defer=())
+        self.assertEqual(dicts, [m.model_dump() for m in models_])
+        
+        titles = JobPosts.getAllDicts(recruiterId=self.recruiter_id, fields=("title",))
+        self.assertEqual(titles, [{"id": self.post_id, "title": "Dev"}])
+    
+    def test_missing_columns_take_defaults(self):
+        """Fields without a table column get their model default"""
+        freelancer_id = Freelancers(username="hyd", email="hyd@test.com", password="pass").insert()
+        FreelancerDetails(
+            freelancerId=freelancer_id, firstName="A", middleName="", lastName="B",
+            phoneNumber="1", contactEmail="a@b.c", about="", dateOfBirth="2000-01-01", address=""
+        ).insert()
+        details = FreelancerDetails.get(freelancerId=freelancer_id)
+        self.assertIsNone(details.createdAt)
+        self.assertEqual(details.firstName, "A")
+
+
+class TestDeferredFields(TestDatabaseSetup):
+    """Test column projection and deferred loading"""
+    
+    def setUp(self):
+        super().setUp()
+        self.freelancer_id = Freelancers(username="deferred", email="d@test.com", password="pass").insert()
+        self.pdf_data = b"%PDF-1.4 deferred"
+        self.resume_id = Resumes(
+            freelancerId=self.freelancer_id, name="cv", pdfData=self.pdf_data,
+            fileSize=len(self.pdf_data)
+        ).insert()
+    
+    def test_deferred_by_default(self):
+        """pdfData is not read until it is accessed"""
+        resume = Resumes.get(id=self.resume_id)
+        self.assertNotIn("pdfData", resume.model_dump())
+        self.assertEqual(resume.pdfData, self.pdf_data)
+        self.assertIn("pdfData", resume.model_dump())
+    
+    def test_defer_override_and_fields(self):
+        """defer=() reads everything, fields= reads only the named columns"""
+        full = Resumes.get(id=self.resume_id, defer=())
+        self.assertEqual(full.model_dump()["pdfData"], self.pdf_data)
+        
+        names = Resumes.getAll(freelancerId=self.freelancer_id, fields=("name",))
+        self.assertEqual(set(names[0].model_dump()), {"id", "name"})
+        self.assertEqual(names[0].fileSize, len(self.pdf_data))
+        
+        with self.assertRaises(ValueError):
+            Resumes.getAll(fields=("nope",))
+    
+    def test_update_keeps_unloaded_fields(self):
+        """Saving a partially loaded row leaves deferred columns untouched"""
+        resume = Resumes.get(id=self.resume_id)
+        resume.name = "renamed"
+        self.assertIsNotNone(resume.update())
+        
+        stored = Resumes.get(id=self.resume_id, defer=())
+        self.assertEqual(stored.name, "renamed")
+        self.assertEqual(stored.pdfData, self.pdf_data)
+    
+    def test_open_pdf_reads_in_chunks(self):
+        """open_pdf streams the BLOB without loading pdfData"""
+        resume = Resumes.get(id=self.resume_id)
+        with resume.open_pdf() as pdf:
+            self.assertEqual(len(pdf), len(self.pdf_data))
+            self.assertEqual(b"".join(pdf.chunks(size=4)), self.pdf_data)
+            pdf.seek(5)
+            self.assertEqual(pdf.read(3), self.pdf_data[5:8])
+        self.assertNotIn("pdfData", resume.model_dump())
+
+
+class TestResumeStore(TestDatabaseSetup):
+    """Test the content-addressed resume store"""
+    
+    def setUp(self):
+        super().setUp()
+        self.store_dir = tempfile.mkdtemp()
+        self.store = resume_store.FileSystemResumeStore(self.store_dir)
+        resume_store.set_store(self.store)
+        self.freelancer_id = Freelancers(username="stored", email="s@test.com", password="pass").insert()
+        self.pdf_data = b"%PDF-1.4 stored" * 100
+    
+    def tearDown(self):
+        resume_store.set_store(None)
+        shutil.rmtree(self.store_dir)
+    
+    def test_upload_is_deduplicated(self):
+        """The same PDF is stored once and reused per freelancer"""
+        first = Resumes.store_upload(self.freelancer_id, "cv", BytesIO(self.pdf_data))
+        again = Resumes.store_upload(self.freelancer_id, "cv copy", BytesIO(self.pdf_data))
+        self.assertIsNotNone(first)
+        self.assertEqual(first, again)
+        
+        other_id = Freelancers(username="other", email="o@test.com", password="pass").insert()
+        other = Resumes.store_upload(other_id, "cv", BytesIO(self.pdf_data))
+        self.assertNotEqual(other, first)
+        
+        resume = Resumes.get(id=first)
+        self.assertEqual(resume.fileSize, len(self.pdf_data))
+        self.assertEqual(resume.pdfData, b"")
+        self.assertEqual(fetch("SELECT refCount FROM ResumeFiles", (), one=True)[0], 2)
+        with resume.open_pdf() as pdf:
+            self.assertEqual(pdf.read(), self.pdf_data)
+        with open(resume.file_path(), "rb") as f:
+            self.assertEqual(f.read(), self.pdf_data)
+    
+    def test_delete_releases_file(self):
+        """The file is removed with its last referencing resume"""
+        resume_id = Resumes.store_upload(self.freelancer_id, "cv", BytesIO(self.pdf_data))
+        other_id = Freelancers(username="other", email="o@test.com", password="pass").insert()
+        other_resume_id = Resumes.store_upload(other_id, "cv", BytesIO(self.pdf_data))
+        path = Resumes.get(id=resume_id).file_path()
+        
+        self.assertIsNotNone(Resumes.get(id=resume_id).delete())
+        self.assertTrue(os.path.exists(path))
+        self.assertIsNotNone(Resumes.get(id=other_resume_id).delete())
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(fetch("SELECT 1 FROM ResumeFiles", (), one=True))
+    
+    def test_failed_upload_removes_file(self):
+        """A file whose rows were rolled back does not stay in the store"""
+        self.assertIsNone(Resumes.store_upload(99999, "cv", BytesIO(self.pdf_data)))
+        self.assertIsNone(fetch("SELECT 1 FROM ResumeFiles", (), one=True))
+        self.assertEqual([files for _, _, files in os.walk(self.store_dir) if files], [])
+    
+    def test_failed_delete_reports_failure(self):
+        """A delete whose refCount update fails is rolled back and returns None"""
+        resume_id = Resumes.store_upload(self.freelancer_id, "cv", BytesIO(self.pdf_data))
+        path = Resumes.get(id=resume_id).file_path()
+        conn = connections.connect()
+        conn.execute("CREATE TRIGGER keep_files BEFORE UPDATE ON ResumeFiles BEGIN SELECT RAISE(ABORT, 'kept'); END")
+        conn.commit()
+        try:
+            self.assertIsNone(Resumes.get(id=resume_id).delete())
+            self.assertIsNotNone(Resumes.get(id=resume_id))
+            self.assertTrue(os.path.exists(path))
+        finally:
+            conn.execute("DROP TRIGGER keep_files")
+            conn.commit()
+            conn.close()
+    
+    def test_backends_must_implement_storage(self):
+        """A store missing save, open or delete can't be created"""
+        class NoDelete(resume_store.ResumeStore):
+            def save(self, stream):
+                return "", 0
+            
+            def open(self, contentHash):
+                return BytesIO()
+        
+        with self.assertRaises(TypeError):
+            NoDelete()
+    
+    def test_empty_upload_rejected(self):
+        """An empty file creates no resume"""
+        self.assertIsNone(Resumes.store_upload(self.freelancer_id, "cv", BytesIO(b"")))
+        self.assertEqual(Resumes.getAll(), [])
+    
+    def test_migrate_resume_blobs(self):
+        """Inline BLOBs are moved into the store and deduplicated"""
+        legacy_ids = [
+            Resumes(freelancerId=self.freelancer_id, name=f"cv{i}", pdfData=self.pdf_data,
+                    fileSize=len(self.pdf_data)).insert()
+            for i in range(2)
+        ]
+        
+        self.assertEqual(migrate_resume_blobs(self.store, vacuum=False), 2)
+        self.assertEqual(migrate_resume_blobs(self.store, vacuum=False), 0)
+        
+        for resume_id in legacy_ids:
+            resume = Resumes.get(id=resume_id, defer=())
+            self.assertEqual(resume.pdfData, b"")
+            self.assertIsNotNone(resume.contentHash)
+            with resume.open_pdf() as pdf:
+                self.assertEqual(pdf.read(), self.pdf_data)
+        self.assertEqual(fetch("SELECT refCount FROM ResumeFiles", (), one=True)[0], 2)
+
+
 class TestDatabaseFunctions(TestDatabaseSetup):
     """Test helper database functions"""
     
@@ -812,6 +1977,160 @@ class TestDataIntegrity(TestDatabaseSetup):
         self.assertTrue(retrieved_job.isActive)
 
 
+class TestConnectionManager(TestDatabaseSetup):
+    """Test request-scoped connection reuse"""
+    
+    def setUp(self):
+        super().setUp()
+        self.app = Flask(__name__)
+        connections.init_app(self.app)
+    
+    def tearDown(self):
+        close_pooled_connections()
+    
+    def test_connections_reused_within_app_context(self):
+        """Reads and writes reuse one connection each for the whole request"""
+        with self.app.app_context():
+            recruiter_id = Recruiters(username="pooled", email="pooled@test.com", password="pass").insert()
+            self.assertIsNotNone(recruiter_id)
+            
+            Recruiters.get(id=recruiter_id)
+            reader = g._db_reader
+            self.assertEqual(Recruiters.get(id=recruiter_id).username, "pooled")
+            self.assertIs(g._db_reader, reader)
+            
+            # readers are query_only, so writes through fetch are rejected
+            self.assertIsNone(fetch("DELETE FROM Recruiters", ()))
+            self.assertIsNotNone(Recruiters.get(id=recruiter_id))
+        
+        # the reader goes back to the pool at teardown
+        self.assertEqual(connections._read_pool.qsize(), 1)
+    
+    def test_transaction_commits_once(self):
+        """Writes inside transaction() become visible together"""
+        with transaction():
+            recruiter_id = Recruiters(username="tx_user", email="tx@test.com", password="pass").insert()
+            # reads inside the block see the uncommitted row
+            self.assertIsNotNone(Recruiters.get(id=recruiter_id))
+            Skills(skill="Go").insert()
+        
+        self.assertIsNotNone(Recruiters.get(id=recruiter_id))
+        self.assertIsNotNone(Skills.get(skill="Go"))
+    
+    def test_transaction_rolls_back_on_failed_write(self):
+        """A failed write rolls back every write in the block"""
+        with transaction():
+            Recruiters(username="tx_user", email="tx@test.com", password="pass").insert()
+            duplicate_id = Recruiters(username="tx_user", email="tx2@test.com", password="pass").insert()
+            self.assertIsNone(duplicate_id)
+        
+        self.assertIsNone(Recruiters.get(username="tx_user"))
+    
+    def test_transaction_rolls_back_on_exception(self):
+        """An exception inside the block rolls back and propagates"""
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                Skills(skill="Rust").insert()
+                with transaction():
+                    Skills(skill="Elixir").insert()
+                raise RuntimeError("boom")
+        
+        self.assertEqual(Skills.getAll(), [])
+    
+    def test_rollback_leaves_block(self):
+        """Raising Rollback undoes the block's writes and reaches the caller"""
+        with self.assertRaises(Rollback):
+            with transaction():
+                Skills(skill="Zig").insert()
+                raise Rollback("no zig")
+        self.assertIsNone(Skills.get(skill="Zig"))
+    
+    def test_failed_begin_closes_connection(self):
+        """A transaction that can't begin releases its connection"""
+        conn = mock.Mock()
+        conn.execute.side_effect = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(connections, "connect", return_value=conn):
+            with self.assertRaises(sqlite3.OperationalError):
+                with transaction():
+                    pass
+        conn.close.assert_called_once()
+        self.assertIsNone(connections.current_transaction())
+
+
+class TestIdentityMap(TestDatabaseSetup):
+    """Test the per-request identity map behind get(id=...) and getMany"""
+    
+    def setUp(self):
+        super().setUp()
+        self.app = Flask(__name__)
+        connections.init_app(self.app)
+        self.first = Recruiters(username="first", email="first@test.com", password="pass").insert()
+        self.second = Recruiters(username="second", email="second@test.com", password="pass").insert()
+    
+    def tearDown(self):
+        close_pooled_connections()
+    
+    def test_lookups_reuse_instances(self):
+        """Repeated lookups by id within a request read each row once"""
+        with self.app.app_context():
+            with mock.patch("db.models.fetch", wraps=fetch) as spy:
+                recruiter = Recruiters.get(id=self.first)
+                self.assertIs(Recruiters.get(id=str(self.first)), recruiter)
+                self.assertEqual(spy.call_count, 1)
+                
+                # only the id not seen yet is read
+                many = Recruiters.getMany([self.first, self.second, self.first])
+                self.assertIs(many[self.first], recruiter)
+                self.assertIs(Recruiters.get(id=self.second), many[self.second])
+                self.assertEqual(spy.call_count, 2)
+            
+            # a missing row is not remembered
+            self.assertIsNone(Recruiters.get(id=999))
+        
+        # a new request starts empty, and outside one nothing is kept
+        with self.app.app_context():
+            self.assertIsNot(Recruiters.get(id=self.first), recruiter)
+        self.assertIsNot(Recruiters.get(id=self.first), Recruiters.get(id=self.first))
+    
+    def test_writes_evict(self):
+        """Updates and deletes through the models drop the rows they touch"""
+        with self.app.app_context():
+            recruiter = Recruiters.get(id=self.first)
+            other = Recruiters.get(id=self.second)
+            recruiter.update(username="renamed")
+            self.assertEqual(Recruiters.get(id=self.first).username, "renamed")
+            self.assertIs(Recruiters.get(id=self.second), other)
+            
+            Recruiters.get(id=self.second).delete()
+            self.assertIsNone(Recruiters.get(id=self.second))
+            self.assertEqual(list(Recruiters.getMany([self.first, self.second])), [self.first])
+    
+    def test_partial_reads_are_completed(self):
+        """A mapped instance missing requested columns has them read before it is returned"""
+        with self.app.app_context():
+            partial = Recruiters.get(id=self.first, fields=("id", "username"))
+            self.assertNotIn("email", partial.model_dump())
+            full = Recruiters.get(id=self.first)
+            self.assertIs(full, partial)
+            self.assertEqual(full.model_dump()["email"], "first@test.com")
+            
+            Recruiters.get(id=self.second, fields=("id",))
+            many = Recruiters.getMany([self.first, self.second])
+            self.assertIs(many[self.first], full)
+            self.assertEqual(many[self.second].model_dump()["username"], "second")
+    
+    def test_rolled_back_reads_are_dropped(self):
+        """Rows read inside a transaction that rolls back leave the map with it"""
+        with self.app.app_context():
+            with transaction():
+                freelancer_id = Freelancers(username="gone", email="gone@test.com", password="pass").insert()
+                self.assertIsNotNone(Freelancers.get(id=freelancer_id))
+                self.assertIsNone(Freelancers(username="gone", email="again@test.com", password="pass").insert())
+            
+            self.assertIsNone(Freelancers.get(id=freelancer_id))
+            self.assertEqual(Freelancers.getMany([freelancer_id]), {})
+
+
 def run_all_tests():
     """Run all tests and display results"""
     print("🧪 Running comprehensive model tests...\n")
@@ -826,7 +2145,25 @@ def run_all_tests():
         TestJunctionModels,
         TestModelValidation,
         TestDatabaseFunctions,
-        TestDataIntegrity
+        TestDataIntegrity,
+        TestBulkInsert,
+        TestCompiledQueries,
+        TestGetMany,
+        TestRelations,
+        TestSearchPagination,
+        TestFullTextSearch,
+        TestSearchCache,
+        TestSearchFacets,
+        TestSkillResolution,
+        TestSkillNormalisation,
+        TestSkillIndex,
+        TestRecommendations,
+        TestApplicantRanking,
+        TestRowHydration,
+        TestDeferredFields,
+        TestResumeStore,
+        TestConnectionManager,
+        TestIdentityMap
     ]
     
     for test_class in test_classes:
@@ -870,7 +2207,25 @@ def run_specific_test(test_class_name, test_method_name=None):
         'TestJunctionModels': TestJunctionModels,
         'TestModelValidation': TestModelValidation,
         'TestDatabaseFunctions': TestDatabaseFunctions,
-        'TestDataIntegrity': TestDataIntegrity
+        'TestDataIntegrity': TestDataIntegrity,
+        'TestBulkInsert': TestBulkInsert,
+        'TestCompiledQueries': TestCompiledQueries,
+        'TestGetMany': TestGetMany,
+        'TestRelations': TestRelations,
+        'TestSearchPagination': TestSearchPagination,
+        'TestFullTextSearch': TestFullTextSearch,
+        'TestSearchCache': TestSearchCache,
+        'TestSearchFacets': TestSearchFacets,
+        'TestSkillResolution': TestSkillResolution,
+        'TestSkillNormalisation': TestSkillNormalisation,
+        'TestSkillIndex': TestSkillIndex,
+        'TestRecommendations': TestRecommendations,
+        'TestApplicantRanking': TestApplicantRanking,
+        'TestRowHydration': TestRowHydration,
+        'TestDeferredFields': TestDeferredFields,
+        'TestResumeStore': TestResumeStore,
+        'TestConnectionManager': TestConnectionManager,
+        'TestIdentityMap': TestIdentityMap
     }
     
     if test_class_name not in test_classes: